@@ -1,13 +1,10 @@
 from main import create_app
-from main import db
 
 import os
 
+# Solo crea la app: las migraciones se aplican con 'flask --app app actualizar-esquema' al desplegar,
+# no en cada worker que importa este módulo
 app = create_app()
 
-app.app_context().push()
-
-db.create_all()
-
 if __name__ == '__main__':
     app.run(debug=False,port=os.getenv('PORT'))
\ No newline at end of file
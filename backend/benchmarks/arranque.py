@@ -0,0 +1,176 @@
+"""Benchmark de arranque: tiempo de import y memoria por worker de gunicorn.
+
+Mide dos cosas:
+  import     en procesos nuevos, cuánto tardan 'import main' y create_app(), y qué
+             dependencias pesadas (exportación, importación, vistas previas) quedaron cargadas
+  gunicorn   para cada valor de --preload, levanta gunicorn con gunicorn.conf.py, mide cuánto
+             tarda en responder la primera solicitud y, con los workers ya atendiendo, la memoria
+             de cada proceso: RSS, PSS (la memoria compartida se reparte entre quienes la usan) y
+             privada (la que no comparte con el master)
+
+Uso (desde backend/, Linux):
+    python -m benchmarks.arranque --workers 4
+    python -m benchmarks.arranque --preload true --salida arranque-preload.json
+"""
+import argparse, json, os, socket, subprocess, sys, time, urllib.error, urllib.request
+from datetime import datetime
+from benchmarks.resultados import commit_actual, guardar
+
+DEPENDENCIAS_PESADAS = ['xlsxwriter', 'openpyxl', 'PIL', 'pypdfium2', 'orjson']
+
+SCRIPT_IMPORT = f"""
+import json, sys, time
+inicio = time.perf_counter()
+import main
+importado = time.perf_counter()
+main.create_app()
+creado = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (importado - inicio) * 1000,
+    'create_app_ms': (creado - importado) * 1000,
+    'modulos': len(sys.modules),
+    'cargadas': [m for m in {DEPENDENCIAS_PESADAS!r} if m in sys.modules],
+}}))
+"""
+
+def entorno(args):
+    return {
+        **os.environ,
+        'DATABASE_URL': args.database_url,
+        'JWT_SECRET_KEY': os.environ.get('JWT_SECRET_KEY', 'benchmark-secret-key-de-al-menos-32-bytes'),
+        'JWT_ACCESS_TOKEN_EXPIRES': os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', '3600'),
+        'UPLOAD_FOLDER': os.environ.get('UPLOAD_FOLDER', os.path.abspath('bench_uploads')),
+    }
+
+def medir_import(args):
+    corridas = []
+    for _ in range(args.repeticiones):
+        salida = subprocess.run([sys.executable, '-c', SCRIPT_IMPORT], env=entorno(args), capture_output=True, text=True, check=True)
+        corridas.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+    mejor = min(corridas, key=lambda corrida: corrida['import_ms'] + corrida['create_app_ms'])
+    return {clave: round(valor, 1) if isinstance(valor, float) else valor for clave, valor in mejor.items()}
+
+def memoria(pid):
+    """RSS, PSS y memoria privada del proceso en MB (de /proc/<pid>/smaps_rollup)"""
+    valores = {}
+    with open(f'/proc/{pid}/smaps_rollup', encoding='ascii') as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) == 3 and partes[2] == 'kB':
+                valores[partes[0].rstrip(':')] = int(partes[1])
+    return {
+        'rss_mb': round(valores['Rss'] / 1024, 1),
+        'pss_mb': round(valores['Pss'] / 1024, 1),
+        'privada_mb': round((valores['Private_Clean'] + valores['Private_Dirty']) / 1024, 1),
+    }
+
+def hijos(pid):
+    resultado = []
+    for entrada in os.listdir('/proc'):
+        if entrada.isdigit():
+            try:
+                with open(f'/proc/{entrada}/stat', encoding='ascii', errors='replace') as f:
+                    # El nombre (campo 2) va entre paréntesis y puede tener espacios
+                    campos = f.read().rsplit(')', 1)[1].split()
+            except OSError:
+                continue
+            if int(campos[1]) == pid:
+                resultado.append(int(entrada))
+    return sorted(resultado)
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def solicitud(url):
+    try:
+        urllib.request.urlopen(url, timeout=5).read()
+    except urllib.error.HTTPError:
+        # Cualquier respuesta HTTP (también 404 en '/') indica que el worker ya atiende
+        pass
+
+def medir_gunicorn(args, preload):
+    puerto = puerto_libre()
+    url = f'http://127.0.0.1:{puerto}/'
+    env = {
+        **entorno(args),
+        'GUNICORN_BIND': f'127.0.0.1:{puerto}',
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_PRELOAD': preload,
+        'GUNICORN_ACCESSLOG': '',
+        'METRICAS_FOLDER': '',
+    }
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        listo = None
+        while time.perf_counter() - inicio < args.timeout:
+            if proceso.poll() is not None:
+                raise SystemExit(f'gunicorn terminó con código {proceso.returncode} (preload={preload})')
+            try:
+                solicitud(url)
+                listo = time.perf_counter() - inicio
+                break
+            except OSError:
+                time.sleep(0.02)
+        if listo is None:
+            raise SystemExit(f'gunicorn no respondió en {args.timeout} s (preload={preload})')
+
+        # Todos los workers levantados y con algunas solicitudes atendidas
+        while len(hijos(proceso.pid)) < args.workers and time.perf_counter() - inicio < args.timeout:
+            time.sleep(0.05)
+        todos = time.perf_counter() - inicio
+        for _ in range(args.workers * 10):
+            solicitud(url)
+
+        workers = [memoria(pid) for pid in hijos(proceso.pid)]
+        return {
+            'preload': preload == 'true',
+            'primera_respuesta_ms': round(listo * 1000),
+            'workers_iniciados_ms': round(todos * 1000),
+            'master': memoria(proceso.pid),
+            'workers': workers,
+            'pss_total_mb': round(memoria(proceso.pid)['pss_mb'] + sum(w['pss_mb'] for w in workers), 1),
+        }
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=60)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite:///bench_arranque.db')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--preload', choices=['true', 'false', 'ambos'], default='ambos')
+    parser.add_argument('--repeticiones', type=int, default=5, help='procesos nuevos para medir el import')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--salida', help='archivo JSON donde guardar el resultado')
+    args = parser.parse_args()
+
+    resultado = {
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'import': medir_import(args),
+        'gunicorn': [],
+    }
+    importacion = resultado['import']
+    print(f"import main: {importacion['import_ms']} ms, create_app: {importacion['create_app_ms']} ms, "
+          f"{importacion['modulos']} módulos, dependencias pesadas cargadas: {', '.join(importacion['cargadas']) or 'ninguna'}")
+
+    print(f"\n{'preload':<9}{'1ª resp ms':>11}{'workers ms':>11}{'proceso':>10}{'RSS MB':>9}{'PSS MB':>9}{'privada MB':>12}")
+    for preload in (['false', 'true'] if args.preload == 'ambos' else [args.preload]):
+        datos = medir_gunicorn(args, preload)
+        resultado['gunicorn'].append(datos)
+        procesos = [('master', datos['master'])] + [(f'worker {i}', w) for i, w in enumerate(datos['workers'], start=1)]
+        for indice, (nombre, mem) in enumerate(procesos):
+            columnas = (f"{preload:<9}{datos['primera_respuesta_ms']:>11}{datos['workers_iniciados_ms']:>11}"
+                        if indice == 0 else ' ' * 31)
+            print(f"{columnas}{nombre:>10}{mem['rss_mb']:>9}{mem['pss_mb']:>9}{mem['privada_mb']:>12}")
+        print(f"{'':<31}{'PSS total':>10}{datos['pss_total_mb']:>9}")
+
+    if args.salida:
+        guardar(resultado, args.salida)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Benchmark de PATCH /api/operaciones/bulk.
+
+Actualiza un lote de operaciones (por defecto 5.000) en una sola solicitud a
+través del cliente de pruebas de Flask y mide el tiempo total y la cantidad de
+sentencias SQL emitidas.
+
+Uso (desde backend/):
+    python -m benchmarks.bulk_patch --lote 5000
+"""
+import argparse, random, time
+from sqlalchemy import event
+from main import db
+from benchmarks.datos import crear_app, poblar, encabezados
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operaciones', type=int, default=20000)
+    parser.add_argument('--lote', type=int, default=5000)
+    parser.add_argument('--database-url', default='sqlite:///bench_bulk.db')
+    args = parser.parse_args()
+
+    app = crear_app(args.database_url)
+    with app.app_context():
+        poblar(args.operaciones)
+        headers = encabezados('supervisor')
+
+        ids = random.sample(range(1, args.operaciones + 1), args.lote)
+        payload = [
+            {'id': id, 'observaciones': f'revisada {id}', 'metodo_de_pago': 'transferencia', 'monto_total': 1500}
+            for id in ids
+        ]
+
+        sentencias = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: sentencias.append(a[2]))
+
+        client = app.test_client()
+        inicio = time.perf_counter()
+        respuesta = client.patch('/api/operaciones/bulk', json=payload, headers=headers)
+        duracion = time.perf_counter() - inicio
+
+        print(f'Estado: {respuesta.status_code} - {respuesta.json["message"]}')
+        print(f'Operaciones en el lote: {args.lote}')
+        print(f'Tiempo total: {duracion * 1000:.0f} ms')
+        print(f'Sentencias SQL: {len(sentencias)}')
+
+if __name__ == '__main__':
+    main()
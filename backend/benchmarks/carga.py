@@ -0,0 +1,197 @@
+"""Prueba de carga HTTP contra la API levantada con gunicorn (o nginx delante).
+
+Simula N usuarios concurrentes, cada uno con su conexión keep-alive, que durante
+--duracion segundos eligen operaciones según la mezcla:
+  lectura   login, listado, totales y catálogos
+  mixta     lo anterior más subida de adjuntos y exportación CSV
+
+Informa por operación la cantidad, errores y latencia p50/p95/p99, y el throughput
+total. Con --salida guarda el resultado en JSON etiquetado con --configuracion, y
+--comparar muestra juntos varios resultados (p. ej. uno por perfil de gunicorn).
+
+Uso (desde backend/, con una base ya poblada, p. ej. con benchmarks.serializacion):
+    DATABASE_URL=sqlite:///$PWD/instance/bench_serializacion.db GUNICORN_WORKERS=2 GUNICORN_THREADS=8 \\
+        gunicorn -c gunicorn.conf.py app:app &
+    python -m benchmarks.carga --url http://localhost:5000 --email u1@bench.com --password bench \\
+        --mezcla mixta --usuarios 20 --duracion 60 --configuracion gthread-2x8 --salida carga-gthread-2x8.json
+    python -m benchmarks.carga --comparar carga-sync-2.json carga-gthread-2x8.json
+
+A través de nginx usar --prefijo /api (el proxy quita el primer /api).
+"""
+import argparse, base64, http.client, json, random, threading, time, uuid
+from datetime import datetime
+from urllib.parse import urlsplit
+from benchmarks.resultados import percentiles, commit_actual, guardar, cargar
+
+MEZCLAS = {
+    'lectura': {'login': 5, 'listado': 60, 'totales': 20, 'catalogos': 15},
+    'mixta': {'login': 5, 'listado': 45, 'totales': 15, 'catalogos': 10, 'subida': 15, 'exportacion': 10},
+}
+
+# Imagen PNG chica para las subidas (genera además su vista previa). El contenido se deduplica
+# por SHA-256: se agrega una marca distinta después del fin de la imagen, que los lectores ignoran
+PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAEAAAAAwCAIAAAAuKetIAAAAU0lEQVR4nO3PQQ3AIADAQEANEpGIrIngcVnSU9DOe/b4s6UDXjWg'
+    'NaA1oDWgNaA1oDWgNaA1oDWgNaA1oDWgNaA1oDWgNaA1oDWgNaA1oDWgNaA1oDWgNaB90dcByNnTplMAAAAASUVORK5CYII='
+)
+
+def cuerpo_subida():
+    """Cuerpo multipart con una imagen distinta en cada llamada, y su encabezado Content-Type"""
+    limite = uuid.uuid4().hex
+    contenido = PNG + uuid.uuid4().bytes
+    cuerpo = (
+        f'--{limite}\r\nContent-Disposition: form-data; name="archivo1"; filename="carga.png"\r\n'
+        f'Content-Type: image/png\r\n\r\n'
+    ).encode() + contenido + f'\r\n--{limite}--\r\n'.encode()
+    return cuerpo, {'Content-Type': f'multipart/form-data; boundary={limite}'}
+
+class Cliente:
+    """Usuario virtual: una conexión HTTP persistente y su token"""
+
+    def __init__(self, args, semilla):
+        partes = urlsplit(args.url)
+        clase = http.client.HTTPSConnection if partes.scheme == 'https' else http.client.HTTPConnection
+        self.conexion = clase(partes.hostname, partes.port, timeout=args.timeout)
+        self.args = args
+        self.prefijo = args.prefijo.rstrip('/')
+        self.random = random.Random(semilla)
+        self.token = None
+        self.ids = []
+
+    def solicitud(self, metodo, ruta, cuerpo=None, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        try:
+            self.conexion.request(metodo, self.prefijo + ruta, body=cuerpo, headers=headers)
+            respuesta = self.conexion.getresponse()
+            datos = respuesta.read()
+            return respuesta.status, datos
+        except (OSError, http.client.HTTPException):
+            # Conexión cerrada por el servidor (reinicio de worker, keepalive vencido): se reabre
+            self.conexion.close()
+            return 0, b''
+
+    def login(self):
+        cuerpo = json.dumps({'email': self.args.email, 'password': self.args.password})
+        status, datos = self.solicitud('POST', '/auth/login', cuerpo, {'Content-Type': 'application/json'})
+        if status == 200:
+            self.token = json.loads(datos)['access_token']
+        return status
+
+    def listado(self):
+        pagina = self.random.randint(1, 20)
+        status, datos = self.solicitud('GET', f'/api/operaciones?page={pagina}&per_page=50')
+        if status == 200 and not self.ids:
+            self.ids = [operacion['id'] for operacion in json.loads(datos)['operaciones']]
+        return status
+
+    def totales(self):
+        group_by = self.random.choice(['', 'mes', 'concepto', 'persona'])
+        return self.solicitud('GET', f'/api/operaciones/totales?group_by={group_by}')[0]
+
+    def catalogos(self):
+        catalogo = self.random.choice(['conceptos', 'categorias', 'subcategorias', 'personas'])
+        return self.solicitud('GET', f'/api/{catalogo}?page=0&per_page=0')[0]
+
+    def subida(self):
+        if not self.ids:
+            self.listado()
+        if not self.ids:
+            return 0
+        cuerpo, headers = cuerpo_subida()
+        return self.solicitud('POST', f'/api/operaciones/{self.random.choice(self.ids)}/archivos', cuerpo, headers)[0]
+
+    def exportacion(self):
+        anio = self.random.randint(2018, 2024)
+        return self.solicitud('GET', f'/api/operaciones/excel?formato=csv&fecha={anio}-{self.random.randint(1, 12):02d}')[0]
+
+def ejecutar(args):
+    mezcla = MEZCLAS[args.mezcla]
+    operaciones, pesos = list(mezcla), list(mezcla.values())
+    registros = []
+    lock = threading.Lock()
+    fin = time.monotonic() + args.duracion
+
+    def usuario(numero):
+        cliente = Cliente(args, args.semilla + numero)
+        if cliente.login() != 200:
+            with lock:
+                registros.append(('login', 0.0, 0))
+            return
+        propios = []
+        while time.monotonic() < fin:
+            operacion = cliente.random.choices(operaciones, pesos)[0]
+            inicio = time.perf_counter()
+            status = getattr(cliente, operacion)()
+            propios.append((operacion, time.perf_counter() - inicio, status))
+        with lock:
+            registros.extend(propios)
+
+    hilos = [threading.Thread(target=usuario, args=(numero,)) for numero in range(args.usuarios)]
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.monotonic() - inicio
+
+    resultado = {
+        'configuracion': args.configuracion,
+        'mezcla': args.mezcla,
+        'usuarios': args.usuarios,
+        'duracion_s': round(duracion, 1),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_actual(),
+        'solicitudes': len(registros),
+        'throughput_rps': round(len(registros) / duracion, 1),
+        'errores': sum(1 for _, _, status in registros if not 200 <= status < 300),
+        'operaciones': {},
+    }
+    for operacion in operaciones:
+        propios = [(tiempo, status) for nombre, tiempo, status in registros if nombre == operacion]
+        resultado['operaciones'][operacion] = {
+            'solicitudes': len(propios),
+            'errores': sum(1 for _, status in propios if not 200 <= status < 300),
+            **{clave: round(valor, 1) if valor is not None else None
+               for clave, valor in percentiles([tiempo for tiempo, _ in propios]).items()},
+        }
+    return resultado
+
+def imprimir(resultados):
+    for resultado in resultados:
+        print(f"\n{resultado['configuracion']} ({resultado['mezcla']}, {resultado['usuarios']} usuarios, "
+              f"commit {resultado['commit']}): {resultado['throughput_rps']} req/s, "
+              f"{resultado['errores']} errores de {resultado['solicitudes']}")
+        print(f"{'operacion':<14}{'solicitudes':>12}{'errores':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for nombre, datos in resultado['operaciones'].items():
+            p = [f"{datos[clave]:>10.1f}" if datos[clave] is not None else f"{'-':>10}" for clave in ('p50', 'p95', 'p99')]
+            print(f"{nombre:<14}{datos['solicitudes']:>12}{datos['errores']:>9}{''.join(p)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--prefijo', default='', help="'/api' si se pasa por el nginx del frontend")
+    parser.add_argument('--email', default='u1@bench.com', help='usuario admin (las subidas requieren ese rol)')
+    parser.add_argument('--password', default='bench')
+    parser.add_argument('--mezcla', choices=MEZCLAS, default='lectura')
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--duracion', type=float, default=30.0, help='segundos')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--configuracion', default='sin-etiqueta', help='p. ej. el perfil de gunicorn probado')
+    parser.add_argument('--salida', help='archivo JSON donde guardar el resultado')
+    parser.add_argument('--comparar', nargs='+', metavar='JSON', help='solo muestra resultados guardados')
+    args = parser.parse_args()
+
+    if args.comparar:
+        imprimir([cargar(archivo) for archivo in args.comparar])
+        return
+
+    resultado = ejecutar(args)
+    imprimir([resultado])
+    if args.salida:
+        guardar(resultado, args.salida)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Utilidades compartidas por los benchmarks: app contra una base local y datos sintéticos"""
+import os, random
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import chain
+from types import SimpleNamespace
+from sqlalchemy import insert
+from main import db
+from main.models import OperacionModel, PersonaModel, UsuarioModel, SubcategoriaModel, CategoriaModel, ConceptoModel
+from main.search.functions import texto_busqueda
+from main.resumen.functions import reconstruir_resumen
+
+def crear_app(database_url):
+    """Crea la app real (create_app) apuntando a la base indicada"""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-de-al-menos-32-bytes')
+    os.environ.setdefault('JWT_ACCESS_TOKEN_EXPIRES', '3600')
+    os.environ.setdefault('UPLOAD_FOLDER', os.path.abspath('bench_uploads'))
+
+    from main import create_app
+    return create_app()
+
+OBSERVACIONES = [None, None, None, 'pago parcial', 'revisada', 'anticipo de obra', 'ajuste por diferencia de cambio', 'reintegro de gastos']
+
+def poblar(cantidad, lote=5000, cantidad_personas=500, cantidad_subcategorias=40, cantidad_usuarios=5, semilla=None, progreso=False):
+    """Recrea el esquema y carga catálogos y 'cantidad' operaciones sintéticas con inserts por lotes.
+
+    Los inserts van directo a la tabla (sin eventos del ORM), así que el documento de búsqueda
+    se arma acá y el resumen mensual se reconstruye al final"""
+    aleatorio = random.Random(semilla)
+    db.drop_all()
+    db.create_all()
+
+    usuarios = [UsuarioModel(nombre=f'usuario{i}', apellido='bench', email=f'u{i}@bench.com', plain_password='bench', rol='admin' if i else 'supervisor') for i in range(cantidad_usuarios)]
+    personas = [PersonaModel(cuit=20000000000 + i, razon_social=f'proveedor {i} acme' if i % 10 == 0 else f'proveedor {i}') for i in range(cantidad_personas)]
+    conceptos = [ConceptoModel(nombre=f'concepto{i}') for i in range(4)]
+    db.session.add_all(usuarios + personas + conceptos)
+    db.session.flush()
+
+    categorias = [CategoriaModel(nombre=f'categoria{i}', id_concepto=conceptos[i % 4].id) for i in range(12)]
+    db.session.add_all(categorias)
+    db.session.flush()
+
+    subcategorias = [SubcategoriaModel(nombre=f'servicios{i}', id_categoria=categorias[i % 12].id) for i in range(cantidad_subcategorias)]
+    db.session.add_all(subcategorias)
+    db.session.commit()
+
+    # Catálogos en memoria para armar los documentos de búsqueda sin consultas por fila
+    cache = {}
+    for objeto in chain(usuarios, personas, conceptos, categorias, subcategorias):
+        cache[(type(objeto), objeto.id)] = objeto
+
+    # Distribución no uniforme, como en la base real: pocos proveedores y subcategorías concentran
+    # la mayoría de las operaciones
+    pesos_personas = [1 / (i + 1) for i in range(len(personas))]
+    pesos_subcategorias = [1 / (i + 1) for i in range(len(subcategorias))]
+
+    inicio = date(2018, 1, 1)
+    filas = []
+    for i in range(cantidad):
+        tipo = aleatorio.choice(OperacionModel.TIPOS_PERMITIDOS)
+        # Con la escala de la columna, para que el documento de búsqueda coincida con el del ORM
+        monto = Decimal(f'{aleatorio.uniform(10, 100000):.2f}').quantize(Decimal('0.00001'))
+        fila = {
+            'fecha': inicio + timedelta(days=aleatorio.randrange(2500)),
+            'tipo': tipo,
+            'caracter': aleatorio.choice(OperacionModel.CARACTERES_PERMITIDOS),
+            'naturaleza': aleatorio.choice(OperacionModel.NATURALEZAS_PERMITIDAS),
+            'id_persona': aleatorio.choices(personas, pesos_personas)[0].id,
+            'option': 'boleta',
+            'codigo': f'B{i:08d}',
+            'observaciones': aleatorio.choice(OBSERVACIONES),
+            'metodo_de_pago': aleatorio.choice(OperacionModel.METODOS_PAGO_PERMITIDOS),
+            'monto_total': -monto if tipo == 'egreso' else monto,
+            'id_subcategoria': aleatorio.choices(subcategorias, pesos_subcategorias)[0].id,
+            'id_usuario': aleatorio.choice(usuarios).id,
+            'modificado_por_otro': False,
+        }
+        fila['texto_busqueda'] = texto_busqueda(SimpleNamespace(**fila, _monto_total=fila['monto_total']), db.session, cache)
+        filas.append(fila)
+        if len(filas) >= lote:
+            db.session.execute(insert(OperacionModel.__table__), filas)
+            db.session.commit()
+            filas = []
+            if progreso:
+                print(f'  {i + 1} operaciones', flush=True)
+    if filas:
+        db.session.execute(insert(OperacionModel.__table__), filas)
+    db.session.commit()
+
+    reconstruir_resumen()
+
+def encabezados(rol='supervisor'):
+    """Encabezado Authorization con un token de un usuario sintético del rol indicado"""
+    from flask_jwt_extended import create_access_token
+    usuario = db.session.query(UsuarioModel).filter_by(rol=rol).first()
+    return {'Authorization': f'Bearer {create_access_token(identity=usuario)}'}
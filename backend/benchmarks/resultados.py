@@ -0,0 +1,48 @@
+"""Resultados de los benchmarks: percentiles, commit medido, archivos JSON y comparación entre corridas.
+
+No importa la app, así que también lo usan los drivers HTTP que corren fuera del backend.
+"""
+import json, os, statistics, subprocess
+
+def percentiles(tiempos):
+    """p50/p95/p99 en milisegundos de una lista de tiempos en segundos"""
+    if len(tiempos) < 2:
+        valor = tiempos[0] * 1000 if tiempos else None
+        return {'p50': valor, 'p95': valor, 'p99': valor}
+    cortes = statistics.quantiles(tiempos, n=100, method='inclusive')
+    return {'p50': cortes[49] * 1000, 'p95': cortes[94] * 1000, 'p99': cortes[98] * 1000}
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def guardar(resultado, archivo):
+    directorio = os.path.dirname(archivo)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(archivo, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+def cargar(archivo):
+    with open(archivo, encoding='utf-8') as f:
+        return json.load(f)
+
+def comparar(base, actual, metrica='p50', umbral=0.2):
+    """Compara escenario por escenario dos corridas de la suite. Devuelve filas
+    (escenario, valor base, valor actual, variación relativa, es_regresion); una regresión es
+    un aumento de la métrica mayor a 'umbral' (20 % por defecto) o más sentencias SQL"""
+    filas = []
+    for nombre, datos in actual['escenarios'].items():
+        anterior = base['escenarios'].get(nombre)
+        if anterior is None or anterior.get(metrica) is None or datos.get(metrica) is None:
+            filas.append((nombre, None, datos.get(metrica), None, False))
+            continue
+        variacion = (datos[metrica] - anterior[metrica]) / anterior[metrica] if anterior[metrica] else 0.0
+        mas_sentencias = (
+            datos.get('sentencias') is not None and anterior.get('sentencias') is not None
+            and datos['sentencias'] > anterior['sentencias']
+        )
+        filas.append((nombre, anterior[metrica], datos[metrica], variacion, variacion > umbral or mas_sentencias))
+    return filas
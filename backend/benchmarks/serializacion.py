@@ -0,0 +1,53 @@
+"""Microbenchmark de la serialización del listado de operaciones.
+
+Mide, sobre el mismo listado, la carga de la base, el armado de los dicts y el
+volcado a bytes de cada camino:
+  orm + json      objetos ORM con joinedload, to_json() y json de la stdlib (camino anterior)
+  orm + orjson    lo mismo con orjson
+  filas + orjson  query_filas_operaciones (columnas sueltas), fila_json() y orjson (camino actual)
+
+Uso (desde backend/):
+    python -m benchmarks.serializacion --operaciones 10000
+"""
+import argparse, time
+from main import db
+from main.resources.operacion import query_operaciones, query_filas_operaciones, fila_json
+from main.serializacion.functions import SERIALIZADORES
+from benchmarks.datos import crear_app, poblar
+
+def caminos():
+    return {
+        'orm + json': lambda: SERIALIZADORES['json']([o.to_json() for o in query_operaciones('json').all()]),
+        'orm + orjson': lambda: SERIALIZADORES['orjson']([o.to_json() for o in query_operaciones('json').all()]),
+        'filas + orjson': lambda: SERIALIZADORES['orjson']([fila_json(f) for f in query_filas_operaciones().all()]),
+    }
+
+def medir(fn, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        # Sesión limpia: el identity map no debe reutilizar objetos de la repetición anterior
+        db.session.expunge_all()
+        inicio = time.perf_counter()
+        cuerpo = fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), len(cuerpo)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operaciones', type=int, default=10000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--database-url', default='sqlite:///bench_serializacion.db')
+    args = parser.parse_args()
+
+    app = crear_app(args.database_url)
+    with app.app_context():
+        print(f'Poblando {args.operaciones} operaciones en {db.engine.url.render_as_string()}...')
+        poblar(args.operaciones)
+
+        print(f"{'camino':<16}{'tiempo (ms)':>14}{'bytes':>12}")
+        for nombre, fn in caminos().items():
+            tiempo, tamano = medir(fn, args.repeticiones)
+            print(f'{nombre:<16}{tiempo * 1000:>14.1f}{tamano:>12}')
+
+if __name__ == '__main__':
+    main()
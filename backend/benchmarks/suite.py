@@ -0,0 +1,306 @@
+"""Suite de benchmarks de la API de operaciones contra una base local ya poblada.
+
+Ejecuta cada escenario --repeticiones veces (después de una de calentamiento) y registra
+tiempo mínimo, p50 y p95, tamaño de la respuesta y, con el cliente de pruebas de Flask, la
+cantidad de sentencias SQL por solicitud:
+  listado/*   GET /api/operaciones, sin filtros, con cada filtro de _generar_filtros, por
+              cursor y una página profunda
+  totales/*   GET /api/operaciones/totales con cada group_by (desde el resumen mensual) y
+              directo sobre las operaciones (fuente=operaciones)
+  excel/*     GET /api/operaciones/excel en csv, ndjson y xlsx para un año
+  bulk        PATCH /api/operaciones/bulk de --lote operaciones al azar
+  subida      POST /api/operaciones/<id>/archivos con una imagen nueva en cada repetición
+
+Por defecto corre en proceso (create_app y el cliente de pruebas). Con --url usa HTTP contra
+un servidor levantado sobre la misma base (gunicorn, o nginx con --prefijo /api) y mide
+además la red y el servidor WSGI; ahí no se cuentan sentencias.
+
+El resultado se guarda en JSON (por defecto benchmarks/resultados/<commit>-<modo>.json), y
+--comparar contra el de otro commit marca las regresiones y termina con código 1 si hay alguna.
+
+Con --explicar (solo en proceso) corre EXPLAIN sobre cada sentencia que genera cada escenario y
+termina con código 1 si alguna recorre entera la tabla operacion, salvo los casos de
+ESCANEOS_ACEPTADOS. Las pruebas hacen la misma verificación sobre cada sentencia que ejecutan
+(fixture planes de tests/conftest.py, y tests/test_planes.py recorre estos escenarios); acá sirve
+para revisarlos contra una base grande o MariaDB.
+
+Uso (desde backend/, después de python -m benchmarks.sembrar):
+    python -m benchmarks.suite
+    python -m benchmarks.suite --solo listado totales --comparar benchmarks/resultados/abc1234-flask.json
+    python -m benchmarks.suite --url http://localhost:5000 --repeticiones 20
+    python -m benchmarks.suite --explicar --repeticiones 1
+"""
+import argparse, json, random, sys, time
+from datetime import datetime
+from urllib.parse import urlencode
+from benchmarks.carga import Cliente, cuerpo_subida
+from benchmarks.resultados import percentiles, commit_actual, guardar, cargar, comparar
+
+# Un valor representativo por filtro de Operaciones._generar_filtros (según los datos de benchmarks.datos)
+FILTROS = {
+    'id': '1000:5000',
+    'fecha': '2021-03',
+    'tipo': 'ingreso',
+    'naturaleza': 'societario',
+    'caracter': 'oficina',
+    'persona': 'proveedor 17',
+    'cuit': '20000000017',
+    'option': 'boleta',
+    'codigo': 'B0000',
+    'observaciones': 'parcial',
+    'pago': 'transferencia',
+    'monto': '1000:5000',
+    'concepto': 'concepto1',
+    'categoria': 'categoria3',
+    'subcategoria': 'servicios7',
+    'usuario': 'usuario2',
+    'global': 'acme',
+}
+
+AGRUPACIONES = ['', 'mes', 'concepto', 'categoria', 'subcategoria', 'persona', 'usuario']
+
+FORMATOS_EXCEL = ['csv', 'ndjson', 'xlsx']
+
+# Escenarios donde recorrer toda la tabla operacion es inevitable, con el motivo (también los usa tests/test_planes.py)
+ESCANEOS_ACEPTADOS = {
+    'listado/sin-filtros': 'la paginación por página cuenta todas las operaciones (por cursor no se cuenta)',
+    'listado/pagina-200': 'la paginación por página cuenta todas las operaciones (por cursor no se cuenta)',
+    'listado/observaciones': "LIKE '%texto%' no puede usar un índice B-tree",
+    'totales/general-operaciones': 'suma todas las operaciones (para eso está el resumen mensual)',
+    'totales/mes-operaciones': 'agrupa todas las operaciones (para eso está el resumen mensual)',
+}
+
+# Solo en SQLite: no tiene FULLTEXT
+ESCANEOS_ACEPTADOS_SQLITE = {
+    'listado/global': 'sin índice FULLTEXT, la búsqueda global es un LIKE',
+}
+
+class EjecutorFlask:
+    """Solicitudes en proceso con el cliente de pruebas; cuenta las sentencias SQL emitidas"""
+    modo = 'flask'
+
+    def __init__(self, app):
+        from sqlalchemy import event
+        from main import db
+        from benchmarks.datos import encabezados
+
+        self.client = app.test_client()
+        self.headers = {rol: encabezados(rol) for rol in ('supervisor', 'admin')}
+        self.sentencias = 0
+        event.listen(db.engine, 'before_cursor_execute', self._contar)
+        self.engine = db.engine
+        self.base = db.engine.url.render_as_string()
+
+    def _contar(self, *args):
+        self.sentencias += 1
+
+    def solicitud(self, rol, metodo, ruta, cuerpo=None, headers=None):
+        respuesta = self.client.open(ruta, method=metodo, data=cuerpo, headers={**self.headers[rol], **(headers or {})})
+        return respuesta.status_code, respuesta.get_data()
+
+    def escaneos(self, rol, metodo, preparar):
+        """Recorridos completos de tablas grandes en los planes de las sentencias de una solicitud"""
+        from main.planes.functions import CapturaSentencias, escaneos_completos
+
+        ruta, cuerpo, headers = preparar()
+        with CapturaSentencias(self.engine) as captura:
+            self.solicitud(rol, metodo, ruta, cuerpo, headers)
+        resultado, explicadas = [], set()
+        with self.engine.connect() as conexion:
+            for sentencia, parametros in captura.sentencias:
+                # Las sentencias repetidas (p. ej. una por lote) tienen el mismo plan
+                if sentencia in explicadas:
+                    continue
+                explicadas.add(sentencia)
+                for escaneo in escaneos_completos(conexion, sentencia, parametros):
+                    resultado.append({'escaneo': escaneo, 'sentencia': ' '.join(sentencia.split())[:300]})
+        return resultado
+
+class EjecutorHTTP:
+    """Solicitudes HTTP keep-alive contra un servidor, con un usuario por rol"""
+    modo = 'http'
+    sentencias = None
+
+    def __init__(self, args):
+        self.clientes = {}
+        for rol, email in (('supervisor', args.email_supervisor), ('admin', args.email_admin)):
+            cliente = Cliente(argparse.Namespace(**{**vars(args), 'email': email}), args.semilla)
+            if cliente.login() != 200:
+                raise SystemExit(f'No se pudo iniciar sesión como {email} en {args.url}')
+            self.clientes[rol] = cliente
+        self.base = args.url + args.prefijo
+
+    def solicitud(self, rol, metodo, ruta, cuerpo=None, headers=None):
+        return self.clientes[rol].solicitud(metodo, ruta, cuerpo, headers)
+
+def escenarios(total, args, aleatorio):
+    """Escenarios de la suite: nombre -> (rol, método, preparar), donde preparar() devuelve
+    (ruta, cuerpo, headers) de cada repetición"""
+    def fijo(ruta):
+        return lambda: (ruta, None, None)
+
+    def listado(**parametros):
+        return fijo('/api/operaciones?' + urlencode({'page': 1, 'per_page': 50, **parametros}))
+
+    resultado = {'listado/sin-filtros': ('supervisor', 'GET', listado())}
+    for filtro, valor in FILTROS.items():
+        resultado[f'listado/{filtro}'] = ('supervisor', 'GET', listado(**{filtro: valor}))
+    resultado['listado/cursor'] = ('supervisor', 'GET', fijo('/api/operaciones?cursor=&per_page=50'))
+    resultado['listado/pagina-200'] = ('supervisor', 'GET', listado(page=200))
+
+    for group_by in AGRUPACIONES:
+        resultado[f'totales/{group_by or "general"}'] = (
+            'supervisor', 'GET', fijo('/api/operaciones/totales?' + urlencode({'group_by': group_by}))
+        )
+    resultado['totales/general-operaciones'] = ('supervisor', 'GET', fijo('/api/operaciones/totales?fuente=operaciones'))
+    resultado['totales/mes-operaciones'] = ('supervisor', 'GET', fijo('/api/operaciones/totales?group_by=mes&fuente=operaciones'))
+
+    for formato in FORMATOS_EXCEL:
+        resultado[f'excel/{formato}'] = (
+            'supervisor', 'GET', fijo('/api/operaciones/excel?' + urlencode({'formato': formato, 'fecha': args.anio_excel}))
+        )
+
+    def bulk():
+        ids = aleatorio.sample(range(1, total + 1), min(args.lote, total))
+        marca = aleatorio.randrange(10 ** 6)
+        cuerpo = [{'id': id, 'observaciones': f'suite {marca}', 'metodo_de_pago': 'transferencia'} for id in ids]
+        return '/api/operaciones/bulk', json.dumps(cuerpo).encode(), {'Content-Type': 'application/json'}
+    resultado['bulk'] = ('supervisor', 'PATCH', bulk)
+
+    def subida():
+        cuerpo, headers = cuerpo_subida()
+        return f'/api/operaciones/{aleatorio.randint(1, total)}/archivos', cuerpo, headers
+    resultado['subida'] = ('admin', 'POST', subida)
+
+    if args.solo:
+        resultado = {nombre: escenario for nombre, escenario in resultado.items()
+                     if any(nombre == prefijo or nombre.startswith(prefijo + '/') for prefijo in args.solo)}
+    return resultado
+
+def total_operaciones(ejecutor):
+    status, datos = ejecutor.solicitud('supervisor', 'GET', '/api/operaciones?page=1&per_page=1')
+    if status != 200:
+        raise SystemExit(f'El listado devolvió {status}: {datos[:200]!r}')
+    return json.loads(datos)['total']
+
+def medir(ejecutor, rol, metodo, preparar, repeticiones):
+    ruta, cuerpo, headers = preparar()
+    ejecutor.solicitud(rol, metodo, ruta, cuerpo, headers)
+
+    tiempos, tamanos, sentencias, errores = [], [], [], 0
+    for _ in range(repeticiones):
+        ruta, cuerpo, headers = preparar()
+        antes = ejecutor.sentencias
+        inicio = time.perf_counter()
+        status, datos = ejecutor.solicitud(rol, metodo, ruta, cuerpo, headers)
+        tiempos.append(time.perf_counter() - inicio)
+        tamanos.append(len(datos))
+        if ejecutor.sentencias is not None:
+            sentencias.append(ejecutor.sentencias - antes)
+        if not 200 <= status < 300:
+            errores += 1
+
+    return {
+        'repeticiones': repeticiones,
+        'errores': errores,
+        'min': round(min(tiempos) * 1000, 2),
+        **{clave: round(valor, 2) for clave, valor in percentiles(tiempos).items() if clave != 'p99'},
+        'bytes': max(tamanos),
+        'sentencias': max(sentencias) if sentencias else None,
+    }
+
+def ejecutar(ejecutor, args):
+    total = total_operaciones(ejecutor)
+    resultado = {
+        'modo': ejecutor.modo,
+        'base': ejecutor.base,
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'operaciones': total,
+        'repeticiones': args.repeticiones,
+        'escenarios': {},
+    }
+    for nombre, (rol, metodo, preparar) in escenarios(total, args, random.Random(args.semilla)).items():
+        escaneos = ejecutor.escaneos(rol, metodo, preparar) if args.explicar else None
+        datos = medir(ejecutor, rol, metodo, preparar, args.repeticiones)
+        if escaneos is not None:
+            datos['escaneos'] = escaneos
+        resultado['escenarios'][nombre] = datos
+        print(f"{nombre:<28}{datos['min']:>10.1f}{datos['p50']:>10.1f}{datos['p95']:>10.1f}"
+              f"{datos['sentencias'] if datos['sentencias'] is not None else '-':>12}{datos['bytes']:>12}"
+              f"{' ' + str(datos['errores']) + ' errores' if datos['errores'] else ''}"
+              f"{' ' + str(len(escaneos)) + ' escaneos completos' if escaneos else ''}", flush=True)
+    return resultado
+
+def imprimir_escaneos(resultado):
+    """Lista los recorridos completos de la tabla operacion y devuelve cuántos no están aceptados"""
+    aceptados = {**ESCANEOS_ACEPTADOS, **(ESCANEOS_ACEPTADOS_SQLITE if resultado['base'].startswith('sqlite') else {})}
+    no_aceptados = 0
+    print('\nRecorridos completos de la tabla operacion (EXPLAIN):')
+    for nombre, datos in resultado['escenarios'].items():
+        for escaneo in datos.get('escaneos', []):
+            if nombre in aceptados:
+                print(f"{nombre:<28}{escaneo['escaneo']}   aceptado: {aceptados[nombre]}")
+            else:
+                no_aceptados += 1
+                print(f"{nombre:<28}{escaneo['escaneo']}   NO ACEPTADO\n{'':<28}{escaneo['sentencia']}")
+    if not no_aceptados:
+        print('Ninguno sin aceptar')
+    return no_aceptados
+
+def imprimir_comparacion(base, actual, umbral):
+    print(f"\nComparación con {base['commit']} ({base['modo']}, {base['operaciones']} operaciones), p50 en ms:")
+    regresiones = 0
+    for nombre, anterior, nuevo, variacion, es_regresion in comparar(base, actual, umbral=umbral):
+        if variacion is None:
+            print(f'{nombre:<28}{"-":>10}{nuevo:>10.1f}   nuevo')
+            continue
+        regresiones += es_regresion
+        print(f"{nombre:<28}{anterior:>10.1f}{nuevo:>10.1f}{variacion:>+9.0%}{'   REGRESIÓN' if es_regresion else ''}")
+    return regresiones
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite:///bench_suite.db', help='base poblada (modo en proceso)')
+    parser.add_argument('--url', help='servidor a medir por HTTP en lugar del cliente de pruebas')
+    parser.add_argument('--prefijo', default='', help="'/api' si se pasa por el nginx del frontend")
+    parser.add_argument('--email-supervisor', default='u0@bench.com')
+    parser.add_argument('--email-admin', default='u1@bench.com')
+    parser.add_argument('--password', default='bench')
+    parser.add_argument('--timeout', type=float, default=600.0)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--lote', type=int, default=1000, help='operaciones por PATCH bulk')
+    parser.add_argument('--anio-excel', default='2021')
+    parser.add_argument('--solo', nargs='+', metavar='ESCENARIO', help='p. ej. listado totales/mes bulk')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help='archivo JSON del resultado (por defecto benchmarks/resultados/<commit>-<modo>.json)')
+    parser.add_argument('--comparar', metavar='JSON', help='resultado de otro commit contra el cual comparar')
+    parser.add_argument('--umbral', type=float, default=0.2, help='aumento relativo del p50 considerado regresión')
+    parser.add_argument('--explicar', action='store_true', help='falla si algún plan recorre entera la tabla operacion')
+    args = parser.parse_args()
+    if args.explicar and args.url:
+        parser.error('--explicar necesita correr en proceso (sin --url)')
+
+    print(f"{'escenario':<28}{'min ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'sentencias':>12}{'bytes':>12}")
+    if args.url:
+        resultado = ejecutar(EjecutorHTTP(args), args)
+    else:
+        from benchmarks.datos import crear_app
+        app = crear_app(args.database_url)
+        with app.app_context():
+            resultado = ejecutar(EjecutorFlask(app), args)
+
+    salida = args.salida or f"benchmarks/resultados/{resultado['commit'] or 'sin-commit'}-{resultado['modo']}.json"
+    guardar(resultado, salida)
+    print(f'\nResultado guardado en {salida}')
+
+    fallas = 0
+    if args.explicar:
+        fallas += imprimir_escaneos(resultado)
+    if args.comparar:
+        fallas += imprimir_comparacion(cargar(args.comparar), resultado, args.umbral)
+    if fallas:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Configuración de gunicorn para producción (la lee 'gunicorn -c gunicorn.conf.py app:app').
+
+Por defecto usa workers gthread: cada proceso atiende GUNICORN_THREADS solicitudes a la vez,
+así que una subida, una exportación o una consulta lenta ocupan un hilo y no el proceso entero.
+Con GUNICORN_WORKER_CLASS=gevent (requiere instalar gevent) gunicorn parchea la stdlib antes de
+cargar la app; PyMySQL es Python puro y sus sockets pasan a ser cooperativos sin cambios.
+
+El pool de SQLAlchemy es por proceso: se dimensiona a partir de los hilos (o greenlets) de cada
+worker, y la cantidad de workers se limita para que el total de conexiones entre en el
+max_connections de MariaDB.
+
+Todo se puede sobrescribir con variables de entorno; los valores efectivos se imprimen al iniciar.
+"""
+import gc, importlib, multiprocessing, os, tempfile
+
+cpu = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # Un worker por CPU; la concurrencia la dan los greenlets
+    workers = int(os.getenv('GUNICORN_WORKERS', cpu))
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+    threads = 1
+    # Las solicitudes que superan el pool esperan una conexión (DB_POOL_TIMEOUT) sin bloquear el proceso
+    os.environ.setdefault('DB_POOL_SIZE', '10')
+    os.environ.setdefault('DB_POOL_MAX_OVERFLOW', '10')
+else:
+    workers = int(os.getenv('GUNICORN_WORKERS', min(cpu + 1, 8)))
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
+    # Una conexión por hilo de solicitudes, más las de los hilos propios (worker en proceso, vistas previas)
+    os.environ.setdefault('DB_POOL_SIZE', str(threads + 1))
+    os.environ.setdefault('DB_POOL_MAX_OVERFLOW', str(threads))
+
+conexiones_por_worker = int(os.environ['DB_POOL_SIZE']) + int(os.environ['DB_POOL_MAX_OVERFLOW'])
+
+# Conexiones de MariaDB disponibles para la API (max_connections menos las del worker de trabajos,
+# las administrativas y las de otros servicios)
+conexiones_api = int(os.getenv('DB_MAX_CONEXIONES', 151)) - int(os.getenv('DB_CONEXIONES_RESERVADAS', 20))
+if 'GUNICORN_WORKERS' not in os.environ and workers * conexiones_por_worker > conexiones_api:
+    workers = max(1, conexiones_api // conexiones_por_worker)
+
+# Clases de rutas: las interactivas (listados, totales, catálogos) terminan en segundos y nginx
+# las corta a los 30 s; las de transferencia (subidas, importaciones, exportaciones, bulk y descargas)
+# tienen hasta 300 s en nginx (ver frontend/gestOps/nginx.conf). Con gthread y gevent el
+# latido del worker no depende de las solicitudes, así que 'timeout' solo reinicia procesos
+# colgados y debe superar a la clase más larga
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 330))
+# Al reiniciar o detener (SIGTERM), tiempo para terminar las solicitudes en curso; docker-compose
+# espera stop_grace_period (60 s) antes de matar el contenedor
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 50))
+# nginx reutiliza las conexiones al upstream
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Reciclar procesos cada tanto acota la memoria que pueda retener un worker
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# Con preload la app se importa una sola vez en el master y los workers la heredan al hacer fork:
+# arrancan en milisegundos y comparten (copy-on-write) la memoria del código importado. Con gevent
+# queda desactivado por defecto: el parcheo de la stdlib ocurre después del fork y los locks creados
+# al importar no serían cooperativos. Con preload, 'kill -HUP' no recarga el código (hay que reiniciar)
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false' if worker_class == 'gevent' else 'true').lower() == 'true'
+
+# Dependencias que la app importa recién al usarlas (exportación, importación, vistas previas):
+# con preload se cargan en el master para que los workers no las dupliquen en memoria
+MODULOS_PRECARGADOS = [modulo for modulo in os.getenv('GUNICORN_PRECARGAR', 'xlsxwriter,openpyxl,PIL.Image').split(',') if modulo]
+
+# Los workers comparten las métricas de Prometheus (/internal/metrics/prometheus) por archivos:
+# cualquier worker que atienda el scrape devuelve la suma de todos (METRICAS_FOLDER= lo desactiva)
+metricas_folder = os.environ.setdefault('METRICAS_FOLDER', os.path.join(tempfile.gettempdir(), 'gestops-metricas'))
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-') or None
+errorlog = '-'
+
+def on_starting(server):
+    if metricas_folder:
+        from main.metrics.functions import limpiar_metricas
+        limpiar_metricas(metricas_folder)
+    server.log.info(
+        'Perfil: %s, %s workers x %s hilos%s, pool por worker %s+%s (%s conexiones en total)',
+        worker_class, workers, threads,
+        f', {worker_connections} conexiones por worker' if worker_class == 'gevent' else '',
+        os.environ['DB_POOL_SIZE'], os.environ['DB_POOL_MAX_OVERFLOW'],
+        workers * conexiones_por_worker,
+    )
+
+def when_ready(server):
+    if not preload_app:
+        return
+    for modulo in MODULOS_PRECARGADOS:
+        try:
+            importlib.import_module(modulo)
+        except ImportError:
+            server.log.warning('No se pudo precargar %s', modulo)
+    # Lo importado pasa a la generación permanente: el GC de los workers no lo recorre ni
+    # escribe sus encabezados, así que esas páginas siguen compartidas con el master
+    gc.freeze()
+
+def post_fork(server, worker):
+    # Las conexiones que el master haya abierto no se comparten con los workers
+    if preload_app:
+        from main import db
+        with server.app.wsgi().app_context():
+            db.engine.dispose(close=False)
+
+def worker_exit(server, worker):
+    # Últimas solicitudes del worker que todavía no se habían volcado
+    if metricas_folder:
+        from main.metrics.functions import guardar_metricas
+        guardar_metricas(metricas_folder)
+
+def child_exit(server, worker):
+    # El archivo del worker terminado pasa al acumulado: los contadores no retroceden
+    if metricas_folder:
+        from main.metrics.functions import acumular_metricas
+        acumular_metricas(metricas_folder, worker.pid)
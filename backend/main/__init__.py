@@ -58,8 +58,42 @@ def configure_cors(app):
     
     app.logger.info(f"CORS configurado para: {allowed_origins}")
 
+def configure_engine(database_uri):
+    """
+    Opciones del pool de conexiones tomadas de variables de entorno
+    pool_recycle debe ser menor que el wait_timeout de MariaDB y pool_pre_ping
+    descarta las conexiones que el servidor ya cerró antes de entregarlas
+    """
+    # SQLite en memoria usa un pool de una sola conexión: no admite estas opciones
+    if database_uri.startswith('sqlite') and (database_uri in ('sqlite://', 'sqlite:///') or ':memory:' in database_uri):
+        return {}
+
+    from main.metrics.functions import PoolMedido
+
+    options = {
+        'poolclass': PoolMedido,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 280)),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    }
+
+    if database_uri.startswith('mysql'):
+        options['connect_args'] = {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            'read_timeout': int(os.getenv('DB_READ_TIMEOUT', 60)),
+            'write_timeout': int(os.getenv('DB_WRITE_TIMEOUT', 60)),
+        }
+
+    return options
+
 def create_app():
     app = Flask(__name__)
+
+    # Los adjuntos se escriben en streaming al volumen de uploads (ver main.adjuntos)
+    from main.adjuntos.functions import RequestConAdjuntos
+    app.request_class = RequestConAdjuntos
     
     load_dotenv()
 
@@ -75,9 +109,46 @@ def create_app():
     db_host = os.getenv('DB_HOST')
     db_port = os.getenv('DB_PORT')
     db_name = os.getenv('DB_NAME')
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
+    # DATABASE_URL permite apuntar a otra base (p. ej. SQLite para los benchmarks)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or f'mysql+pymysql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = configure_engine(app.config['SQLALCHEMY_DATABASE_URI'])
     
     app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER')
+    # Prefijo de la location interna de nginx que sirve los adjuntos (vacío: los envía Flask)
+    app.config['ADJUNTOS_X_ACCEL'] = os.getenv('ADJUNTOS_X_ACCEL')
+    # Segundos que el navegador puede reusar un adjunto sin revalidarlo (0: siempre revalida con ETag)
+    app.config['ADJUNTOS_CACHE_MAX_AGE'] = int(os.getenv('ADJUNTOS_CACHE_MAX_AGE', 0))
+
+    # Trabajos en segundo plano (main.trabajos): archivos de entrada/resultado, tiempo máximo
+    # de un trabajo en curso antes de considerarlo colgado y días que se conservan los terminados
+    app.config['TRABAJOS_FOLDER'] = os.getenv('TRABAJOS_FOLDER') or os.path.join(app.config['UPLOAD_FOLDER'] or '.', 'trabajos')
+    app.config['TRABAJOS_TIMEOUT'] = int(os.getenv('TRABAJOS_TIMEOUT', 1800))
+    app.config['TRABAJOS_RETENCION_DIAS'] = int(os.getenv('TRABAJOS_RETENCION_DIAS', 7))
+    # Sin el servicio 'worker' (docker-compose), los trabajos se ejecutan en un hilo de cada proceso web
+    app.config['TRABAJOS_EN_PROCESO'] = os.getenv('TRABAJOS_EN_PROCESO', 'false').lower() == 'true'
+
+    # Cache de los GET de catálogos (main.catalogos): segundos de vida de cada respuesta (0 la desactiva)
+    # y directorio con la versión de cada catálogo, compartido por los procesos para invalidar en todos
+    app.config['CACHE_CATALOGOS_TTL'] = int(os.getenv('CACHE_CATALOGOS_TTL', 300))
+    app.config['CACHE_CATALOGOS_FOLDER'] = os.getenv('CACHE_CATALOGOS_FOLDER') or (
+        os.path.join(app.config['UPLOAD_FOLDER'], '.cache', 'catalogos') if app.config['UPLOAD_FOLDER'] else None
+    )
+
+    # Serializador de las respuestas JSON de la API (main.serializacion): 'orjson' o 'json'
+    from main.serializacion.functions import serializador_por_defecto, SERIALIZADORES
+    app.config['JSON_SERIALIZADOR'] = os.getenv('JSON_SERIALIZADOR') or serializador_por_defecto()
+    if app.config['JSON_SERIALIZADOR'] not in SERIALIZADORES:
+        raise ValueError(f"JSON_SERIALIZADOR inválido: debe ser uno de {', '.join(SERIALIZADORES)}")
+
+    # Instrumentación por solicitud (main.metrics): encabezado Server-Timing, umbrales en ms para
+    # registrar sentencias SQL y solicitudes lentas (0 lo desactiva) y directorio donde los
+    # procesos comparten sus métricas (vacío: cada proceso expone solo las propias)
+    app.config['SERVER_TIMING'] = os.getenv('SERVER_TIMING', 'true').lower() == 'true'
+    app.config['SQL_LENTA_MS'] = int(os.getenv('SQL_LENTA_MS', 500))
+    app.config['SOLICITUD_LENTA_MS'] = int(os.getenv('SOLICITUD_LENTA_MS', 2000))
+    app.config['METRICAS_FOLDER'] = os.getenv('METRICAS_FOLDER')
+    from main.metrics.functions import instrumentar
+    instrumentar(app)
 
     db.init_app(app)
     
@@ -92,7 +163,12 @@ def create_app():
     api.add_resource(resources.OperacionesTotalesResource, "/api/operaciones/totales")
     api.add_resource(resources.ArchivosOperacionesResource, "/api/operaciones/<int:id_operacion>/archivos")
     api.add_resource(resources.ArchivoOperacionResource, "/api/operacion/<int:id_operacion>/archivo/<string:campo_archivo>")
+    api.add_resource(resources.ArchivoOperacionPreviewResource, "/api/operacion/<int:id_operacion>/archivo/<string:campo_archivo>/preview")
     api.add_resource(resources.OperacionesExcelResource, "/api/operaciones/excel")
+    api.add_resource(resources.OperacionesImportarResource, "/api/operaciones/importar")
+    api.add_resource(resources.TrabajosResource, "/api/trabajos")
+    api.add_resource(resources.TrabajoResource, "/api/trabajo/<int:id>")
+    api.add_resource(resources.TrabajoResultadoResource, "/api/trabajo/<int:id>/resultado")
     api.add_resource(resources.ConceptosResource,"/api/conceptos")
     api.add_resource(resources.ConceptoResource, "/api/concepto/<int:id>")
     api.add_resource(resources.CategoriasResource,"/api/categorias")
@@ -101,18 +177,35 @@ def create_app():
     api.add_resource(resources.SubcategoriaResource, "/api/subcategoria/<int:id>")
     api.add_resource(resources.PersonasResource,"/api/personas")
     api.add_resource(resources.PersonaResource, "/api/persona/<int:id>")
+    api.add_resource(resources.CatalogoJerarquiaResource, "/api/catalogos/jerarquia")
 
     api.init_app(app)
+
+    if app.config['TRABAJOS_EN_PROCESO']:
+        from main.trabajos.functions import iniciar_worker_en_proceso
+        app.before_request(lambda: iniciar_worker_en_proceso(app))
     
     # JWT configuration
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES'))
+    # Verificar el rol contra la base (con cache por TTL) en vez de confiar solo en el token. Al modificar
+    # un usuario, la versión en CACHE_CATALOGOS_FOLDER invalida la cache de todos los procesos
+    app.config['AUTH_VERIFICAR_USUARIO'] = os.getenv('AUTH_VERIFICAR_USUARIO', 'false').lower() == 'true'
+    app.config['AUTH_CACHE_TTL'] = int(os.getenv('AUTH_CACHE_TTL', 60))
     jwt.init_app(app)
 
     # Registration of authentication routes
     from main.auth import routes
     app.register_blueprint(routes.auth)
 
+    # Métricas internas (no expuestas a través del proxy)
+    from main.metrics import routes as metrics_routes
+    app.register_blueprint(metrics_routes.metrics)
+
+    # Comandos de mantenimiento (flask <comando>)
+    from main.cli.commands import register_commands
+    register_commands(app)
+
     # Flask-Mail configuration for email sending
     app.config['MAIL_HOSTNAME'] = os.getenv('MAIL_HOSTNAME')
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
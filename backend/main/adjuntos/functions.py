@@ -0,0 +1,330 @@
+from flask import Request, request, current_app, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+from sqlalchemy import update, delete, select
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from main.models import BlobModel, OperacionModel
+from main.config.file_config import MAX_FILE_SIZE, MAX_FILENAME_LENGTH
+import glob, hashlib, mimetypes, os, re, shutil, tempfile, time
+
+# Campos de archivo de una operación
+CAMPOS_ARCHIVO = ['comprobante', 'archivo1', 'archivo2', 'archivo3']
+
+# Subdirectorio de UPLOAD_FOLDER para las subidas en curso (mismo volumen: el rename es atómico)
+DIRECTORIO_TEMPORAL = '.tmp'
+
+# Subdirectorio de UPLOAD_FOLDER con los contenidos, repartidos en blobs/ab/cd/<sha256>
+DIRECTORIO_BLOBS = 'blobs'
+
+# Valor de los campos *_path que apuntan a un blob: '<sha256>/<nombre original>'
+REFERENCIA_BLOB = re.compile(r'^([0-9a-f]{64})/(.+)$')
+
+# Tamaño de bloque para copiar y hashear archivos
+TAMANO_BLOQUE = 1024 * 1024
+
+# Margen para encabezados multipart y campos de texto sobre el tamaño de los archivos
+MARGEN_MULTIPART = 64 * 1024
+
+MENSAJE_EXCEDIDO = f'Los archivos no pueden superar el tamaño máximo permitido de {MAX_FILE_SIZE // (1024 * 1024)}MB'
+
+class ArchivoEntrante:
+    """
+    Destino de un archivo multipart: escribe los bloques a medida que llegan en un
+    temporal del volumen de uploads, calcula el SHA-256 y corta al superar el límite
+    """
+
+    def __init__(self, directorio, limite=MAX_FILE_SIZE):
+        os.makedirs(directorio, exist_ok=True)
+        descriptor, self.path = tempfile.mkstemp(dir=directorio, suffix='.part')
+        self._archivo = os.fdopen(descriptor, 'w+b')
+        self._hash = hashlib.sha256()
+        self.limite = limite
+        self.tamano = 0
+        self.guardado = False
+
+    def write(self, datos):
+        self.tamano += len(datos)
+        if self.tamano > self.limite:
+            raise RequestEntityTooLarge(MENSAJE_EXCEDIDO)
+        self._hash.update(datos)
+        return self._archivo.write(datos)
+
+    def __getattr__(self, nombre):
+        # read, readline, seek, tell, flush... se delegan al archivo temporal
+        return getattr(self._archivo, nombre)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def guardar(self, destino):
+        """Persiste el temporal en disco y lo mueve a su nombre definitivo con un rename atómico"""
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._archivo.close()
+        os.replace(self.path, destino)
+        self.guardado = True
+
+    def close(self):
+        self._archivo.close()
+        if not self.guardado:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+class RequestConAdjuntos(Request):
+    """Request que, en las vistas que llaman a recibir_adjuntos(), escribe los archivos
+    directo al volumen de uploads en vez de a un temporal del sistema"""
+
+    directorio_adjuntos = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.directorio_adjuntos is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        if content_length is not None and content_length > MAX_FILE_SIZE:
+            raise RequestEntityTooLarge(MENSAJE_EXCEDIDO)
+
+        archivo = ArchivoEntrante(self.directorio_adjuntos)
+        # Se registran aparte: si el parseo se corta, todavía no están en request.files
+        self.__dict__.setdefault('_archivos_entrantes', []).append(archivo)
+        return archivo
+
+    def close(self):
+        super().close()
+        for archivo in self.__dict__.get('_archivos_entrantes', []):
+            archivo.close()
+
+def recibir_adjuntos(upload_folder):
+    """Debe llamarse antes de acceder a request.files. Limita el cuerpo de la solicitud
+    (se rechaza antes de leerlo si el Content-Length ya lo supera) y activa la escritura en streaming"""
+    request.max_content_length = MAX_FILE_SIZE * len(CAMPOS_ARCHIVO) + MARGEN_MULTIPART
+    request.directorio_adjuntos = os.path.join(upload_folder, DIRECTORIO_TEMPORAL)
+
+def ruta_blob(sha256, upload_folder):
+    """Dos niveles de subdirectorios (65.536 en total) mantienen chicos los listados con millones de archivos"""
+    return os.path.join(upload_folder, DIRECTORIO_BLOBS, sha256[:2], sha256[2:4], sha256)
+
+def ruta_adjunto(valor, upload_folder):
+    """Ruta física del valor de un campo *_path (blob o archivo anterior a los blobs)"""
+    referencia = REFERENCIA_BLOB.match(valor)
+    if referencia:
+        return ruta_blob(referencia.group(1), upload_folder)
+    return os.path.join(upload_folder, valor)
+
+def _referenciar_blob(sha256, tamano, content_type):
+    """Suma una referencia al blob (lo crea si no existe). El UPDATE bloquea la fila,
+    así que no se cruza con purgar_blobs() borrando el mismo contenido"""
+    resultado = db.session.execute(
+        update(BlobModel).where(BlobModel.sha256 == sha256).values(referencias=BlobModel.referencias + 1)
+    )
+    if resultado.rowcount:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(BlobModel(sha256=sha256, tamano=tamano, content_type=content_type, referencias=1))
+    except IntegrityError:
+        # Otro proceso lo creó en paralelo
+        db.session.execute(
+            update(BlobModel).where(BlobModel.sha256 == sha256).values(referencias=BlobModel.referencias + 1)
+        )
+
+def guardar_adjunto(file, upload_folder):
+    """Guarda el archivo en el store de blobs y devuelve el valor para el campo *_path.
+    Si el contenido ya existe solo se suma una referencia y el temporal se descarta"""
+    archivo = file.stream
+    if not isinstance(archivo, ArchivoEntrante):
+        archivo = ArchivoEntrante(os.path.join(upload_folder, DIRECTORIO_TEMPORAL), limite=float('inf'))
+        shutil.copyfileobj(file.stream, archivo, TAMANO_BLOQUE)
+
+    sha256 = archivo.sha256
+    _referenciar_blob(sha256, archivo.tamano, file.content_type)
+
+    # Después de referenciarlo: si se estaba purgando, el archivo ya se borró y se vuelve a escribir
+    destino = ruta_blob(sha256, upload_folder)
+    if os.path.exists(destino):
+        archivo.close()
+    else:
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        archivo.guardar(destino)
+
+    nombre = secure_filename(file.filename) or 'archivo'
+    largo_maximo = MAX_FILENAME_LENGTH - len(sha256) - 1
+    if len(nombre) > largo_maximo:
+        base, extension = os.path.splitext(nombre)
+        nombre = base[:largo_maximo - len(extension)] + extension
+
+    return f'{sha256}/{nombre}'
+
+def enviar_adjunto(valor, upload_folder):
+    """
+    Respuesta con el adjunto: ETag fuerte (el SHA-256 del blob), 304 ante If-None-Match,
+    rangos de bytes y Cache-Control privado. Con ADJUNTOS_X_ACCEL configurado solo se
+    validan los encabezados y nginx envía los bytes (X-Accel-Redirect)
+    """
+    full_path = ruta_adjunto(valor, upload_folder)
+    if not os.path.exists(full_path):
+        return None
+
+    referencia = REFERENCIA_BLOB.match(valor)
+    # Los archivos anteriores a los blobs usan el ETag de Werkzeug (fecha de modificación y tamaño)
+    etag = referencia.group(1) if referencia else True
+    nombre = os.path.basename(valor)
+    prefijo_x_accel = current_app.config.get('ADJUNTOS_X_ACCEL')
+
+    if prefijo_x_accel:
+        respuesta = current_app.response_class(
+            mimetype=mimetypes.guess_type(nombre)[0] or 'application/octet-stream'
+        )
+        respuesta.headers.set('Content-Disposition', 'inline', filename=nombre)
+        estado = os.stat(full_path)
+        respuesta.set_etag(etag if referencia else f'{estado.st_mtime}-{estado.st_size}')
+        respuesta.last_modified = estado.st_mtime
+        respuesta.make_conditional(request)
+        # Solo si hay que enviar el archivo: nginx atiende X-Accel-Redirect aunque la respuesta
+        # sea un 304 o un 412, y mandaría el archivo completo igual
+        if respuesta.status_code in (200, 206):
+            respuesta.headers['X-Accel-Redirect'] = prefijo_x_accel.rstrip('/') + '/' + os.path.relpath(full_path, upload_folder)
+    else:
+        # El blob no tiene extensión: el tipo de contenido se deduce del nombre original
+        respuesta = send_file(full_path, download_name=nombre, etag=etag, conditional=True)
+
+    return aplicar_cache_adjunto(respuesta)
+
+def aplicar_cache_adjunto(respuesta):
+    """Cache-Control privado (las descargas requieren autenticación) según ADJUNTOS_CACHE_MAX_AGE"""
+    max_age = current_app.config.get('ADJUNTOS_CACHE_MAX_AGE', 0)
+    respuesta.cache_control.public = False
+    respuesta.cache_control.private = True
+    if max_age:
+        respuesta.cache_control.max_age = max_age
+        respuesta.cache_control.no_cache = None
+    else:
+        # Siempre se revalida: un PATCH puede cambiar el archivo detrás de la misma URL
+        respuesta.cache_control.no_cache = True
+    return respuesta
+
+def liberar_adjunto(valor, upload_folder):
+    """Quita una referencia al contenido. Los blobs sin referencias los borra purgar_blobs();
+    los archivos anteriores a los blobs se eliminan directamente"""
+    if not valor:
+        return
+
+    referencia = REFERENCIA_BLOB.match(valor)
+    if referencia:
+        db.session.execute(
+            update(BlobModel)
+            .where(BlobModel.sha256 == referencia.group(1), BlobModel.referencias > 0)
+            .values(referencias=BlobModel.referencias - 1)
+        )
+        return
+
+    full_path = os.path.join(upload_folder, valor)
+    if os.path.exists(full_path):
+        os.remove(full_path)
+
+def purgar_blobs(upload_folder, tamano_lote=500):
+    """Borra los blobs sin referencias: fila y archivo en la misma transacción, con la fila bloqueada"""
+    purgados = 0
+    while True:
+        blobs = db.session.execute(
+            select(BlobModel.sha256).where(BlobModel.referencias == 0).limit(tamano_lote).with_for_update()
+        ).scalars().all()
+        if not blobs:
+            return purgados
+
+        for sha256 in blobs:
+            # El contenido y sus derivados (vistas previas) comparten el prefijo <sha256>
+            for path in glob.glob(ruta_blob(sha256, upload_folder) + '*'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        db.session.execute(delete(BlobModel).where(BlobModel.sha256.in_(blobs), BlobModel.referencias == 0))
+        db.session.commit()
+        purgados += len(blobs)
+
+def purgar_huerfanos(upload_folder, antiguedad=3600):
+    """Borra archivos de blobs sin fila (p. ej. de una subida cuyo commit falló) y temporales viejos"""
+    limite = time.time() - antiguedad
+    registrados = set(db.session.execute(select(BlobModel.sha256)).scalars())
+    borrados = 0
+
+    for directorio in (DIRECTORIO_BLOBS, DIRECTORIO_TEMPORAL):
+        for raiz, _, archivos in os.walk(os.path.join(upload_folder, directorio)):
+            for nombre in archivos:
+                path = os.path.join(raiz, nombre)
+                if nombre.split('.')[0] not in registrados and os.path.getmtime(path) < limite:
+                    os.remove(path)
+                    borrados += 1
+    return borrados
+
+def _hashear(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE), b''):
+            sha256.update(bloque)
+    return sha256.hexdigest()
+
+def migrar_adjuntos(upload_folder, tamano_lote=200):
+    """Pasa los adjuntos guardados como '<uuid>_<nombre>' al store de blobs, deduplicando por contenido.
+    Los originales se borran recién después del commit de cada lote; se puede volver a ejecutar"""
+    campos = [f'{campo}_path' for campo in CAMPOS_ARCHIVO]
+    columnas = [getattr(OperacionModel, campo) for campo in campos]
+    ultimo_id = 0
+    resultado = {'operaciones_revisadas': 0, 'archivos': 0, 'faltantes': 0, 'bytes_liberados': 0}
+
+    while True:
+        operaciones = (
+            OperacionModel.query
+            .filter(OperacionModel.id > ultimo_id)
+            .filter(db.or_(*[columna.isnot(None) for columna in columnas]))
+            .order_by(OperacionModel.id)
+            .limit(tamano_lote)
+            .all()
+        )
+        if not operaciones:
+            return resultado
+
+        originales = []
+        for operacion in operaciones:
+            ultimo_id = operacion.id
+            for campo in campos:
+                valor = getattr(operacion, campo)
+                if not valor or REFERENCIA_BLOB.match(valor):
+                    continue
+
+                origen = os.path.join(upload_folder, valor)
+                if not os.path.exists(origen):
+                    resultado['faltantes'] += 1
+                    continue
+
+                sha256 = _hashear(origen)
+                tamano = os.path.getsize(origen)
+                _referenciar_blob(sha256, tamano, None)
+
+                destino = ruta_blob(sha256, upload_folder)
+                if os.path.exists(destino):
+                    resultado['bytes_liberados'] += tamano
+                else:
+                    os.makedirs(os.path.dirname(destino), exist_ok=True)
+                    # Copia (no rename) para no perder el original si el lote no se confirma
+                    temporal = destino + '.part'
+                    shutil.copyfile(origen, temporal)
+                    os.replace(temporal, destino)
+
+                nombre = re.sub(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_', '', valor)
+                setattr(operacion, campo, f'{sha256}/{nombre}'[:MAX_FILENAME_LENGTH])
+                originales.append(origen)
+                resultado['archivos'] += 1
+            resultado['operaciones_revisadas'] += 1
+
+        db.session.commit()
+        db.session.expunge_all()
+
+        for origen in originales:
+            if os.path.exists(origen):
+                os.remove(origen)
@@ -1,7 +1,48 @@
-from .. import jwt
-from flask import jsonify
+from .. import jwt, db
+from flask import jsonify, g, current_app
 from flask_jwt_extended import verify_jwt_in_request, get_jwt
 from functools import wraps
+from collections import namedtuple
+import time
+
+# Usuario autenticado de la request: se arma una vez en role_required a partir de los claims
+UsuarioActual = namedtuple('UsuarioActual', ['id', 'rol', 'email'])
+
+# Cache opcional de usuarios (id -> (UsuarioActual, vencimiento, versión)), por proceso
+_cache_usuarios = {}
+
+# Versión de los usuarios en el directorio compartido de main.catalogos: modificar o eliminar un
+# usuario la cambia y todos los workers descartan lo cacheado, sin esperar a AUTH_CACHE_TTL
+VERSION_USUARIOS = 'usuario'
+
+def usuario_actual():
+    """Devuelve el usuario autenticado de la request sin consultar la base de datos"""
+    return g.usuario_actual
+
+def obtener_usuario_cacheado(id):
+    """Lee el usuario de la base como mucho una vez cada AUTH_CACHE_TTL segundos, o antes si
+    algún proceso modificó usuarios desde entonces"""
+    from main.catalogos.functions import version
+
+    ahora = time.monotonic()
+    vigente = version(VERSION_USUARIOS)
+    cacheado = _cache_usuarios.get(id)
+    if cacheado and cacheado[1] > ahora and cacheado[2] == vigente:
+        return cacheado[0]
+
+    from main.models import UsuarioModel
+    usuario = db.session.get(UsuarioModel, id)
+    valor = UsuarioActual(usuario.id, usuario.rol, usuario.email) if usuario else None
+
+    _cache_usuarios[id] = (valor, ahora + current_app.config['AUTH_CACHE_TTL'], vigente)
+    return valor
+
+def invalidar_usuario(id):
+    """Descarta el usuario cacheado (al modificarlo o eliminarlo) en este y en los demás procesos"""
+    from main.catalogos.functions import invalidar
+
+    _cache_usuarios.pop(id, None)
+    invalidar(VERSION_USUARIOS)
 
 def role_required(roles):
     def decorator(fn):
@@ -10,7 +51,16 @@ def role_required(roles):
             try:
                 verify_jwt_in_request()
                 claims = get_jwt()
-                if claims['rol'] in roles:
+                usuario = UsuarioActual(int(claims['id']), claims['rol'], claims.get('email'))
+
+                # Opcional: tomar el rol vigente de la base (cacheado) en lugar del emitido en el token
+                if current_app.config.get('AUTH_VERIFICAR_USUARIO'):
+                    usuario = obtener_usuario_cacheado(usuario.id)
+                    if usuario is None:
+                        return {"error": "Usuario inexistente", "code": "INVALID_TOKEN"}, 401
+
+                g.usuario_actual = usuario
+                if usuario.rol in roles:
                     return fn(*args, **kwargs)
                 else:
                     return {"message": "Rol sin permisos de acceso al recurso"}, 403
@@ -3,7 +3,7 @@ from .. import db
 from main.models import UsuarioModel
 from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity, decode_token
 from main.auth.decorators import role_required
-from main.mail.functions import sendMail
+from main.mail.functions import encolar_correo
 from datetime import timedelta
 import secrets
 import os
@@ -44,10 +44,12 @@ def register():
         usuario.plain_password = new_password
 
         db.session.add(usuario)
-        db.session.commit()
 
+        # Queda en la bandeja de salida y lo envía el worker: la respuesta no espera al servidor SMTP.
+        # Va en la misma transacción que el usuario: sin el correo nadie conocería la contraseña
         frontend_url = os.getenv('FRONTEND_URL')
-        sendMail([usuario.email], "Bienvenido!", 'register', new_password=new_password, usuario=usuario, frontend_url=frontend_url)
+        encolar_correo([usuario.email], "Bienvenido!", 'register', commit=False, new_password=new_password, usuario=usuario, frontend_url=frontend_url)
+        db.session.commit()
 
     except Exception as error:
         db.session.rollback()
@@ -80,7 +82,7 @@ def forgot_password():
         reset_token = create_access_token(identity=usuario, additional_claims=additional_claims)
 
         frontend_url = os.getenv('FRONTEND_URL')
-        sendMail([email], 'Restablecer Contraseña', 'resetpassword', reset_token=reset_token, usuario=usuario, frontend_url=frontend_url)
+        encolar_correo([email], 'Restablecer Contraseña', 'resetpassword', reset_token=reset_token, usuario=usuario, frontend_url=frontend_url)
 
         return {'message': '...'}, 200
         
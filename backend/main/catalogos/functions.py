@@ -0,0 +1,203 @@
+from .. import api, db
+from main.models import ConceptoModel, CategoriaModel, SubcategoriaModel, PersonaModel
+from flask import request, current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from itertools import chain
+import gzip, hashlib, os, threading, time, uuid
+
+# Catálogo de cada modelo (para invalidar al escribirlo)
+CATALOGOS = {
+    ConceptoModel: 'concepto',
+    CategoriaModel: 'categoria',
+    SubcategoriaModel: 'subcategoria',
+    PersonaModel: 'persona',
+}
+
+# Catálogos de los que depende la respuesta de cada uno: Subcategoria.to_json anida la
+# categoría y esta el concepto, así que renombrar un concepto invalida los tres
+DEPENDENCIAS = {
+    'concepto': ('concepto',),
+    'categoria': ('categoria', 'concepto'),
+    'subcategoria': ('subcategoria', 'categoria', 'concepto'),
+    'persona': ('persona',),
+}
+
+class CacheLRU:
+    """Diccionario acotado a 'maximo' entradas (descarta la menos usada) y con vencimiento por entrada"""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            valor, vencimiento = entrada
+            if vencimiento <= time.monotonic():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor, ttl):
+        with self._lock:
+            self._entradas[clave] = (valor, time.monotonic() + ttl)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+
+# Respuestas serializadas: (endpoint, argumentos, versiones) -> (cuerpo, content type, etag, cuerpo gzip)
+_respuestas = CacheLRU(maximo=256)
+
+# Versiones de cada catálogo en este proceso (si no hay directorio compartido)
+_versiones = {}
+
+def _archivo_version(catalogo):
+    directorio = current_app.config.get('CACHE_CATALOGOS_FOLDER')
+    return os.path.join(directorio, catalogo) if directorio else None
+
+def version(catalogo):
+    """Versión vigente del catálogo. Con CACHE_CATALOGOS_FOLDER se lee de un archivo que comparten
+    todos los procesos (workers de gunicorn y worker de trabajos); si no, es propia del proceso"""
+    archivo = _archivo_version(catalogo)
+    if archivo:
+        try:
+            with open(archivo, encoding='ascii') as f:
+                return f.read()
+        except OSError:
+            pass
+    return _versiones.get(catalogo, '0')
+
+def invalidar(*catalogos):
+    """Cambia la versión de los catálogos: las respuestas cacheadas con la anterior dejan de usarse"""
+    for catalogo in catalogos:
+        nueva = uuid.uuid4().hex[:16]
+        _versiones[catalogo] = nueva
+
+        archivo = _archivo_version(catalogo)
+        if archivo:
+            try:
+                os.makedirs(os.path.dirname(archivo), exist_ok=True)
+                temporal = f'{archivo}.{os.getpid()}.tmp'
+                with open(temporal, 'w', encoding='ascii') as f:
+                    f.write(nueva)
+                os.replace(temporal, archivo)
+            except OSError:
+                current_app.logger.warning('No se pudo escribir la versión del catálogo %s', catalogo, exc_info=True)
+
+def versiones(catalogo):
+    return '-'.join(version(dependencia) for dependencia in DEPENDENCIAS[catalogo])
+
+def responder_cacheado(clave, generar, comprimir=False):
+    """Devuelve la respuesta JSON cacheada para 'clave' o la genera con generar() -> (datos, status).
+    Responde 304 si el cliente ya tiene la misma versión (If-None-Match). Con 'comprimir' se
+    guarda también el cuerpo en gzip, para los clientes que lo aceptan"""
+    ttl = current_app.config.get('CACHE_CATALOGOS_TTL', 0)
+    cacheado = _respuestas.get(clave) if ttl > 0 else None
+
+    if cacheado is None:
+        resultado = generar()
+        datos, status = resultado[:2] if isinstance(resultado, tuple) else (resultado, 200)
+        if status != 200:
+            return resultado
+
+        respuesta = api.make_response(datos, 200)
+        cuerpo = respuesta.get_data()
+        cacheado = (
+            cuerpo,
+            respuesta.headers['Content-Type'],
+            hashlib.sha1(cuerpo).hexdigest(),
+            gzip.compress(cuerpo, compresslevel=6) if comprimir else None,
+        )
+        if ttl > 0:
+            _respuestas.set(clave, cacheado, ttl)
+
+    cuerpo, content_type, etag, cuerpo_gzip = cacheado
+    usar_gzip = cuerpo_gzip is not None and 'gzip' in request.accept_encodings
+
+    respuesta = current_app.response_class(cuerpo_gzip if usar_gzip else cuerpo, status=200, content_type=content_type)
+    if cuerpo_gzip is not None:
+        respuesta.vary.add('Accept-Encoding')
+    if usar_gzip:
+        respuesta.headers['Content-Encoding'] = 'gzip'
+    # La representación comprimida es otra entidad: su ETag no puede coincidir con la del cuerpo plano
+    respuesta.set_etag(f'{etag}-gzip' if usar_gzip else etag)
+    # Datos de usuarios autenticados: el navegador los guarda pero los revalida en cada uso
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta.make_conditional(request)
+
+def cache_catalogo(catalogo):
+    """Cachea las respuestas GET de un catálogo por endpoint y argumentos de la query.
+    Va debajo de role_required: la autorización se sigue verificando en cada request"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            clave = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                versiones(catalogo),
+            )
+            return responder_cacheado(clave, lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
+
+def jerarquia():
+    """Árbol concepto -> categorías -> subcategorías con una consulta por tabla (sin lazy loads por fila)"""
+    conceptos = db.session.execute(
+        select(ConceptoModel.id, ConceptoModel.nombre).order_by(ConceptoModel.nombre, ConceptoModel.id)
+    ).all()
+    categorias = db.session.execute(
+        select(CategoriaModel.id, CategoriaModel.nombre, CategoriaModel.id_concepto)
+        .order_by(CategoriaModel.nombre, CategoriaModel.id)
+    ).all()
+    subcategorias = db.session.execute(
+        select(SubcategoriaModel.id, SubcategoriaModel.nombre, SubcategoriaModel.id_categoria)
+        .order_by(SubcategoriaModel.nombre, SubcategoriaModel.id)
+    ).all()
+
+    subcategorias_por_categoria = defaultdict(list)
+    for subcategoria in subcategorias:
+        subcategorias_por_categoria[subcategoria.id_categoria].append({'id': subcategoria.id, 'nombre': subcategoria.nombre})
+
+    categorias_por_concepto = defaultdict(list)
+    for categoria in categorias:
+        categorias_por_concepto[categoria.id_concepto].append({
+            'id': categoria.id,
+            'nombre': categoria.nombre,
+            'subcategorias': subcategorias_por_categoria.get(categoria.id, []),
+        })
+
+    return [
+        {'id': concepto.id, 'nombre': concepto.nombre, 'categorias': categorias_por_concepto.get(concepto.id, [])}
+        for concepto in conceptos
+    ]
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_catalogos_modificados(session, flush_context):
+    modificados = {
+        CATALOGOS[type(objeto)] for objeto in chain(session.new, session.dirty, session.deleted)
+        if type(objeto) in CATALOGOS
+    }
+    if modificados:
+        session.info.setdefault('catalogos_modificados', set()).update(modificados)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_catalogos_modificados(session):
+    modificados = session.info.pop('catalogos_modificados', None)
+    if modificados:
+        invalidar(*modificados)
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_catalogos_modificados(session):
+    session.info.pop('catalogos_modificados', None)
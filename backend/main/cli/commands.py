@@ -0,0 +1,130 @@
+import click
+from flask.cli import with_appcontext
+
+@click.command('actualizar-esquema')
+@click.option('--revision', default='head', show_default=True, help='Revisión destino')
+@click.option('--sql', is_flag=True, help='Muestra el SQL en lugar de ejecutarlo (para aplicarlo a mano)')
+@with_appcontext
+def actualizar_esquema(revision, sql):
+    """Aplica las migraciones pendientes (migrations/versions). Se corre una vez al desplegar"""
+    from alembic import command
+    from main.migraciones.functions import configuracion_alembic
+    command.upgrade(configuracion_alembic(), revision, sql=sql)
+    if not sql:
+        click.echo(f'Esquema actualizado a {revision}')
+
+@click.command('nueva-migracion')
+@click.option('-m', '--mensaje', required=True, help='Descripción corta de la migración')
+@with_appcontext
+def nueva_migracion(mensaje):
+    """Genera una migración comparando los modelos con la base (revisarla antes de commitear)"""
+    from alembic import command
+    from main.migraciones.functions import configuracion_alembic
+    command.revision(configuracion_alembic(), message=mensaje, autogenerate=True)
+
+@click.command('estado-esquema')
+@with_appcontext
+def estado_esquema():
+    """Muestra la revisión aplicada en la base y la última disponible"""
+    from alembic import command
+    from main.migraciones.functions import configuracion_alembic
+    configuracion = configuracion_alembic()
+    command.current(configuracion)
+    command.heads(configuracion)
+
+@click.command('reindexar-busqueda')
+@with_appcontext
+def reindexar_busqueda():
+    """Regenera el documento de búsqueda global de todas las operaciones"""
+    from main.search.functions import reindexar_operaciones
+    total = reindexar_operaciones()
+    click.echo(f'Operaciones reindexadas: {total}')
+
+@click.command('migrar-adjuntos')
+@with_appcontext
+def migrar_adjuntos():
+    """Pasa los adjuntos existentes al store de blobs deduplicado"""
+    from flask import current_app
+    from main.adjuntos.functions import migrar_adjuntos, purgar_blobs
+    resultado = migrar_adjuntos(current_app.config['UPLOAD_FOLDER'])
+    purgar_blobs(current_app.config['UPLOAD_FOLDER'])
+    click.echo(
+        f"Archivos migrados: {resultado['archivos']} de {resultado['operaciones_revisadas']} operaciones "
+        f"({resultado['faltantes']} faltantes, {resultado['bytes_liberados'] / 1024 / 1024:.1f} MB liberados por duplicados)"
+    )
+
+@click.command('purgar-adjuntos')
+@click.option('--huerfanos', is_flag=True, help='Borra también archivos sin registro en la tabla blob')
+@with_appcontext
+def purgar_adjuntos(huerfanos):
+    """Borra los blobs que ya no referencia ninguna operación"""
+    from flask import current_app
+    from main.adjuntos.functions import purgar_blobs, purgar_huerfanos
+    click.echo(f'Blobs sin referencias borrados: {purgar_blobs(current_app.config["UPLOAD_FOLDER"])}')
+    if huerfanos:
+        click.echo(f'Archivos huérfanos borrados: {purgar_huerfanos(current_app.config["UPLOAD_FOLDER"])}')
+
+@click.command('trabajos-worker')
+@click.option('--intervalo', default=2.0, help='Segundos de espera cuando no hay trabajos pendientes')
+@click.option('--una-vez', is_flag=True, help='Procesa los trabajos pendientes y termina')
+@with_appcontext
+def trabajos_worker(intervalo, una_vez):
+    """Ejecuta los trabajos en segundo plano (exportaciones, importaciones, correos)"""
+    import signal, threading
+    from main.trabajos.functions import ejecutar_worker
+
+    detener = threading.Event()
+    # docker stop envía SIGTERM: se termina el trabajo en curso y se sale
+    signal.signal(signal.SIGTERM, lambda *args: detener.set())
+    signal.signal(signal.SIGINT, lambda *args: detener.set())
+    ejecutar_worker(intervalo=intervalo, una_vez=una_vez, detener=detener)
+
+@click.command('enviar-correos')
+@with_appcontext
+def enviar_correos():
+    """Envía la bandeja de salida de correos (lo hace también el worker de trabajos)"""
+    from main.mail.functions import enviar_pendientes
+
+    total = 0
+    while enviados := enviar_pendientes():
+        total += enviados
+    click.echo(f'Correos enviados: {total}')
+
+@click.command('reconstruir-resumen')
+@with_appcontext
+def reconstruir_resumen():
+    """Recalcula el resumen mensual de operaciones desde cero"""
+    from main.resumen.functions import reconstruir_resumen
+    click.echo(f'Filas del resumen mensual: {reconstruir_resumen()}')
+
+@click.command('verificar-resumen')
+@click.option('--corregir', is_flag=True, help='Reconstruye el resumen si encuentra diferencias')
+@with_appcontext
+def verificar_resumen(corregir):
+    """Compara el resumen mensual con las operaciones; termina con código 1 si difieren"""
+    from main.resumen.functions import verificar_resumen, reconstruir_resumen
+
+    diferencias = verificar_resumen()
+    for diferencia in diferencias[:50]:
+        click.echo(f"{diferencia['clave']}: esperado {diferencia['esperado']}, actual {diferencia['actual']}")
+    if not diferencias:
+        click.echo('El resumen mensual coincide con las operaciones')
+        return
+
+    click.echo(f'Filas con diferencias: {len(diferencias)}')
+    if corregir:
+        click.echo(f'Resumen reconstruido: {reconstruir_resumen()} filas')
+    else:
+        raise SystemExit(1)
+
+def register_commands(app):
+    app.cli.add_command(actualizar_esquema)
+    app.cli.add_command(nueva_migracion)
+    app.cli.add_command(estado_esquema)
+    app.cli.add_command(reindexar_busqueda)
+    app.cli.add_command(migrar_adjuntos)
+    app.cli.add_command(purgar_adjuntos)
+    app.cli.add_command(trabajos_worker)
+    app.cli.add_command(enviar_correos)
+    app.cli.add_command(reconstruir_resumen)
+    app.cli.add_command(verificar_resumen)
@@ -0,0 +1,62 @@
+import csv, io, json
+
+# Cantidad de operaciones que se traen de la base por cada lote del cursor
+TAMANO_LOTE = 1000
+
+# Tamaño aproximado (en caracteres) de cada chunk enviado al cliente
+TAMANO_CHUNK = 64 * 1024
+
+def iterar_filas(query):
+    """Recorre la consulta por lotes con un cursor del lado del servidor y devuelve las filas de Excel"""
+    for operacion in query.yield_per(TAMANO_LOTE):
+        yield operacion.to_excel()
+
+def escribir_xlsx(filas, destino, columnas, hoja='Operaciones'):
+    """Escribe las filas en un xlsx con constant_memory: cada fila se vuelca a disco al completarse.
+    El encabezado sale de 'columnas', así que una exportación sin filas también lo tiene"""
+    # Solo lo usa la exportación: no se carga al iniciar cada worker
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(destino, {'constant_memory': True})
+    worksheet = workbook.add_worksheet(hoja)
+    encabezado = workbook.add_format({'bold': True, 'border': 1})
+
+    worksheet.write_row(0, 0, columnas, encabezado)
+    for numero, fila in enumerate(filas, start=1):
+        worksheet.write_row(numero, 0, list(fila.values()))
+
+    workbook.close()
+
+def generar_csv(filas, columnas):
+    """Genera el CSV en chunks para enviarlo con transferencia chunked. El encabezado sale de
+    'columnas', así que una exportación sin filas también lo tiene"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columnas)
+    for fila in filas:
+        writer.writerow(fila.values())
+
+        if buffer.tell() >= TAMANO_CHUNK:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+def generar_ndjson(filas):
+    """Genera un objeto JSON por línea, agrupando las líneas en chunks"""
+    chunk = []
+    tamano = 0
+
+    for fila in filas:
+        linea = json.dumps(fila, ensure_ascii=False) + '\n'
+        chunk.append(linea)
+        tamano += len(linea)
+
+        if tamano >= TAMANO_CHUNK:
+            yield ''.join(chunk)
+            chunk = []
+            tamano = 0
+
+    yield ''.join(chunk)
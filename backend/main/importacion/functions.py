@@ -0,0 +1,244 @@
+from .. import db
+from main.models import OperacionModel, PersonaModel, SubcategoriaModel, CategoriaModel
+from main.search.functions import texto_busqueda, MAX_DIGITOS_MONTO
+from main.resumen.functions import registrar_delta
+from sqlalchemy import insert
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+import csv, functools, io, re, unicodedata
+
+# Filas que se validan e insertan juntas (un executemany por lote)
+TAMANO_LOTE_IMPORTACION = 1000
+
+# Máximo de errores detallados en el reporte (el total siempre se informa)
+MAX_ERRORES_REPORTADOS = 1000
+
+# Encabezados de to_excel() (normalizados) que no coinciden con el nombre del campo
+ALIAS_COLUMNAS = {
+    'numero_de_comprobante': 'codigo',
+    'monto': 'monto_total',
+}
+
+CAMPOS_REQUERIDOS = ['fecha', 'tipo', 'caracter', 'naturaleza', 'codigo', 'metodo_de_pago', 'monto_total']
+
+# Formato de código de factura (ver Operacion.validate_codigo)
+CODIGO_FACTURA = re.compile(r'^\d{5}-\d{8}$')
+
+# CUIT con o sin guiones (20-12345678-9 o 20123456789)
+CUIT_CON_GUIONES = re.compile(r'^(\d{2})-(\d{8})-(\d)$')
+
+@functools.lru_cache(maxsize=256)
+def normalizar_columna(nombre):
+    """'Número de comprobante' -> 'numero_de_comprobante' -> 'codigo'"""
+    nombre = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode()
+    nombre = re.sub(r'\s+', '_', nombre.strip().lower())
+    return ALIAS_COLUMNAS.get(nombre, nombre)
+
+def _normalizar_fila(fila):
+    return {
+        normalizar_columna(columna): valor.strip() if isinstance(valor, str) else valor
+        for columna, valor in fila.items()
+        if columna is not None and valor not in (None, '')
+    }
+
+def leer_csv(archivo):
+    """Recorre un CSV subido sin cargarlo entero en memoria"""
+    texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+    muestra = texto.readline()
+    delimitador = ';' if muestra.count(';') > muestra.count(',') else ','
+    lector = csv.DictReader(
+        (linea for lineas in ([muestra], texto) for linea in lineas),
+        delimiter=delimitador
+    )
+    for fila in lector:
+        yield _normalizar_fila(fila)
+
+def leer_xlsx(archivo):
+    """Recorre la primera hoja de un xlsx en modo de solo lectura (fila por fila)"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(archivo.stream, read_only=True, data_only=True)
+    try:
+        filas = workbook.worksheets[0].iter_rows(values_only=True)
+        encabezados = next(filas, None) or []
+        for valores in filas:
+            if any(valor is not None for valor in valores):
+                yield _normalizar_fila(dict(zip(encabezados, valores)))
+    finally:
+        workbook.close()
+
+def leer_json(datos):
+    for fila in datos:
+        yield _normalizar_fila(fila) if isinstance(fila, dict) else fila
+
+def cargar_catalogos():
+    """Índices en memoria para resolver personas por CUIT y subcategorías por nombre"""
+    personas = {
+        int(cuit): id for id, cuit in db.session.query(PersonaModel.id, PersonaModel.cuit)
+    }
+
+    subcategorias = {}
+    subcategorias_por_nombre = {}
+    consulta = db.session.query(SubcategoriaModel.id, SubcategoriaModel.nombre, CategoriaModel.nombre).join(CategoriaModel)
+    for id, nombre, categoria in consulta:
+        subcategorias[(categoria.lower(), nombre.lower())] = id
+        subcategorias_por_nombre.setdefault(nombre.lower(), []).append(id)
+
+    return {
+        'personas': personas,
+        'ids_persona': set(personas.values()),
+        'subcategorias': subcategorias,
+        'subcategorias_por_nombre': subcategorias_por_nombre,
+        'ids_subcategoria': {id for ids in subcategorias_por_nombre.values() for id in ids},
+    }
+
+def convertir_cuit(valor):
+    """CUIT como entero. Acepta 20-12345678-9, 20123456789 y lo que deja Excel en una celda
+    numérica (20123456789.0 o 2.0123456789E+10); se lee sin pasar por float"""
+    if isinstance(valor, bool):
+        raise ValueError(f"CUIT inválido: '{valor}'")
+    if isinstance(valor, int):
+        return valor
+
+    texto = str(valor).strip()
+    coincidencia = CUIT_CON_GUIONES.match(texto)
+    if coincidencia:
+        return int(''.join(coincidencia.groups()))
+
+    try:
+        numero = Decimal(texto)
+    except InvalidOperation:
+        raise ValueError(f"CUIT inválido: '{valor}'")
+    # adjusted() == 10: once dígitos, antes de convertir (un exponente enorme no llega a int())
+    if not numero.is_finite() or numero.adjusted() != 10 or numero != numero.to_integral_value():
+        raise ValueError(f"CUIT inválido: '{valor}'")
+    return int(numero)
+
+def _resolver_persona(datos, catalogos):
+    if 'id_persona' in datos:
+        id_persona = int(datos['id_persona'])
+        if id_persona not in catalogos['ids_persona']:
+            raise ValueError(f"No existe la persona con id {id_persona}")
+        return id_persona
+
+    if 'cuit' not in datos:
+        raise ValueError("Falta el CUIT o el id de la persona")
+
+    cuit = convertir_cuit(datos['cuit'])
+    if cuit not in catalogos['personas']:
+        raise ValueError(f"No existe una persona con CUIT {cuit}")
+    return catalogos['personas'][cuit]
+
+def _resolver_subcategoria(datos, catalogos):
+    if 'id_subcategoria' in datos:
+        id_subcategoria = int(datos['id_subcategoria'])
+        if id_subcategoria not in catalogos['ids_subcategoria']:
+            raise ValueError(f"No existe la subcategoría con id {id_subcategoria}")
+        return id_subcategoria
+
+    if 'subcategoria' not in datos:
+        raise ValueError("Falta la subcategoría")
+
+    nombre = str(datos['subcategoria']).lower()
+    if 'categoria' in datos:
+        clave = (str(datos['categoria']).lower(), nombre)
+        if clave not in catalogos['subcategorias']:
+            raise ValueError(f"No existe la subcategoría '{datos['subcategoria']}' en la categoría '{datos['categoria']}'")
+        return catalogos['subcategorias'][clave]
+
+    ids = catalogos['subcategorias_por_nombre'].get(nombre, [])
+    if len(ids) != 1:
+        raise ValueError(f"La subcategoría '{datos['subcategoria']}' no existe o es ambigua; indique también la categoría")
+    return ids[0]
+
+def construir_fila(datos, id_usuario, catalogos, cache_busqueda):
+    """Valida una fila con los validadores del modelo y devuelve el mapeo listo para el INSERT"""
+    if not isinstance(datos, dict):
+        raise ValueError("Se esperaba un objeto con los campos de la operación")
+
+    faltantes = [campo for campo in CAMPOS_REQUERIDOS if campo not in datos]
+    if faltantes:
+        raise ValueError(f"Faltan campos obligatorios: {', '.join(faltantes)}")
+
+    fecha = datos['fecha']
+    if isinstance(fecha, (date, datetime)):
+        fecha = fecha.strftime("%Y-%m-%d")
+
+    codigo = str(datos['codigo'])
+    # to_excel no incluye el tipo de comprobante: se deduce del formato del código
+    option = datos.get('option') or ('factura' if CODIGO_FACTURA.match(codigo) else 'boleta')
+
+    try:
+        monto_total = Decimal(str(datos['monto_total']))
+    except InvalidOperation:
+        raise ValueError(f"Monto inválido: '{datos['monto_total']}'")
+    if not monto_total.is_finite() or monto_total.adjusted() >= MAX_DIGITOS_MONTO:
+        raise ValueError(f"Monto inválido: '{datos['monto_total']}'")
+
+    # El orden importa: el signo del monto depende del tipo y el formato del código de la opción
+    operacion = OperacionModel(
+        fecha=str(fecha),
+        tipo=str(datos['tipo']),
+        caracter=str(datos['caracter']),
+        naturaleza=str(datos['naturaleza']),
+        id_persona=_resolver_persona(datos, catalogos),
+        option=str(option),
+        codigo=codigo,
+        observaciones=datos.get('observaciones'),
+        metodo_de_pago=str(datos['metodo_de_pago']),
+        monto_total=monto_total,
+        id_subcategoria=_resolver_subcategoria(datos, catalogos),
+        id_usuario=id_usuario,
+        modificado_por_otro=False
+    )
+    operacion.texto_busqueda = texto_busqueda(operacion, db.session, cache_busqueda)
+
+    return {
+        atributo: getattr(operacion, atributo) for atributo in (
+            'fecha', 'tipo', 'caracter', 'naturaleza', 'id_persona', 'option', 'codigo',
+            'observaciones', 'metodo_de_pago', '_monto_total', 'id_subcategoria',
+            'id_usuario', 'modificado_por_otro', 'texto_busqueda'
+        )
+    }
+
+def _insertar_lote(lote):
+    db.session.execute(insert(OperacionModel), lote)
+    # El INSERT por lotes no dispara los eventos del mapper: el resumen mensual se ajusta a mano
+    for fila in lote:
+        registrar_delta(db.session, fila, 1)
+
+def importar_operaciones(filas, id_usuario, primera_fila=1):
+    """Valida e inserta las filas por lotes. Las filas inválidas se informan y no se insertan;
+    las válidas se confirman juntas al final (una sola transacción)"""
+    catalogos = cargar_catalogos()
+    cache_busqueda = {}
+
+    importadas = 0
+    errores = []
+    cantidad_errores = 0
+    lote = []
+
+    for numero, datos in enumerate(filas, start=primera_fila):
+        try:
+            lote.append(construir_fila(datos, id_usuario, catalogos, cache_busqueda))
+        except (ValueError, TypeError, OverflowError) as e:
+            cantidad_errores += 1
+            if len(errores) < MAX_ERRORES_REPORTADOS:
+                errores.append({'fila': numero, 'error': str(e)})
+
+        if len(lote) >= TAMANO_LOTE_IMPORTACION:
+            _insertar_lote(lote)
+            importadas += len(lote)
+            lote = []
+
+    if lote:
+        _insertar_lote(lote)
+        importadas += len(lote)
+
+    db.session.commit()
+
+    return {
+        'importadas': importadas,
+        'cantidad_errores': cantidad_errores,
+        'errores': errores,
+    }
@@ -1,19 +1,171 @@
-from .. import mailsender
-from flask import current_app, render_template
+from .. import mailsender, db
+from main.models import CorreoModel
+from flask import current_app
 from flask_mail import Message
-from smtplib import SMTPException
+from smtplib import SMTPException, SMTPRecipientsRefused, SMTPSenderRefused, SMTPDataError
+from sqlalchemy import select, update, delete
+from datetime import datetime, timedelta
+import functools, logging
+
+logger = logging.getLogger(__name__)
+
+# Correos que se envían por cada conexión SMTP
+TAMANO_LOTE_CORREOS = 50
+
+# Reintentos: espera = RETRASO_BASE_CORREO * 2^(intento - 1), como mucho RETRASO_MAXIMO_CORREO (segundos)
+RETRASO_BASE_CORREO = 60
+RETRASO_MAXIMO_CORREO = 3600
+
+# Un correo 'enviando' por más de esto (segundos) quedó de un envío interrumpido
+TIMEOUT_ENVIO = 600
+
+# Errores del servidor con el mensaje (destinatario o contenido rechazado): no afectan a los demás del lote
+ERRORES_MENSAJE = (SMTPRecipientsRefused, SMTPSenderRefused, SMTPDataError)
+
+@functools.lru_cache(maxsize=64)
+def _plantilla(nombre):
+    """Plantilla compilada una sola vez por proceso (sin volver a buscarla en cada correo)"""
+    return current_app.jinja_env.get_template(nombre)
+
+def renderizar(template, **kwargs):
+    """Cuerpo en texto y en HTML de una plantilla de main/templates"""
+    return _plantilla(template + '.txt').render(**kwargs), _plantilla(template + '.html').render(**kwargs)
+
+def encolar_correo(to, subject, template, commit=True, **kwargs):
+    """Renderiza el correo y lo guarda en la bandeja de salida; lo envía el worker de trabajos.
+    Con commit=False queda en la transacción del llamador"""
+    if not to or not subject or not template:
+        raise ValueError("Parameters 'to', 'subject', and 'template' cannot be empty.")
+
+    texto, html = renderizar(template, **kwargs)
+    correo = CorreoModel(
+        destinatarios=list(to),
+        asunto=subject,
+        cuerpo_texto=texto,
+        cuerpo_html=html,
+        disponible_desde=datetime.utcnow()
+    )
+    db.session.add(correo)
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
+    return correo
 
 def sendMail(to, subject, template, **kwargs):
-    
+    """Envío inmediato (abre una conexión SMTP por correo). Preferir encolar_correo()"""
     if not to or not subject or not template:
         raise ValueError("Parameters 'to', 'subject', and 'template' cannot be empty.")
-    
+
     msg = Message(subject, sender=current_app.config['FLASKY_MAIL_SENDER'], recipients=to)
-  
+
     try:
-        msg.body = render_template(template + '.txt', **kwargs)
-        msg.html = render_template(template + '.html', **kwargs)
+        msg.body, msg.html = renderizar(template, **kwargs)
         mailsender.send(msg)
     except SMTPException as e:
         return "El envío del correo falló"
-    return True
\ No newline at end of file
+    return True
+
+def _reservar_correos(limite):
+    """Pasa a 'enviando' los próximos correos pendientes; el UPDATE condicionado evita que
+    dos workers envíen el mismo"""
+    ahora = datetime.utcnow()
+    candidatos = db.session.execute(
+        select(CorreoModel.id)
+        .where(CorreoModel.estado == 'pendiente', CorreoModel.disponible_desde <= ahora)
+        .order_by(CorreoModel.disponible_desde, CorreoModel.id)
+        .limit(limite)
+    ).scalars().all()
+
+    reservados = []
+    for id in candidatos:
+        resultado = db.session.execute(
+            update(CorreoModel)
+            .where(CorreoModel.id == id, CorreoModel.estado == 'pendiente')
+            .values(estado='enviando', disponible_desde=ahora, intentos=CorreoModel.intentos + 1)
+        )
+        if resultado.rowcount:
+            reservados.append(id)
+    db.session.commit()
+
+    if not reservados:
+        return []
+    return db.session.execute(select(CorreoModel).where(CorreoModel.id.in_(reservados))).scalars().all()
+
+def _vaciar_cuerpo(correo):
+    """El cuerpo puede tener contraseñas temporales o tokens de restablecimiento: no se conserva
+    una vez que el correo se envió o se descartó"""
+    correo.cuerpo_texto = None
+    correo.cuerpo_html = None
+
+def _registrar_error(correo, error):
+    correo.error = str(error)
+    if correo.intentos >= correo.max_intentos:
+        correo.estado = 'fallido'
+        _vaciar_cuerpo(correo)
+        logger.error('Correo %s descartado tras %s intentos: %s', correo.id, correo.intentos, error)
+    else:
+        correo.estado = 'pendiente'
+        espera = min(RETRASO_BASE_CORREO * 2 ** (correo.intentos - 1), RETRASO_MAXIMO_CORREO)
+        correo.disponible_desde = datetime.utcnow() + timedelta(seconds=espera)
+
+def enviar_pendientes(limite=TAMANO_LOTE_CORREOS):
+    """Envía un lote de la bandeja de salida reutilizando una sola conexión SMTP.
+    Devuelve la cantidad de correos enviados"""
+    correos = _reservar_correos(limite)
+    if not correos:
+        return 0
+
+    enviados = 0
+    pendientes = list(correos)
+    try:
+        with mailsender.connect() as conexion:
+            while pendientes:
+                correo = pendientes[0]
+                msg = Message(
+                    correo.asunto,
+                    sender=current_app.config['FLASKY_MAIL_SENDER'],
+                    recipients=correo.destinatarios,
+                    body=correo.cuerpo_texto,
+                    html=correo.cuerpo_html
+                )
+                try:
+                    conexion.send(msg)
+                except ERRORES_MENSAJE as e:
+                    _registrar_error(correo, e)
+                else:
+                    correo.estado = 'enviado'
+                    correo.enviado = datetime.utcnow()
+                    correo.error = None
+                    _vaciar_cuerpo(correo)
+                    enviados += 1
+                pendientes.pop(0)
+                db.session.commit()
+
+    except (SMTPException, OSError) as e:
+        # Falló la conexión: el resto del lote se reprograma
+        logger.warning('Error de conexión SMTP: %s', e)
+        for correo in pendientes:
+            _registrar_error(correo, e)
+        db.session.commit()
+
+    return enviados
+
+def recuperar_correos_colgados():
+    """Devuelve a pendiente los correos de un envío interrumpido"""
+    limite = datetime.utcnow() - timedelta(seconds=TIMEOUT_ENVIO)
+    resultado = db.session.execute(
+        update(CorreoModel)
+        .where(CorreoModel.estado == 'enviando', CorreoModel.disponible_desde < limite)
+        .values(estado='pendiente')
+    )
+    db.session.commit()
+    return resultado.rowcount
+
+def purgar_enviados(dias):
+    resultado = db.session.execute(
+        delete(CorreoModel)
+        .where(CorreoModel.estado == 'enviado', CorreoModel.enviado < datetime.utcnow() - timedelta(days=dias))
+    )
+    db.session.commit()
+    return resultado.rowcount
@@ -0,0 +1,374 @@
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from contextlib import contextmanager
+import fcntl, json, logging, os, threading, time
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (en segundos) del histograma de espera para obtener una conexión
+BUCKETS_ESPERA = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+_lock = threading.Lock()
+_estadisticas_pool = {
+    'checkouts': 0,
+    'conexiones_nuevas': 0,
+    'conexiones_invalidadas': 0,
+    'espera_total': 0.0,
+    'espera_maxima': 0.0,
+    'buckets_espera': [0] * (len(BUCKETS_ESPERA) + 1),
+}
+
+class PoolMedido(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout hasta obtener una conexión"""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            registrar_espera(time.perf_counter() - inicio)
+
+def registrar_espera(segundos):
+    with _lock:
+        _estadisticas_pool['checkouts'] += 1
+        _estadisticas_pool['espera_total'] += segundos
+        _estadisticas_pool['espera_maxima'] = max(_estadisticas_pool['espera_maxima'], segundos)
+        for indice, limite in enumerate(BUCKETS_ESPERA):
+            if segundos <= limite:
+                break
+        else:
+            indice = len(BUCKETS_ESPERA)
+        _estadisticas_pool['buckets_espera'][indice] += 1
+
+@event.listens_for(PoolMedido, 'connect')
+def _conexion_nueva(dbapi_connection, connection_record):
+    with _lock:
+        _estadisticas_pool['conexiones_nuevas'] += 1
+
+@event.listens_for(PoolMedido, 'invalidate')
+def _conexion_invalidada(dbapi_connection, connection_record, exception):
+    with _lock:
+        _estadisticas_pool['conexiones_invalidadas'] += 1
+
+def estadisticas_pool(engine):
+    """Estado actual del pool del proceso (worker) más los contadores acumulados"""
+    pool = engine.pool
+    with _lock:
+        estadisticas = dict(_estadisticas_pool, buckets_espera=list(_estadisticas_pool['buckets_espera']))
+
+    checkouts = estadisticas['checkouts']
+    resultado = {
+        'pool': type(pool).__name__,
+        'checkouts': checkouts,
+        'conexiones_nuevas': estadisticas['conexiones_nuevas'],
+        'conexiones_invalidadas': estadisticas['conexiones_invalidadas'],
+        'espera_promedio_ms': round(estadisticas['espera_total'] / checkouts * 1000, 3) if checkouts else 0,
+        'espera_maxima_ms': round(estadisticas['espera_maxima'] * 1000, 3),
+        'histograma_espera': {
+            **{f'<={limite}s': cantidad for limite, cantidad in zip(BUCKETS_ESPERA, estadisticas['buckets_espera'])},
+            f'>{BUCKETS_ESPERA[-1]}s': estadisticas['buckets_espera'][-1],
+        },
+    }
+
+    if isinstance(pool, QueuePool):
+        resultado.update({
+            'tamano': pool.size(),
+            'en_uso': pool.checkedout(),
+            'disponibles': pool.checkedin(),
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+        })
+
+    return resultado
+
+# --- Instrumentación por solicitud ---------------------------------------------------------
+
+# Límites de los histogramas por endpoint (Prometheus): segundos, sentencias y bytes
+BUCKETS_DURACION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_SENTENCIAS = (1, 2, 3, 5, 10, 20, 50, 100, 500)
+BUCKETS_BYTES = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+
+# Nombre -> (descripción, buckets); todos llevan las etiquetas endpoint y metodo
+HISTOGRAMAS = {
+    'gestops_solicitud_duracion_seconds': ('Duración de la solicitud hasta armar la respuesta', BUCKETS_DURACION),
+    'gestops_solicitud_db_seconds': ('Tiempo de ejecución de las sentencias SQL de la solicitud', BUCKETS_DURACION),
+    'gestops_solicitud_json_seconds': ('Tiempo de codificación JSON de la respuesta', BUCKETS_DURACION),
+    'gestops_solicitud_sentencias_sql': ('Sentencias SQL ejecutadas por la solicitud', BUCKETS_SENTENCIAS),
+    'gestops_respuesta_bytes': ('Tamaño de la respuesta (sin las respuestas en streaming)', BUCKETS_BYTES),
+}
+CONTADORES = {
+    'gestops_solicitudes_total': 'Solicitudes atendidas por endpoint, método y estado',
+    'gestops_sql_lentas_total': 'Sentencias SQL que superaron SQL_LENTA_MS',
+}
+
+# (métrica, etiquetas) -> [cantidades por bucket + la de +Inf, suma, cantidad] o valor del contador
+_metricas = {}
+_lock_metricas = threading.Lock()
+_ultimo_guardado = 0.0
+_guardado_pendiente = None
+
+def _observar(nombre, etiquetas, valor):
+    buckets = HISTOGRAMAS[nombre][1]
+    clave = (nombre, etiquetas)
+    with _lock_metricas:
+        histograma = _metricas.get(clave)
+        if histograma is None:
+            histograma = _metricas[clave] = [[0] * (len(buckets) + 1), 0.0, 0]
+        for indice, limite in enumerate(buckets):
+            if valor <= limite:
+                break
+        else:
+            indice = len(buckets)
+        histograma[0][indice] += 1
+        histograma[1] += valor
+        histograma[2] += 1
+
+def _incrementar(nombre, etiquetas):
+    with _lock_metricas:
+        _metricas[(nombre, etiquetas)] = _metricas.get((nombre, etiquetas), 0) + 1
+
+def _medicion():
+    return g.get('medicion') if has_request_context() else None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    # El inicio va en el contexto de ejecución y no en conn.info: si la sentencia falla no hay
+    # after_cursor_execute, y así se descarta con el contexto en lugar de quedar en la conexión
+    if context is not None:
+        context.__dict__.setdefault('_inicios_sentencia', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_sentencia(conn, cursor, statement, parameters, context, executemany):
+    inicios = getattr(context, '_inicios_sentencia', None)
+    if not inicios:
+        return
+    duracion = time.perf_counter() - inicios.pop()
+
+    medicion = _medicion()
+    if medicion is not None:
+        medicion['sentencias'] += 1
+        medicion['db'] += duracion
+
+    umbral = current_app.config.get('SQL_LENTA_MS', 0) if has_app_context() else 0
+    if umbral and duracion * 1000 >= umbral:
+        _incrementar('gestops_sql_lentas_total', ())
+        # Solo el texto con sus marcadores: los valores (CUIT, montos, datos personales) no se registran
+        cantidad = len(parameters) if isinstance(parameters, (list, tuple, dict)) else 0
+        logger.warning(
+            'Sentencia SQL lenta (%.0f ms) en %s: %s [%s %s omitidos]',
+            duracion * 1000, request.path if has_request_context() else 'proceso',
+            ' '.join(statement.split())[:2000], cantidad, 'filas' if executemany else 'parámetros',
+        )
+
+def registrar_serializacion(segundos):
+    """Suma a la solicitud en curso el tiempo de codificar su respuesta JSON"""
+    medicion = _medicion()
+    if medicion is not None:
+        medicion['json'] += segundos
+
+def iniciar_medicion():
+    g.medicion = {'inicio': time.perf_counter(), 'sentencias': 0, 'db': 0.0, 'json': 0.0}
+
+def finalizar_medicion(respuesta):
+    """Agrega el encabezado Server-Timing y registra la solicitud en los histogramas de su endpoint.
+    Las respuestas en streaming (exportaciones, descargas) se registran al cerrarse: las sentencias
+    que ejecuta el generador mientras se envía la respuesta siguen sumando a la misma medición.
+    El encabezado sale antes que el cuerpo, así que en ellas solo mide hasta el inicio del envío"""
+    medicion = g.get('medicion')
+    if medicion is None:
+        return respuesta
+
+    if current_app.config.get('SERVER_TIMING'):
+        total = time.perf_counter() - medicion['inicio']
+        # Python propio de la solicitud: armado de dicts, validaciones, etc. (fuera de la base y del JSON)
+        aplicacion = max(total - medicion['db'] - medicion['json'], 0.0)
+        respuesta.headers['Server-Timing'] = (
+            f'db;dur={medicion["db"] * 1000:.1f};desc="{medicion["sentencias"]} sentencias", '
+            f'app;dur={aplicacion * 1000:.1f}, json;dur={medicion["json"] * 1000:.1f}, total;dur={total * 1000:.1f}'
+        )
+
+    # Solo rutas registradas: las URL inexistentes no agregan series
+    if request.url_rule is None:
+        g.pop('medicion', None)
+        return respuesta
+
+    # Lo que se necesita al registrar, que en el streaming ocurre fuera del contexto de la solicitud
+    solicitud = {
+        'etiquetas': (('endpoint', request.url_rule.rule), ('metodo', request.method)),
+        'descripcion': f'{request.method} {request.path}',
+        'estado': str(respuesta.status_code),
+        'umbral': current_app.config.get('SOLICITUD_LENTA_MS', 0),
+        'directorio': current_app.config.get('METRICAS_FOLDER'),
+    }
+    if respuesta.is_streamed:
+        respuesta.call_on_close(lambda: _registrar_solicitud(medicion, solicitud, None))
+    else:
+        g.pop('medicion', None)
+        _registrar_solicitud(medicion, solicitud, respuesta.calculate_content_length())
+    return respuesta
+
+def _registrar_solicitud(medicion, solicitud, tamano):
+    total = time.perf_counter() - medicion['inicio']
+    aplicacion = max(total - medicion['db'] - medicion['json'], 0.0)
+
+    etiquetas = solicitud['etiquetas']
+    _observar('gestops_solicitud_duracion_seconds', etiquetas, total)
+    _observar('gestops_solicitud_db_seconds', etiquetas, medicion['db'])
+    _observar('gestops_solicitud_json_seconds', etiquetas, medicion['json'])
+    _observar('gestops_solicitud_sentencias_sql', etiquetas, medicion['sentencias'])
+    if tamano is not None:
+        _observar('gestops_respuesta_bytes', etiquetas, tamano)
+    _incrementar('gestops_solicitudes_total', etiquetas + (('estado', solicitud['estado']),))
+
+    umbral = solicitud['umbral']
+    if umbral and total * 1000 >= umbral:
+        logger.warning(
+            'Solicitud lenta %s: %.0f ms (db %.0f ms en %s sentencias, app %.0f ms, json %.0f ms, %s bytes)',
+            solicitud['descripcion'], total * 1000, medicion['db'] * 1000, medicion['sentencias'],
+            aplicacion * 1000, medicion['json'] * 1000, tamano if tamano is not None else '?',
+        )
+
+    if solicitud['directorio']:
+        _programar_guardado(solicitud['directorio'])
+
+def instrumentar(app):
+    """Mide cada solicitud de la app (sentencias SQL, tiempos y tamaño de la respuesta)"""
+    app.before_request(iniciar_medicion)
+    app.after_request(finalizar_medicion)
+
+# --- Métricas compartidas entre procesos ---------------------------------------------------
+# Con METRICAS_FOLDER cada worker de gunicorn vuelca sus métricas en <pid>.json (como mucho una vez
+# por segundo) y el endpoint de Prometheus suma los archivos de todos. Al terminar un worker, el
+# master de gunicorn pasa su archivo a acumulado.json para que los contadores no retrocedan
+
+ARCHIVO_ACUMULADO = 'acumulado.json'
+
+def _serializar(metricas):
+    return [[nombre, [list(etiqueta) for etiqueta in etiquetas], valor] for (nombre, etiquetas), valor in metricas.items()]
+
+def _deserializar(filas):
+    return {(nombre, tuple(tuple(etiqueta) for etiqueta in etiquetas)): valor for nombre, etiquetas, valor in filas}
+
+def _sumar(destino, origen):
+    for clave, valor in origen.items():
+        actual = destino.get(clave)
+        if actual is None:
+            destino[clave] = valor
+        elif isinstance(valor, list):
+            destino[clave] = [[a + b for a, b in zip(actual[0], valor[0])], actual[1] + valor[1], actual[2] + valor[2]]
+        else:
+            destino[clave] = actual + valor
+
+def _escribir(archivo, metricas):
+    temporal = f'{archivo}.{os.getpid()}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(_serializar(metricas), f)
+    os.replace(temporal, archivo)
+
+def _leer(archivo):
+    try:
+        with open(archivo, encoding='utf-8') as f:
+            return _deserializar(json.load(f))
+    except (OSError, ValueError):
+        return {}
+
+def guardar_metricas(directorio):
+    """Vuelca las métricas de este proceso en su archivo del directorio compartido"""
+    global _ultimo_guardado, _guardado_pendiente
+    with _lock_metricas:
+        metricas = {clave: [list(valor[0]), valor[1], valor[2]] if isinstance(valor, list) else valor
+                    for clave, valor in _metricas.items()}
+        _ultimo_guardado = time.monotonic()
+        _guardado_pendiente = None
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        _escribir(os.path.join(directorio, f'{os.getpid()}.json'), metricas)
+    except OSError:
+        logger.warning('No se pudieron guardar las métricas en %s', directorio, exc_info=True)
+
+def _programar_guardado(directorio):
+    global _guardado_pendiente
+    with _lock_metricas:
+        if _guardado_pendiente is not None:
+            return
+        espera = 1.0 - (time.monotonic() - _ultimo_guardado)
+        if espera > 0:
+            # Las solicitudes del próximo segundo se vuelcan juntas
+            _guardado_pendiente = threading.Timer(espera, guardar_metricas, args=(directorio,))
+            _guardado_pendiente.daemon = True
+            _guardado_pendiente.start()
+            return
+        _guardado_pendiente = True
+    guardar_metricas(directorio)
+
+@contextmanager
+def _bloqueo(directorio, exclusivo):
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def acumular_metricas(directorio, pid):
+    """Suma el archivo de un proceso terminado al acumulado (lo llama el master de gunicorn)"""
+    archivo = os.path.join(directorio, f'{pid}.json')
+    if not os.path.exists(archivo):
+        return
+    with _bloqueo(directorio, exclusivo=True):
+        acumulado = _leer(os.path.join(directorio, ARCHIVO_ACUMULADO))
+        _sumar(acumulado, _leer(archivo))
+        _escribir(os.path.join(directorio, ARCHIVO_ACUMULADO), acumulado)
+        os.remove(archivo)
+
+def limpiar_metricas(directorio):
+    """Descarta las métricas de una ejecución anterior (al iniciar el master de gunicorn)"""
+    if os.path.isdir(directorio):
+        for nombre in os.listdir(directorio):
+            if nombre.endswith('.json') or nombre.endswith('.tmp'):
+                os.remove(os.path.join(directorio, nombre))
+
+def metricas_actuales():
+    """Métricas de este proceso o, con METRICAS_FOLDER, las de todos los procesos"""
+    directorio = current_app.config.get('METRICAS_FOLDER')
+    if not directorio:
+        with _lock_metricas:
+            return {clave: [list(valor[0]), valor[1], valor[2]] if isinstance(valor, list) else valor
+                    for clave, valor in _metricas.items()}
+
+    guardar_metricas(directorio)
+    metricas = {}
+    with _bloqueo(directorio, exclusivo=False):
+        for nombre in os.listdir(directorio):
+            if nombre.endswith('.json'):
+                _sumar(metricas, _leer(os.path.join(directorio, nombre)))
+    return metricas
+
+def _etiquetas_texto(etiquetas):
+    if not etiquetas:
+        return ''
+    escapar = lambda valor: valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{nombre}="{escapar(valor)}"' for nombre, valor in etiquetas) + '}'
+
+def formato_prometheus(metricas):
+    """Texto en el formato de exposición de Prometheus (0.0.4)"""
+    lineas = []
+    for nombre, (descripcion, buckets) in HISTOGRAMAS.items():
+        lineas += [f'# HELP {nombre} {descripcion}', f'# TYPE {nombre} histogram']
+        for (metrica, etiquetas), (cantidades, suma, cantidad) in sorted(
+            (clave, valor) for clave, valor in metricas.items() if clave[0] == nombre
+        ):
+            acumulado = 0
+            for limite, valor in zip(list(buckets) + ['+Inf'], cantidades):
+                acumulado += valor
+                lineas.append(f'{nombre}_bucket{_etiquetas_texto(etiquetas + (("le", str(limite)),))} {acumulado}')
+            lineas.append(f'{nombre}_sum{_etiquetas_texto(etiquetas)} {suma}')
+            lineas.append(f'{nombre}_count{_etiquetas_texto(etiquetas)} {cantidad}')
+    for nombre, descripcion in CONTADORES.items():
+        lineas += [f'# HELP {nombre} {descripcion}', f'# TYPE {nombre} counter']
+        for (metrica, etiquetas), valor in sorted((clave, valor) for clave, valor in metricas.items() if clave[0] == nombre):
+            lineas.append(f'{nombre}{_etiquetas_texto(etiquetas)} {valor}')
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,36 @@
+from flask import Blueprint, request, current_app
+from .. import db
+from main.metrics.functions import estadisticas_pool, metricas_actuales, formato_prometheus
+from functools import wraps
+import ipaddress
+
+metrics = Blueprint('metrics', __name__, url_prefix='/internal/metrics')
+
+def solo_red_interna(fn):
+    """
+    Solo atiende solicitudes directas desde la red interna (monitoreo, healthchecks)
+    Las que llegan a través de nginx traen X-Forwarded-For y se rechazan
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            origen = ipaddress.ip_address(request.remote_addr or '')
+        except ValueError:
+            return {'message': 'Acceso no permitido'}, 403
+
+        if request.headers.get('X-Forwarded-For') or not (origen.is_private or origen.is_loopback):
+            return {'message': 'Acceso no permitido'}, 403
+
+        return fn(*args, **kwargs)
+    return wrapper
+
+@metrics.route('/pool', methods=['GET'])
+@solo_red_interna
+def pool():
+    return estadisticas_pool(db.engine), 200
+
+@metrics.route('/prometheus', methods=['GET'])
+@solo_red_interna
+def prometheus():
+    """Histogramas por endpoint en formato de texto de Prometheus"""
+    return current_app.response_class(formato_prometheus(metricas_actuales()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,55 @@
+from alembic import op
+from alembic.config import Config
+from sqlalchemy import inspect
+import os
+
+# backend/migrations: entorno de Alembic y versiones del esquema
+DIRECTORIO_MIGRACIONES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'migrations')
+
+def configuracion_alembic():
+    """Configuración de Alembic sin alembic.ini: el entorno toma la conexión de la app (env.py)"""
+    configuracion = Config()
+    configuracion.set_main_option('script_location', DIRECTORIO_MIGRACIONES)
+    return configuracion
+
+# Operaciones idempotentes para las migraciones. Antes de Alembic el esquema se creaba con
+# db.create_all() en cada arranque, así que una base existente puede estar en cualquier estado
+# intermedio: cada paso verifica lo que ya hay en lugar de suponer la base vacía. Al generar el SQL
+# sin conexión (actualizar-esquema --sql) no hay nada que inspeccionar y se emiten todos los pasos
+
+def _sin_conexion():
+    return op.get_context().as_sql
+
+def _inspector():
+    return inspect(op.get_bind())
+
+def tabla_existe(tabla):
+    return not _sin_conexion() and _inspector().has_table(tabla)
+
+def columna_existe(tabla, columna):
+    return not _sin_conexion() and any(c['name'] == columna for c in _inspector().get_columns(tabla))
+
+def indice_existe(tabla, nombre):
+    if _sin_conexion():
+        return False
+    inspector = _inspector()
+    indices = inspector.get_indexes(tabla) + inspector.get_unique_constraints(tabla)
+    return any(indice['name'] == nombre for indice in indices)
+
+def crear_tabla_si_falta(tabla, *columnas, **kwargs):
+    if not tabla_existe(tabla):
+        op.create_table(tabla, *columnas, **kwargs)
+        return True
+    return False
+
+def agregar_columna_si_falta(tabla, columna):
+    if not columna_existe(tabla, columna.name):
+        op.add_column(tabla, columna)
+
+def crear_indice_si_falta(nombre, tabla, columnas, **kwargs):
+    if not indice_existe(tabla, nombre):
+        op.create_index(nombre, tabla, columnas, **kwargs)
+
+def eliminar_indice_si_existe(nombre, tabla):
+    if _sin_conexion() or indice_existe(tabla, nombre):
+        op.drop_index(nombre, table_name=tabla)
@@ -3,4 +3,8 @@ from .operacion import Operacion as OperacionModel
 from .concepto import Concepto as ConceptoModel
 from .categoria import Categoria as CategoriaModel
 from .subcategoria import Subcategoria as SubcategoriaModel
-from .persona import Persona as PersonaModel
\ No newline at end of file
+from .persona import Persona as PersonaModel
+from .blob import Blob as BlobModel
+from .trabajo import Trabajo as TrabajoModel
+from .correo import Correo as CorreoModel
+from .resumen import ResumenMensual as ResumenMensualModel
\ No newline at end of file
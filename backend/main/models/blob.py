@@ -0,0 +1,15 @@
+from .. import db
+from datetime import datetime
+
+class Blob(db.Model):
+    """Contenido de un adjunto, identificado por su SHA-256 y compartido entre operaciones"""
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    tamano = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(100), nullable=True)
+    # Cantidad de campos de archivo (comprobante_path, archivoN_path) que apuntan a este contenido
+    referencias = db.Column(db.Integer, nullable=False, default=0, index=True)
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return '<Blob: %r %r %r>' % (self.sha256, self.tamano, self.referencias)
@@ -4,7 +4,7 @@ class Categoria(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     nombre = db.Column(db.String(255), nullable=False)
 
-    id_concepto = db.Column(db.Integer, db.ForeignKey("concepto.id"), nullable=False) 
+    id_concepto = db.Column(db.Integer, db.ForeignKey("concepto.id"), nullable=False, index=True)
     concepto = db.relationship("Concepto", back_populates="categorias", uselist=False, single_parent=True)
 
     subcategorias = db.relationship("Subcategoria", back_populates="categoria")
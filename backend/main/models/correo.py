@@ -0,0 +1,31 @@
+from .. import db
+from datetime import datetime
+
+class Correo(db.Model):
+    """Correo de la bandeja de salida: se renderiza al encolarlo y lo envía main.mail.functions"""
+
+    # 'fallido' es la cola de descarte: agotó los reintentos y queda para revisión manual, sin el
+    # cuerpo; no se reenvía (el contenido se genera de nuevo, p. ej. pidiendo otro restablecimiento)
+    ESTADOS = ['pendiente', 'enviando', 'enviado', 'fallido']
+
+    __table_args__ = (
+        db.Index('ix_correo_estado_disponible', 'estado', 'disponible_desde'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    destinatarios = db.Column(db.JSON, nullable=False)
+    asunto = db.Column(db.String(255), nullable=False)
+    # Se vacían al enviarlo o descartarlo: pueden contener contraseñas o tokens de restablecimiento
+    cuerpo_texto = db.Column(db.Text, nullable=True)
+    cuerpo_html = db.Column(db.Text, nullable=True)
+
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    max_intentos = db.Column(db.Integer, nullable=False, default=5)
+    error = db.Column(db.Text, nullable=True)
+    disponible_desde = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    enviado = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return '<Correo: %r %r %r>' % (self.id, self.asunto, self.estado)
@@ -2,6 +2,18 @@ from .. import db
 from datetime import datetime
 import re 
 
+# Nombre original de un adjunto guardado como '<uuid>_<nombre>' (formato anterior al store de blobs)
+NOMBRE_ADJUNTO_UUID = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_(.+)$')
+
+def nombre_archivo(path):
+    """Nombre para mostrar de un adjunto ('<sha256>/<nombre>' o '<uuid>_<nombre>')"""
+    if not path:
+        return None
+    match = NOMBRE_ADJUNTO_UUID.search(path)
+    if match:
+        return match.group(1)
+    return path.split('/')[-1]
+
 class Operacion(db.Model):
 
     TIPOS_PERMITIDOS = ['ingreso', 'egreso']
@@ -10,23 +22,44 @@ class Operacion(db.Model):
     OPTIONS_PERMITIDAS = ['factura', 'boleta']
     METODOS_PAGO_PERMITIDOS = ['efectivo', 'debito', 'transferencia', 'mixto', 'otro']
 
+    # Encabezados de to_excel(), en orden: la exportación los escribe aunque no haya filas
+    COLUMNAS_EXCEL = [
+        'id', 'Fecha', 'Tipo', 'Carácter', 'Naturaleza', 'Cuit', 'Razón social', 'Número de comprobante',
+        'Observaciones', 'Método de pago', 'Monto', 'Concepto', 'Categoría', 'Subcategoría', 'Usuario',
+        'Modificado por otro',
+    ]
+
+    # Índices según los filtros de Operaciones._generar_filtros y los totales (ver migrations/versions).
+    # Los de claves foráneas llevan la fecha: sirven a los filtros por catálogo y al listado ordenado por fecha
+    # (InnoDB agrega el id a cada índice secundario, así que también cubren el desempate por id)
+    __table_args__ = (
+        # Orden (fecha desc, id desc) y paginación por cursor
+        db.Index('ix_operacion_fecha_id', 'fecha', 'id'),
+        # Totales por tipo en un rango de fechas; también sirve al filtro solo por tipo
+        db.Index('ix_operacion_tipo_fecha', 'tipo', 'fecha'),
+        db.Index('ix_operacion_persona_fecha', 'id_persona', 'fecha'),
+        db.Index('ix_operacion_subcategoria_fecha', 'id_subcategoria', 'fecha'),
+        db.Index('ix_operacion_usuario_fecha', 'id_usuario', 'fecha'),
+        db.Index('ix_operacion_texto_busqueda', 'texto_busqueda', mysql_prefix='FULLTEXT', mariadb_prefix='FULLTEXT'),
+    )
+
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     fecha = db.Column(db.Date, nullable=False)
     tipo = db.Column(db.String(10), nullable=False)
-    caracter = db.Column(db.String(10), nullable=False)
-    naturaleza = db.Column(db.String(10), nullable=False)
+    caracter = db.Column(db.String(10), nullable=False, index=True)
+    naturaleza = db.Column(db.String(10), nullable=False, index=True)
 
     id_persona = db.Column(db.Integer, db.ForeignKey("persona.id"), nullable=False)
     personas = db.relationship("Persona", back_populates="operaciones", single_parent=True)
 
     comprobante_path = db.Column(db.String(255), nullable=True)
 
-    option = db.Column(db.String(10), nullable=False)
-    codigo = db.Column(db.String(10), nullable=False)
+    option = db.Column(db.String(10), nullable=False, index=True)
+    codigo = db.Column(db.String(10), nullable=False, index=True)
     observaciones = db.Column(db.String(255), nullable=True)
-    metodo_de_pago = db.Column(db.String(20), nullable=False)
-    _monto_total = db.Column('monto_total', db.Numeric(precision=65, scale=5), nullable=False)
+    metodo_de_pago = db.Column(db.String(20), nullable=False, index=True)
+    _monto_total = db.Column('monto_total', db.Numeric(precision=65, scale=5), nullable=False, index=True)
 
     id_subcategoria = db.Column(db.Integer, db.ForeignKey("subcategoria.id"), nullable=False)
     subcategoria = db.relationship("Subcategoria", back_populates="operaciones", single_parent=True)
@@ -40,6 +73,9 @@ class Operacion(db.Model):
     archivo3_path = db.Column(db.String(255), nullable=True)
 
     modificado_por_otro = db.Column(db.Boolean, nullable=False, default=False)
+
+    # Documento desnormalizado para la búsqueda global, mantenido por main.search.functions
+    texto_busqueda = db.Column(db.Text, nullable=True)
     
     @property
     def monto_total(self):
@@ -120,23 +156,14 @@ class Operacion(db.Model):
                 f'{self.caracter} - {self.naturaleza} - Monto: {self.monto_total}>')
 
     def to_json(self):
-
-        def get_filename(path):
-            if not path:
-                return None
-            match = re.search(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}_(.+)$', path)
-            if match:
-                return match.group(1)
-            return path.split('/')[-1]
-
         operacion_json = {
             "id": self.id,
-            "fecha": self.fecha.strftime("%Y-%m-%d"),
+            "fecha": self.fecha.isoformat(),
             "tipo": self.tipo,
             "caracter": self.caracter,
             "naturaleza": self.naturaleza,
             "persona": self.personas.to_json(),
-            "comprobante": get_filename(self.comprobante_path),
+            "comprobante": nombre_archivo(self.comprobante_path),
             "option": self.option,
             "codigo": self.codigo,
             "observaciones": self.observaciones,
@@ -144,9 +171,9 @@ class Operacion(db.Model):
             "monto_total": float(self.monto_total),
             "subcategoria":self.subcategoria.to_json(),
             "usuario": self.usuario.nombre,
-            "archivo1": get_filename(self.archivo1_path),
-            "archivo2": get_filename(self.archivo2_path),
-            "archivo3": get_filename(self.archivo3_path),
+            "archivo1": nombre_archivo(self.archivo1_path),
+            "archivo2": nombre_archivo(self.archivo2_path),
+            "archivo3": nombre_archivo(self.archivo3_path),
             "modificado_por_otro": self.modificado_por_otro
         }
         return operacion_json
@@ -4,7 +4,8 @@ import re
 class Persona(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     cuit = db.Column(db.BigInteger, nullable=False, unique=True)
-    razon_social = db.Column(db.String(255), nullable=False)
+    # Las búsquedas por razón social recorren este índice (más angosto que la tabla) y no la tabla
+    razon_social = db.Column(db.String(255), nullable=False, index=True)
 
     operaciones = db.relationship("Operacion", back_populates="personas")
 
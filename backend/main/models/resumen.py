@@ -0,0 +1,22 @@
+from .. import db
+
+class ResumenMensual(db.Model):
+    """Totales de operaciones por mes y dimensiones, mantenidos por main.resumen.functions"""
+
+    __tablename__ = 'resumen_mensual'
+
+    anio = db.Column(db.SmallInteger, primary_key=True)
+    mes = db.Column(db.SmallInteger, primary_key=True)
+    tipo = db.Column(db.String(10), primary_key=True)
+    caracter = db.Column(db.String(10), primary_key=True)
+    naturaleza = db.Column(db.String(10), primary_key=True)
+    id_subcategoria = db.Column(db.Integer, primary_key=True)
+    id_persona = db.Column(db.Integer, primary_key=True, index=True)
+
+    # Suma de monto_total (con signo) y de su valor absoluto, como en OperacionesTotales
+    total = db.Column(db.Numeric(precision=65, scale=5), nullable=False, default=0)
+    total_absoluto = db.Column(db.Numeric(precision=65, scale=5), nullable=False, default=0)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return '<ResumenMensual: %r-%r %r %r>' % (self.anio, self.mes, self.tipo, self.cantidad)
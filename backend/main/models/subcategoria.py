@@ -4,7 +4,7 @@ class Subcategoria(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     nombre = db.Column(db.String(255), nullable=False)
 
-    id_categoria = db.Column(db.Integer, db.ForeignKey("categoria.id"), nullable=False)
+    id_categoria = db.Column(db.Integer, db.ForeignKey("categoria.id"), nullable=False, index=True)
     categoria = db.relationship("Categoria", back_populates="subcategorias")
 
     operaciones = db.relationship("Operacion", back_populates="subcategoria")
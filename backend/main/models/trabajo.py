@@ -0,0 +1,50 @@
+from .. import db
+from datetime import datetime
+
+class Trabajo(db.Model):
+    """Trabajo en segundo plano (exportaciones, importaciones, correos) que ejecuta main.trabajos"""
+
+    ESTADOS = ['pendiente', 'en_curso', 'completado', 'fallido']
+
+    __table_args__ = (
+        # Próximo trabajo a tomar: pendientes ordenados por disponibilidad
+        db.Index('ix_trabajo_estado_disponible', 'estado', 'disponible_desde'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+    parametros = db.Column(db.JSON, nullable=True)
+    resultado = db.Column(db.JSON, nullable=True)
+    # Archivo generado (ruta absoluta en TRABAJOS_FOLDER), descargable desde /api/trabajo/<id>/resultado
+    archivo_resultado = db.Column(db.String(500), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    max_intentos = db.Column(db.Integer, nullable=False, default=3)
+    disponible_desde = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    iniciado = db.Column(db.DateTime, nullable=True)
+    finalizado = db.Column(db.DateTime, nullable=True)
+    worker = db.Column(db.String(100), nullable=True)
+
+    id_usuario = db.Column(db.Integer, db.ForeignKey("usuario.id", ondelete='SET NULL'), nullable=True, index=True)
+
+    def __repr__(self):
+        return '<Trabajo: %r %r %r>' % (self.id, self.tipo, self.estado)
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'resultado': self.resultado,
+            'tiene_archivo': self.archivo_resultado is not None,
+            'error': self.error,
+            'intentos': self.intentos,
+            'max_intentos': self.max_intentos,
+            'creado': self.creado.isoformat() if self.creado else None,
+            'iniciado': self.iniciado.isoformat() if self.iniciado else None,
+            'finalizado': self.finalizado.isoformat() if self.finalizado else None,
+            'disponible_desde': self.disponible_desde.isoformat() if self.disponible_desde else None,
+        }
@@ -0,0 +1,63 @@
+from sqlalchemy import event
+import re
+
+# Tablas donde un recorrido completo es un problema: las demás son catálogos chicos o, como el
+# resumen mensual, ya son la versión agregada de operacion
+TABLAS_GRANDES = ('operacion',)
+
+# Sentencias que tiene sentido explicar (las de escritura por lotes se ejecutan con executemany y se omiten)
+SENTENCIAS_EXPLICABLES = re.compile(r'\s*(SELECT|WITH|UPDATE|DELETE)\b', re.IGNORECASE)
+
+# Paso de EXPLAIN QUERY PLAN de SQLite que recorre una tabla entera: 'SCAN operacion' o
+# 'SCAN operacion AS o' (con alias), pero no 'SCAN operacion USING INDEX ...', que recorre un índice
+ESCANEO_SQLITE = re.compile(r'^SCAN (\w+)(?: AS (\w+))?$')
+
+class CapturaSentencias:
+    """Registra las sentencias que emite un engine mientras está activa (with CapturaSentencias(engine) as c)"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.sentencias = []
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and SENTENCIAS_EXPLICABLES.match(statement):
+            self.sentencias.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._registrar)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._registrar)
+
+def explicar(conexion, sentencia, parametros):
+    """Plan de ejecución de una sentencia ya compilada (texto y parámetros del driver), como lista de dicts"""
+    if conexion.dialect.name == 'sqlite':
+        filas = conexion.exec_driver_sql('EXPLAIN QUERY PLAN ' + sentencia, parametros)
+    else:
+        filas = conexion.exec_driver_sql('EXPLAIN ' + sentencia, parametros)
+    return [dict(fila._mapping) for fila in filas]
+
+def _alias(sentencia, tablas):
+    """Alias usados en la sentencia para cada tabla ('FROM operacion AS o' -> {'o': 'operacion'})"""
+    alias = {tabla: tabla for tabla in tablas}
+    for tabla in tablas:
+        for encontrado in re.findall(rf'\b{tabla}\s+(?:AS\s+)?(\w+)', sentencia, re.IGNORECASE):
+            alias.setdefault(encontrado, tabla)
+    return alias
+
+def escaneos_completos(conexion, sentencia, parametros, tablas=TABLAS_GRANDES):
+    """Pasos del plan que recorren entera alguna de 'tablas' (sin usar ningún índice), como texto legible"""
+    # Las sentencias que no nombran ninguna de las tablas no se explican
+    if not any(re.search(rf'\b{tabla}\b', sentencia, re.IGNORECASE) for tabla in tablas):
+        return []
+    alias = _alias(sentencia, tablas)
+    escaneos = []
+    for paso in explicar(conexion, sentencia, parametros):
+        if conexion.dialect.name == 'sqlite':
+            coincidencia = ESCANEO_SQLITE.match(paso['detail'])
+            if coincidencia and (coincidencia.group(2) or coincidencia.group(1)) in alias:
+                escaneos.append(paso['detail'])
+        elif paso.get('type') == 'ALL' and paso.get('table') in alias:
+            escaneos.append(f"ALL {paso['table']} (~{paso.get('rows')} filas)")
+    return escaneos
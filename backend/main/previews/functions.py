@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+from main.adjuntos.functions import REFERENCIA_BLOB, ruta_blob
+import functools, importlib.util, logging, os, threading
+
+logger = logging.getLogger(__name__)
+
+# Lado mayor (en píxeles) de la vista previa
+TAMANO_PREVIEW = 320
+
+FORMATOS_PREVIEW = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+EXTENSIONES_IMAGEN = {'jpg', 'jpeg', 'png', 'gif'}
+EXTENSIONES_PDF = {'pdf'}
+
+# Generación en segundo plano, por proceso: un solo hilo para no competir con las solicitudes
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('PREVIEWS_WORKERS', 1)), thread_name_prefix='preview')
+_en_curso = set()
+_lock = threading.Lock()
+_lock_pdfium = threading.Lock()
+
+@functools.cache
+def previews_disponibles(tipo='imagen'):
+    """Pillow (y pypdfium2 para los PDF) son opcionales: sin ellos no hay vistas previas"""
+    modulos = ['PIL', 'pypdfium2'] if tipo == 'pdf' else ['PIL']
+    return all(importlib.util.find_spec(modulo) is not None for modulo in modulos)
+
+def tipo_preview(valor):
+    """'imagen', 'pdf' o None si el adjunto no admite vista previa"""
+    extension = valor.rsplit('.', 1)[-1].lower() if '.' in valor else ''
+    if extension in EXTENSIONES_IMAGEN:
+        return 'imagen'
+    if extension in EXTENSIONES_PDF:
+        return 'pdf'
+    return None
+
+def ruta_preview(sha256, upload_folder, formato):
+    """La vista previa se guarda junto al blob: blobs/ab/cd/<sha256>.preview.<formato>"""
+    return f'{ruta_blob(sha256, upload_folder)}.preview.{formato}'
+
+def ruta_fallida(sha256, upload_folder):
+    """Marca que el contenido no se pudo renderizar, para no reintentarlo en cada solicitud"""
+    return f'{ruta_blob(sha256, upload_folder)}.preview.fallida'
+
+def _abrir_pdf(origen):
+    """Primera página del PDF como imagen"""
+    import pypdfium2
+
+    # pdfium no admite llamadas concurrentes desde varios hilos
+    with _lock_pdfium:
+        documento = pypdfium2.PdfDocument(origen)
+        try:
+            pagina = documento[0]
+            ancho, alto = pagina.get_size()
+            # Se renderiza apenas por encima del tamaño final: es lo que más tiempo lleva
+            escala = TAMANO_PREVIEW * 2 / max(ancho, alto)
+            return pagina.render(scale=escala).to_pil()
+        finally:
+            documento.close()
+
+def _reducir(imagen):
+    imagen.thumbnail((TAMANO_PREVIEW, TAMANO_PREVIEW))
+    if imagen.mode not in ('RGB', 'L'):
+        imagen = imagen.convert('RGB')
+    return imagen
+
+def _renderizar(origen, tipo):
+    """Imagen reducida, independiente del archivo de origen (que queda cerrado)"""
+    from PIL import Image, ImageOps
+
+    if tipo == 'pdf':
+        return _reducir(_abrir_pdf(origen))
+
+    with Image.open(origen) as imagen:
+        # draft() decodifica los JPEG directamente a una escala reducida
+        imagen.draft('RGB', (TAMANO_PREVIEW, TAMANO_PREVIEW))
+        # exif_transpose devuelve siempre una copia ya decodificada
+        return _reducir(ImageOps.exif_transpose(imagen))
+
+def _error_de_contenido(error):
+    """Si el error es del archivo (no se puede decodificar o renderizar) y no del entorno: con
+    MemoryError u OSError con errno (disco lleno, permisos, E/S) se vuelve a intentar más tarde"""
+    if isinstance(error, MemoryError):
+        return False
+    return not (isinstance(error, OSError) and error.errno is not None)
+
+def generar_preview(sha256, tipo, upload_folder, formato='webp'):
+    """Renderiza la vista previa y la escribe con un rename atómico. Devuelve la ruta o None"""
+    destino = ruta_preview(sha256, upload_folder, formato)
+    if os.path.exists(destino):
+        return destino
+
+    try:
+        imagen = _renderizar(ruta_blob(sha256, upload_folder), tipo)
+    except Exception as e:
+        logger.exception('No se pudo generar la vista previa de %s', sha256)
+        # Solo el contenido que no se puede renderizar queda marcado para siempre
+        if _error_de_contenido(e):
+            open(ruta_fallida(sha256, upload_folder), 'w').close()
+        return None
+
+    formato_pil, _ = FORMATOS_PREVIEW[formato]
+    temporal = f'{destino}.{threading.get_ident()}.part'
+    try:
+        imagen.save(temporal, formato_pil, quality=75)
+        os.replace(temporal, destino)
+        return destino
+    except Exception:
+        logger.exception('No se pudo guardar la vista previa de %s', sha256)
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        return None
+
+def _generar(clave, sha256, tipo, upload_folder, formatos):
+    try:
+        for formato in formatos:
+            generar_preview(sha256, tipo, upload_folder, formato)
+    finally:
+        with _lock:
+            _en_curso.discard(clave)
+
+def programar_preview(valor, upload_folder, formatos=tuple(FORMATOS_PREVIEW)):
+    """Encola la generación de las vistas previas de un adjunto (si corresponde y no está en curso)"""
+    referencia = REFERENCIA_BLOB.match(valor or '')
+    tipo = tipo_preview(valor or '')
+    if not referencia or not tipo or not previews_disponibles(tipo):
+        return False
+
+    sha256 = referencia.group(1)
+    clave = (sha256, formatos)
+    with _lock:
+        if clave in _en_curso:
+            return True
+        _en_curso.add(clave)
+
+    _executor.submit(_generar, clave, sha256, tipo, upload_folder, formatos)
+    return True
@@ -4,6 +4,7 @@ from .operacion import Operacion as OperacionResource
 from .operacion import Operaciones as OperacionesResource
 from .operacion import OperacionesBulk as OperacionesBulkResource
 from .operacion import OperacionesExcel as OperacionesExcelResource
+from .operacion import OperacionesImportar as OperacionesImportarResource
 from .operacion import OperacionesTotales as OperacionesTotalesResource
 from .concepto import Concepto as ConceptoResource
 from .concepto import Conceptos as ConceptosResource
@@ -13,5 +14,10 @@ from .subcategoria import Subcategoria as SubcategoriaResource
 from .subcategoria import Subcategorias as SubcategoriasResource
 from .persona import Persona as PersonaResource
 from .persona import Personas as PersonasResource
+from .catalogo import CatalogoJerarquia as CatalogoJerarquiaResource
 from .archivo import ArchivoOperacion as ArchivoOperacionResource
-from .archivo import ArchivosOperaciones as ArchivosOperacionesResource
\ No newline at end of file
+from .archivo import ArchivoOperacionPreview as ArchivoOperacionPreviewResource
+from .archivo import ArchivosOperaciones as ArchivosOperacionesResource
+from .trabajo import Trabajo as TrabajoResource
+from .trabajo import Trabajos as TrabajosResource
+from .trabajo import TrabajoResultado as TrabajoResultadoResource
\ No newline at end of file
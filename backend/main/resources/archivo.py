@@ -1,12 +1,13 @@
 from flask_restful import Resource, current_app
 from flask import request, send_file
-from werkzeug.utils import secure_filename
-import os, uuid
+from werkzeug.exceptions import RequestEntityTooLarge
+import os
 from .. import db
-from main.models import OperacionModel, UsuarioModel
-from flask_jwt_extended import get_jwt_identity
-from main.auth.decorators import role_required
+from main.models import OperacionModel
+from main.auth.decorators import role_required, usuario_actual
 from main.config.file_config import ALLOWED_EXTENSIONS, MAX_FILE_SIZE, ALLOWED_MIME_TYPES
+from main.adjuntos.functions import CAMPOS_ARCHIVO, MENSAJE_EXCEDIDO, REFERENCIA_BLOB, recibir_adjuntos, guardar_adjunto, liberar_adjunto, enviar_adjunto, aplicar_cache_adjunto
+from main.previews.functions import FORMATOS_PREVIEW, previews_disponibles, tipo_preview, ruta_preview, ruta_fallida, programar_preview
 
 def validate_file(file, field_name):
     """Validación completa del archivo"""
@@ -34,17 +35,9 @@ def validate_file(file, field_name):
     return True, 'Archivo válido'
 
 def procesar_archivo(file, upload_folder):
-    """Procesa y guarda un archivo validado - solo retorna el nombre del archivo"""
-    filename = str(uuid.uuid4()) + '_' + secure_filename(file.filename)
-    
-    if not os.path.exists(upload_folder):
-        os.makedirs(upload_folder)
-    
-    file_path = os.path.join(upload_folder, filename)
-    file.save(file_path)
-    
-    # Solo retornamos el nombre del archivo, no el path completo
-    return filename, file.content_type
+    """Procesa y guarda un archivo validado en el store de blobs - retorna el valor del campo *_path"""
+    # '<sha256>/<nombre>': el mismo contenido adjuntado varias veces se guarda una sola vez
+    return guardar_adjunto(file, upload_folder), file.content_type
 
 class ArchivoOperacion(Resource):
     @role_required(roles=["admin", "supervisor"])
@@ -61,12 +54,12 @@ class ArchivoOperacion(Resource):
 
             # Construir el path completo usando la variable de entorno
             upload_folder = current_app.config['UPLOAD_FOLDER']
-            full_path = os.path.join(upload_folder, filename)
+            respuesta = enviar_adjunto(filename, upload_folder)
 
-            if not os.path.exists(full_path):
+            if respuesta is None:
                 return {'message': f'El archivo {campo_archivo} no existe o no es accesible'}, 404
 
-            return send_file(full_path)
+            return respuesta
 
         except Exception as e:
             return {'message': 'Error al obtener el archivo', 'error': str(e)}, 500
@@ -79,11 +72,10 @@ class ArchivoOperacion(Resource):
             if not operacion:
                 return {'message': 'Operación no encontrada'}, 404
 
-            usuario_actual_id = get_jwt_identity()
-            usuario_actual = UsuarioModel.query.get(usuario_actual_id)
+            usuario = usuario_actual()
 
-            es_creador = int(operacion.id_usuario) == int(usuario_actual_id)
-            es_supervisor = "supervisor" == str(usuario_actual.rol)
+            es_creador = int(operacion.id_usuario) == usuario.id
+            es_supervisor = "supervisor" == usuario.rol
 
             if not (es_creador or es_supervisor):
                 return {'message': 'No tienes permiso para eliminar este archivo'}, 403
@@ -94,8 +86,7 @@ class ArchivoOperacion(Resource):
             if es_creador and not es_supervisor:
                 operacion.modificado_por_otro = False
 
-            campos_validos = ['comprobante', 'archivo1', 'archivo2', 'archivo3']
-            if campo_archivo not in campos_validos:
+            if campo_archivo not in CAMPOS_ARCHIVO:
                 return {'message': f'Campo de archivo "{campo_archivo}" no permitido'}, 400
 
             filename = getattr(operacion, f"{campo_archivo}_path", None)
@@ -112,12 +103,8 @@ class ArchivoOperacion(Resource):
             return {'message': 'Error al eliminar el archivo', 'error': str(e)}, 500
 
     def _eliminar_archivo_si_existe(self, filename):
-        """Elimina el archivo físico usando el filename y la variable de entorno"""
-        if filename:
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            full_path = os.path.join(upload_folder, filename)
-            if os.path.exists(full_path):
-                os.remove(full_path)
+        """Libera el archivo: resta una referencia al blob (o elimina el archivo si es anterior a los blobs)"""
+        liberar_adjunto(filename, current_app.config['UPLOAD_FOLDER'])
 
     @role_required(roles=["admin", "supervisor"])
     def patch(self, id_operacion, campo_archivo):
@@ -127,11 +114,10 @@ class ArchivoOperacion(Resource):
             if not operacion:
                 return {'message': 'Operación no encontrada'}, 404
 
-            usuario_actual_id = get_jwt_identity()
-            usuario_actual = UsuarioModel.query.get(usuario_actual_id)
+            usuario = usuario_actual()
 
-            es_creador = int(operacion.id_usuario) == int(usuario_actual_id)
-            es_supervisor = "supervisor" == str(usuario_actual.rol)
+            es_creador = int(operacion.id_usuario) == usuario.id
+            es_supervisor = "supervisor" == usuario.rol
 
             if not (es_creador or es_supervisor):
                 return {'message': 'No tienes permiso para editar esta operación'}, 403
@@ -142,10 +128,10 @@ class ArchivoOperacion(Resource):
             if es_creador and not es_supervisor :
                 operacion.modificado_por_otro = False
 
-            campos_validos = ['comprobante', 'archivo1', 'archivo2', 'archivo3']
-            if campo_archivo not in campos_validos:
+            if campo_archivo not in CAMPOS_ARCHIVO:
                 return {'message': f'Campo de archivo "{campo_archivo}" no permitido'}, 400
 
+            recibir_adjuntos(current_app.config['UPLOAD_FOLDER'])
             if campo_archivo not in request.files:
                 return {'message': f'No se envió el archivo "{campo_archivo}"'}, 400
 
@@ -169,6 +155,7 @@ class ArchivoOperacion(Resource):
                 setattr(operacion, f"{campo_archivo}_path", filename)
 
                 db.session.commit()
+                programar_preview(filename, upload_folder)
 
                 return {
                     'message': f'Archivo "{campo_archivo}" actualizado correctamente',
@@ -178,10 +165,59 @@ class ArchivoOperacion(Resource):
 
             return {'message': f'El archivo "{campo_archivo}" no es válido'}, 400
 
+        except RequestEntityTooLarge:
+            db.session.rollback()
+            return {'message': MENSAJE_EXCEDIDO}, 413
         except Exception as e:
             db.session.rollback()
             return {'message': 'Error al actualizar el archivo', 'error': str(e)}, 500
 
+class ArchivoOperacionPreview(Resource):
+    @role_required(roles=["admin", "supervisor"])
+    def get(self, id_operacion, campo_archivo):
+        """Vista previa reducida (imágenes y primera página de los PDF). Si todavía no
+        existe se encola su generación y se responde 202"""
+        try:
+            if campo_archivo not in CAMPOS_ARCHIVO:
+                return {'message': f'Campo de archivo "{campo_archivo}" no permitido'}, 400
+
+            formato = request.args.get('formato', 'webp').lower()
+            if formato not in FORMATOS_PREVIEW:
+                return {'message': f"Formato inválido. Valores permitidos: {', '.join(FORMATOS_PREVIEW)}"}, 400
+
+            operacion = OperacionModel.query.get(id_operacion)
+            if not operacion:
+                return {'message': 'Operación no encontrada'}, 404
+
+            filename = getattr(operacion, f"{campo_archivo}_path", None)
+            if not filename:
+                return {'message': f'El archivo {campo_archivo} no está registrado'}, 404
+
+            referencia = REFERENCIA_BLOB.match(filename)
+            tipo = tipo_preview(filename)
+            # Los adjuntos anteriores a los blobs no tienen vista previa hasta migrarlos
+            if not referencia or not tipo or not previews_disponibles(tipo):
+                return {'message': f'No hay vista previa disponible para {campo_archivo}'}, 404
+
+            sha256 = referencia.group(1)
+            upload_folder = current_app.config['UPLOAD_FOLDER']
+            path = ruta_preview(sha256, upload_folder, formato)
+
+            if os.path.exists(path):
+                respuesta = send_file(
+                    path, mimetype=FORMATOS_PREVIEW[formato][1], etag=f'{sha256}-{formato}', conditional=True
+                )
+                return aplicar_cache_adjunto(respuesta)
+
+            if os.path.exists(ruta_fallida(sha256, upload_folder)):
+                return {'message': f'No se pudo generar la vista previa de {campo_archivo}'}, 404
+
+            programar_preview(filename, upload_folder, (formato,))
+            return {'message': 'La vista previa se está generando'}, 202, {'Retry-After': '2'}
+
+        except Exception as e:
+            return {'message': 'Error al obtener la vista previa', 'error': str(e)}, 500
+
 class ArchivosOperaciones(Resource):
     @role_required(roles=["admin"])
     def post(self, id_operacion):
@@ -191,13 +227,14 @@ class ArchivosOperaciones(Resource):
                 return {'message': 'Operación no encontrada'}, 404
             
             archivos_procesados = []
-            campos_archivo = ['comprobante', 'archivo1', 'archivo2', 'archivo3']
+            recibir_adjuntos(current_app.config['UPLOAD_FOLDER'])
             
-            for campo in campos_archivo:
+            for campo in CAMPOS_ARCHIVO:
                 if campo in request.files:
                     try:
                         filename, content_type = self._procesar_archivo(campo)
                         if filename:  # Solo si se procesó correctamente
+                            liberar_adjunto(getattr(operacion, f"{campo}_path"), current_app.config['UPLOAD_FOLDER'])
                             setattr(operacion, f"{campo}_path", filename)
                             archivos_procesados.append(campo)
                     except ValueError as e:
@@ -207,6 +244,9 @@ class ArchivosOperaciones(Resource):
                 return {'message': 'No se proporcionaron archivos válidos'}, 400
             
             db.session.commit()
+
+            for campo in archivos_procesados:
+                programar_preview(getattr(operacion, f"{campo}_path"), current_app.config['UPLOAD_FOLDER'])
             
             return {
                 'message': 'Archivos adjuntados correctamente',
@@ -215,6 +255,9 @@ class ArchivosOperaciones(Resource):
                 'tipos_permitidos': list(ALLOWED_EXTENSIONS)
             }, 200
             
+        except RequestEntityTooLarge:
+            db.session.rollback()
+            return {'message': MENSAJE_EXCEDIDO}, 413
         except Exception as e:
             db.session.rollback()
             return {'message': 'Error al adjuntar archivos', 'error': str(e)}, 500
@@ -0,0 +1,18 @@
+from flask_restful import Resource
+from main.auth.decorators import role_required
+from main.catalogos.functions import jerarquia, versiones, responder_cacheado
+
+class CatalogoJerarquia(Resource):
+    @role_required(roles=["admin", "supervisor"])
+    def get(self):
+        """Conceptos con sus categorías y subcategorías en una sola respuesta (cacheada y comprimida).
+        'version' cambia con cualquier alta, modificación o baja en los tres catálogos"""
+        version = versiones('subcategoria')
+
+        def generar():
+            try:
+                return {'version': version, 'conceptos': jerarquia()}, 200
+            except Exception as e:
+                return {'message': 'Error al obtener la jerarquía de catálogos', 'error': str(e)}, 500
+
+        return responder_cacheado(('jerarquia', version), generar, comprimir=True)
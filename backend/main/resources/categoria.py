@@ -4,6 +4,7 @@ from .. import db
 from sqlalchemy import or_
 from main.models import CategoriaModel
 from main.auth.decorators import role_required
+from main.catalogos.functions import cache_catalogo
 import re
 
 class Categoria(Resource):
@@ -47,6 +48,7 @@ class Categoria(Resource):
     
 class Categorias(Resource):
     @role_required(roles=["admin", "supervisor"])
+    @cache_catalogo('categoria')
     def get(self):
         """Obtiene lista paginada de categorias con opción de búsqueda"""
         try:
@@ -5,6 +5,7 @@ from sqlalchemy import or_
 from sqlalchemy.exc import IntegrityError
 from main.models import ConceptoModel
 from main.auth.decorators import role_required
+from main.catalogos.functions import cache_catalogo
 
 class Concepto(Resource):
     @role_required(roles=["admin", "supervisor"])
@@ -60,6 +61,7 @@ class Concepto(Resource):
     
 class Conceptos(Resource):
     @role_required(roles=["admin", "supervisor"])
+    @cache_catalogo('concepto')
     def get(self):
         """Obtiene lista paginada de conceptos con opción de búsqueda"""
         try:
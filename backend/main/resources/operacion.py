@@ -1,14 +1,139 @@
 from flask_restful import Resource
-from flask import request, send_file
-from flask_jwt_extended import get_jwt_identity
-import os, io
+from flask import request, send_file, Response, stream_with_context
+import os, tempfile, json, base64, binascii, functools
 from .. import db
-from sqlalchemy import or_
-from dateutil.parser import parse
-from main.models import OperacionModel, PersonaModel, UsuarioModel, SubcategoriaModel, CategoriaModel, ConceptoModel
-from main.auth.decorators import role_required
-import pandas as pd
-from datetime import datetime
+from sqlalchemy import or_, and_, func, case, extract, select, update
+from sqlalchemy.orm import joinedload, aliased
+from main.models.operacion import nombre_archivo
+from main.models import OperacionModel, PersonaModel, UsuarioModel, SubcategoriaModel, CategoriaModel, ConceptoModel, ResumenMensualModel
+from main.auth.decorators import role_required, usuario_actual
+from main.search.functions import texto_busqueda, precargar_catalogos, filtro_busqueda_global, filtro_enum, filtro_prefijo, filtro_rango, filtro_monto, filtro_fecha
+from main.importacion.functions import importar_operaciones, leer_csv, leer_xlsx, leer_json
+from main.adjuntos.functions import liberar_adjunto
+from main.trabajos.functions import encolar
+from main.resumen.functions import registrar_cambio, filtros_resumen
+from main.export.functions import iterar_filas, escribir_xlsx, generar_csv, generar_ndjson
+from main.catalogos.functions import CacheLRU
+from datetime import datetime, date
+from decimal import Decimal
+
+# Estrategias de carga por endpoint: relaciones que cada serialización necesita.
+# Todas son many-to-one, por lo que un joinedload no multiplica filas y la
+# cantidad de SELECTs queda fija sin importar cuántas operaciones se devuelvan.
+CARGAS_OPERACION = {
+    'json': lambda: [
+        joinedload(OperacionModel.personas),
+        joinedload(OperacionModel.usuario),
+        joinedload(OperacionModel.subcategoria)
+            .joinedload(SubcategoriaModel.categoria)
+            .joinedload(CategoriaModel.concepto),
+    ],
+}
+CARGAS_OPERACION['excel'] = CARGAS_OPERACION['json']
+
+def query_operaciones(carga='json', filtros=None, ordenar=True):
+    """Construye la consulta de operaciones con el grafo de relaciones que necesita cada endpoint"""
+    query = db.session.query(OperacionModel).options(*CARGAS_OPERACION[carga]())
+
+    if filtros:
+        query = query.filter(*filtros)
+
+    if ordenar:
+        query = query.order_by(OperacionModel.fecha.desc(), OperacionModel.id.desc())
+
+    return query
+
+def query_filas_operaciones(filtros=None, ordenar=True):
+    """Misma consulta que query_operaciones('json') pero de columnas sueltas: no construye objetos ORM
+    ni identity map. Los catálogos se unen con alias para no interferir con las subconsultas de los filtros"""
+    persona = aliased(PersonaModel)
+    usuario = aliased(UsuarioModel)
+    subcategoria = aliased(SubcategoriaModel)
+    categoria = aliased(CategoriaModel)
+    concepto = aliased(ConceptoModel)
+
+    query = db.session.query(
+        OperacionModel.id, OperacionModel.fecha, OperacionModel.tipo, OperacionModel.caracter,
+        OperacionModel.naturaleza, OperacionModel.option, OperacionModel.codigo,
+        OperacionModel.observaciones, OperacionModel.metodo_de_pago, OperacionModel._monto_total,
+        OperacionModel.comprobante_path, OperacionModel.archivo1_path, OperacionModel.archivo2_path,
+        OperacionModel.archivo3_path, OperacionModel.modificado_por_otro,
+        persona.id.label('persona_id'), persona.cuit.label('persona_cuit'), persona.razon_social.label('persona_razon_social'),
+        subcategoria.id.label('subcategoria_id'), subcategoria.nombre.label('subcategoria_nombre'),
+        categoria.id.label('categoria_id'), categoria.nombre.label('categoria_nombre'),
+        concepto.id.label('concepto_id'), concepto.nombre.label('concepto_nombre'),
+        usuario.nombre.label('usuario_nombre'),
+    ).select_from(OperacionModel) \
+        .outerjoin(persona, persona.id == OperacionModel.id_persona) \
+        .outerjoin(usuario, usuario.id == OperacionModel.id_usuario) \
+        .outerjoin(subcategoria, subcategoria.id == OperacionModel.id_subcategoria) \
+        .outerjoin(categoria, categoria.id == subcategoria.id_categoria) \
+        .outerjoin(concepto, concepto.id == categoria.id_concepto)
+
+    if filtros:
+        query = query.filter(*filtros)
+
+    if ordenar:
+        query = query.order_by(OperacionModel.fecha.desc(), OperacionModel.id.desc())
+
+    return query
+
+def fila_json(fila):
+    """Misma salida que Operacion.to_json() a partir de una fila de query_filas_operaciones"""
+    return {
+        "id": fila.id,
+        "fecha": fila.fecha.isoformat(),
+        "tipo": fila.tipo,
+        "caracter": fila.caracter,
+        "naturaleza": fila.naturaleza,
+        "persona": {
+            'id': fila.persona_id,
+            'cuit': fila.persona_cuit,
+            'razon_social': fila.persona_razon_social
+        } if fila.persona_id is not None else None,
+        "comprobante": nombre_archivo(fila.comprobante_path),
+        "option": fila.option,
+        "codigo": fila.codigo,
+        "observaciones": fila.observaciones,
+        "metodo_de_pago": fila.metodo_de_pago,
+        "monto_total": float(fila._monto_total),
+        "subcategoria": {
+            'id': fila.subcategoria_id,
+            'nombre': fila.subcategoria_nombre,
+            'categoria': {
+                'id': fila.categoria_id,
+                'nombre': fila.categoria_nombre,
+                'concepto': {
+                    'id': fila.concepto_id,
+                    'nombre': fila.concepto_nombre,
+                } if fila.concepto_id is not None else None
+            } if fila.categoria_id is not None else None,
+        } if fila.subcategoria_id is not None else None,
+        "usuario": fila.usuario_nombre,
+        "archivo1": nombre_archivo(fila.archivo1_path),
+        "archivo2": nombre_archivo(fila.archivo2_path),
+        "archivo3": nombre_archivo(fila.archivo3_path),
+        "modificado_por_otro": fila.modificado_por_otro
+    }
+
+# Paginación por cursor
+POR_PAGINA_CURSOR = 50
+TTL_CACHE_TOTAL = 60  # segundos
+# Totales por combinación de filtros: al llenarse se descarta el menos usado, no todos
+_cache_total = CacheLRU(maximo=256)
+
+def codificar_cursor(operacion):
+    """Genera un cursor opaco con la (fecha, id) de la última operación de la página"""
+    crudo = json.dumps([operacion.fecha.isoformat(), operacion.id])
+    return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+def decodificar_cursor(cursor):
+    """Devuelve la (fecha, id) codificada en el cursor; ValueError si no es válido"""
+    try:
+        fecha, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(fecha), int(id)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError('Cursor inválido')
 
 class Operacion(Resource):
     @role_required(roles=["admin","supervisor"])
@@ -16,17 +141,7 @@ class Operacion(Resource):
         """"Obtiene una operacion por su ID"""
         
         try:
-            operacion  = db.session.query(OperacionModel).get_or_404(id)
-            
-            # Obtener el concepto de forma segura
-            concepto_nombre = 'No definido'
-            try:
-                if (operacion.subcategoria and 
-                    operacion.subcategoria.categoria and 
-                    operacion.subcategoria.categoria.concepto):
-                    concepto_nombre = operacion.subcategoria.categoria.concepto.nombre
-            except AttributeError:
-                concepto_nombre = 'Error al obtener concepto'
+            operacion = query_operaciones(ordenar=False).get_or_404(id)
             
             return operacion.to_json(), 200
             
@@ -56,28 +171,23 @@ class Operacion(Resource):
             return {'message': 'Error al eliminar la operación', 'error': str(e)}, 500
     
     def _eliminar_archivo_si_existe(self, filename):
-        """Elimina el archivo físico usando el filename y la variable de entorno"""
-        if filename:
-            from flask import current_app
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            full_path = os.path.join(upload_folder, filename)
-            if os.path.exists(full_path):
-                os.remove(full_path)
+        """Libera el archivo: resta una referencia al blob (o elimina el archivo si es anterior a los blobs)"""
+        from flask import current_app
+        liberar_adjunto(filename, current_app.config['UPLOAD_FOLDER'])
 
     @role_required(roles=["admin", "supervisor"])
     def patch(self, id):
         """Actualiza una operación específica"""
         try:
-            operacion = OperacionModel.query.get(id)
+            operacion = query_operaciones(ordenar=False).get(id)
             if not operacion:
                 return {'message': 'Operación no encontrada'}, 404
             
 
-            usuario_actual_id = get_jwt_identity()
-            usuario_actual = UsuarioModel.query.get(usuario_actual_id)
+            usuario = usuario_actual()
 
-            es_creador = int(operacion.id_usuario) == int(usuario_actual_id)
-            es_supervisor = "supervisor" == str(usuario_actual.rol)
+            es_creador = int(operacion.id_usuario) == usuario.id
+            es_supervisor = "supervisor" == usuario.rol
 
             if not (es_creador or es_supervisor):
                 return {'message': 'No tienes permiso para editar esta operación'}, 403
@@ -139,13 +249,15 @@ class Operaciones(Resource):
             page = request.args.get('page', type=int)
             per_page = request.args.get('per_page', type=int)
 
-            query = db.session.query(OperacionModel)
-
             filtros = self._generar_filtros(request.args)
-            
-            query = query.filter(*filtros) if filtros else query
 
-            query = query.order_by(OperacionModel.fecha.desc(), OperacionModel.id.desc())
+            # Listado de solo lectura: columnas sueltas en lugar de objetos ORM (ver fila_json)
+            query = query_filas_operaciones(filtros)
+
+            # Paginación por cursor (keyset): el costo no depende de la profundidad de la página
+            cursor = request.args.get('cursor')
+            if cursor is not None:
+                return self._paginar_por_cursor(query, cursor, per_page or POR_PAGINA_CURSOR, filtros)
 
             # Si no se especifican parámetros de paginación, devolver todos los registros
             if page is None or per_page is None:
@@ -153,7 +265,7 @@ class Operaciones(Resource):
                 total = len(operaciones)
                 
                 return {
-                    'operaciones': [operacion.to_json() for operacion in operaciones],
+                    'operaciones': [fila_json(operacion) for operacion in operaciones],
                     'total': total,           
                     'pages': 1,  
                     'page': 1,  
@@ -167,122 +279,115 @@ class Operaciones(Resource):
             )
 
             return {
-                'operaciones': [operacion.to_json() for operacion in operaciones.items],
+                'operaciones': [fila_json(operacion) for operacion in operaciones.items],
                 'total': operaciones.total,           
                 'pages': operaciones.pages,  
                 'page': operaciones.page,  
             }, 200
+        except ValueError as ve:
+            return {'message': str(ve)}, 400
         except Exception as e:
             import traceback
             traceback.print_exc()
             return {'message': f'Error interno del servidor: {str(e)}'}, 500
 
-    def _procesar_filtro_fecha(self, fecha):
-        """Procesa diferentes formatos de búsqueda por fecha"""
-        try:
-            if ':' in fecha:
-                fecha_desde, fecha_hasta = fecha.split(':')
-                return OperacionModel.fecha.between(
-                    parse(fecha_desde).date(),
-                    parse(fecha_hasta).date()
-                )
-            else:
-                return OperacionModel.fecha.like(f"%{fecha}%")
+    def _paginar_por_cursor(self, query, cursor, per_page, filtros):
+        """Devuelve la página siguiente al cursor usando WHERE (fecha, id) < (ultima_fecha, ultimo_id)"""
+        if cursor:
+            try:
+                ultima_fecha, ultimo_id = decodificar_cursor(cursor)
+            except ValueError:
+                return {'message': 'Cursor inválido'}, 400
+
+            query = query.filter(or_(
+                OperacionModel.fecha < ultima_fecha,
+                and_(OperacionModel.fecha == ultima_fecha, OperacionModel.id < ultimo_id)
+            ))
+
+        # Se pide una fila extra para saber si existe una página siguiente sin contar
+        operaciones = query.limit(per_page + 1).all()
+        hay_siguiente = len(operaciones) > per_page
+        operaciones = operaciones[:per_page]
+
+        resultado = {
+            'operaciones': [fila_json(operacion) for operacion in operaciones],
+            'per_page': per_page,
+            'next_cursor': codificar_cursor(operaciones[-1]) if hay_siguiente else None,
+        }
 
-        except ValueError:
-            raise ValueError("Fecha inválida. Debe ser en formato 'YYYY-MM-DD', 'YYYY-MM', 'YYYYMM' o 'YYYY'.")
+        # El total es opcional y se cachea por combinación de filtros
+        if request.args.get('total', '').lower() in ('1', 'true'):
+            resultado['total'] = self._contar_con_cache(filtros)
+
+        return resultado, 200
+
+    def _contar_con_cache(self, filtros):
+        """Cuenta las operaciones filtradas reutilizando el resultado durante TTL_CACHE_TOTAL segundos"""
+        clave = tuple(sorted(
+            (campo, valor) for campo, valor in request.args.items()
+            if campo not in ('cursor', 'page', 'per_page', 'total')
+        ))
+        total = _cache_total.get(clave)
+        if total is not None:
+            return total
+
+        query = db.session.query(func.count(OperacionModel.id))
+        total = (query.filter(*filtros) if filtros else query).scalar()
+        _cache_total.set(clave, total, TTL_CACHE_TOTAL)
+
+        return total
 
     def _generar_filtros(self, params):
         """Genera una lista de filtros en base a los parámetros de la request"""
         campos_busqueda = {
-            'id': OperacionModel.id,
-            'fecha': self._procesar_filtro_fecha,
-            'tipo': OperacionModel.tipo,
-            'naturaleza': OperacionModel.naturaleza,
-            'caracter': OperacionModel.caracter,
-            'persona': lambda t: OperacionModel.personas.has(or_(
+            'id': lambda t: filtro_rango(OperacionModel.id, t),
+            'fecha': filtro_fecha,
+            'tipo': lambda t: filtro_enum(OperacionModel.tipo, OperacionModel.TIPOS_PERMITIDOS, t),
+            'naturaleza': lambda t: filtro_enum(OperacionModel.naturaleza, OperacionModel.NATURALEZAS_PERMITIDAS, t),
+            'caracter': lambda t: filtro_enum(OperacionModel.caracter, OperacionModel.CARACTERES_PERMITIDOS, t),
+            # Los filtros por catálogo van como IN (SELECT id ...): se resuelve primero la tabla chica y
+            # después los índices (id_persona, fecha), (id_subcategoria, fecha) e (id_usuario, fecha);
+            # con EXISTS (relacion.has) la base recorre todas las operaciones evaluando la subconsulta
+            'persona': lambda t: OperacionModel.id_persona.in_(select(PersonaModel.id).where(or_(
                 PersonaModel.cuit.like(f"%{t}%"),
                 PersonaModel.razon_social.like(f"%{t}%")
-            )),
-            'cuit': lambda t: OperacionModel.personas.has(
-                PersonaModel.cuit.like(f"%{t}%")
+            ))),
+            'cuit': lambda t: OperacionModel.id_persona.in_(
+                select(PersonaModel.id).where(PersonaModel.cuit.like(f"%{t}%"))
             ),
-            'option': OperacionModel.option,
-            'codigo': OperacionModel.codigo,
-            'observaciones': OperacionModel.observaciones,
-            'pago': OperacionModel.metodo_de_pago,
-            'monto': OperacionModel._monto_total,
-            'concepto': lambda t: OperacionModel.subcategoria.has(
-                SubcategoriaModel.categoria.has(
-                    CategoriaModel.concepto.has(
-                        ConceptoModel.nombre.like(f"%{t}%")
-                    )
-                )
+            'option': lambda t: filtro_enum(OperacionModel.option, OperacionModel.OPTIONS_PERMITIDAS, t),
+            'codigo': lambda t: filtro_prefijo(OperacionModel.codigo, t),
+            'observaciones': lambda t: OperacionModel.observaciones.like(f"%{t}%"),
+            'pago': lambda t: filtro_enum(OperacionModel.metodo_de_pago, OperacionModel.METODOS_PAGO_PERMITIDOS, t),
+            'monto': filtro_monto,
+            'concepto': lambda t: OperacionModel.id_subcategoria.in_(
+                select(SubcategoriaModel.id).where(SubcategoriaModel.id_categoria.in_(
+                    select(CategoriaModel.id).where(CategoriaModel.id_concepto.in_(
+                        select(ConceptoModel.id).where(ConceptoModel.nombre.like(f"%{t}%"))
+                    ))
+                ))
             ),
-            'categoria': lambda t: OperacionModel.subcategoria.has(
-                SubcategoriaModel.categoria.has(
-                    CategoriaModel.nombre.like(f"%{t}%")
-                )
+            'categoria': lambda t: OperacionModel.id_subcategoria.in_(
+                select(SubcategoriaModel.id).where(SubcategoriaModel.id_categoria.in_(
+                    select(CategoriaModel.id).where(CategoriaModel.nombre.like(f"%{t}%"))
+                ))
             ),
-            'subcategoria': lambda t: OperacionModel.subcategoria.has(
-                SubcategoriaModel.nombre.like(f"%{t}%")
+            'subcategoria': lambda t: OperacionModel.id_subcategoria.in_(
+                select(SubcategoriaModel.id).where(SubcategoriaModel.nombre.like(f"%{t}%"))
             ),
-            'usuario': lambda t: OperacionModel.usuario.has(
-                UsuarioModel.nombre.like(f"%{t}%")
+            'usuario': lambda t: OperacionModel.id_usuario.in_(
+                select(UsuarioModel.id).where(UsuarioModel.nombre.like(f"%{t}%"))
             ),
-            'global': lambda t: or_(
-                OperacionModel.id.like(f"%{t}%"),
-                OperacionModel.fecha.like(f"%{t}%"),
-                OperacionModel.tipo.like(f"%{t}%"),
-                OperacionModel.caracter.like(f"%{t}%"),
-                OperacionModel.naturaleza.like(f"%{t}%"),
-                OperacionModel.option.like(f"%{t}%"),
-                OperacionModel.codigo.like(f"%{t}%"),
-                OperacionModel.observaciones.like(f"%{t}%"),
-                OperacionModel.metodo_de_pago.like(f"%{t}%"),
-                OperacionModel._monto_total.like(f"%{t}%"),
-                OperacionModel.personas.has(or_(
-                    PersonaModel.cuit.like(f"%{t}%"),
-                    PersonaModel.razon_social.like(f"%{t}%")
-                )),
-                OperacionModel.subcategoria.has(
-                    SubcategoriaModel.nombre.like(f"%{t}%")
-                ),
-                OperacionModel.subcategoria.has(
-                    SubcategoriaModel.categoria.has(
-                        CategoriaModel.nombre.like(f"%{t}%")
-                    )
-                ),
-                OperacionModel.subcategoria.has(
-                    SubcategoriaModel.categoria.has(
-                        ConceptoModel.nombre.like(f"%{t}%")
-                    )
-                ),
-                OperacionModel.usuario.has(
-                    UsuarioModel.nombre.like(f"%{t}%")
-                )
-            )
+            'global': filtro_busqueda_global
         }
 
         filtros = []
         
-        # Procesar todos los filtros (comportamiento combinado - AND)
+        # Procesar todos los filtros (comportamiento combinado - AND).
+        # Un valor inválido lanza ValueError, que los endpoints devuelven como 400
         for campo, valor in params.items():
-            # Ignorar parámetros de paginación y otros que no son filtros
-            if campo in ['page', 'per_page']:
-                continue
-                
-            if campo in campos_busqueda:
-                try:
-                    if campo == "fecha":
-                        filtros.append(campos_busqueda["fecha"](valor))
-                    elif callable(campos_busqueda[campo]):
-                        filtros.append(campos_busqueda[campo](valor))
-                    else:
-                        filtros.append(campos_busqueda[campo].like(f"%{valor}%"))
-                except Exception as e:
-                    # Continuar con otros filtros si hay error
-                    continue
+            if campo in campos_busqueda and valor:
+                filtros.append(campos_busqueda[campo](valor))
 
         return filtros
 
@@ -332,72 +437,105 @@ class Operaciones(Resource):
             db.session.rollback()
             return {'message': 'Error al crear la operacion', 'error': str(e)}, 500
         
+# Tamaño de lote para el IN de precarga y el executemany de la actualización masiva
+TAMANO_LOTE_BULK = 1000
+
 class OperacionesBulk(Resource):
+    CAMPOS_PERMITIDOS = [
+        'fecha', 'tipo', 'caracter', 'naturaleza', 'id_persona', 
+        'option', 'codigo', 'observaciones', 'metodo_de_pago', 
+        'monto_total', 'id_subcategoria'
+    ]
+
     @role_required(roles=["admin", "supervisor"])
     def patch(self):
-        """Actualiza múltiples operaciones en una sola solicitud"""
+        """Actualiza múltiples operaciones en una sola solicitud y una sola transacción"""
         try:
             if not request.json or not isinstance(request.json, list):
                 return {'message': 'Se esperaba una lista de operaciones para actualizar'}, 400
+
+            if not all(isinstance(operacion_data, dict) and 'id' in operacion_data for operacion_data in request.json):
+                return {'message': 'Cada operación debe contener un campo "id"'}, 400
             
-            usuario_actual_id = get_jwt_identity()
-            
+            usuario = usuario_actual()
+            es_supervisor = "supervisor" == usuario.rol
+
             operaciones_actualizadas = []
             operaciones_no_encontradas = []
             operaciones_sin_permiso = []
-            
+            operaciones_invalidas = []
+            filas = []
+
+            # Los ids pueden llegar como cadenas numéricas ("3"), igual que en el endpoint individual
+            # Cada id una sola vez: los cambios se calculan sobre la fila leída antes del lote, así que
+            # dos cambios de la misma operación restarían dos veces su aporte al resumen mensual
+            lote = []
+            ids_vistos = set()
             for operacion_data in request.json:
-                if 'id' not in operacion_data:
-                    return {'message': 'Cada operación debe contener un campo "id"'}, 400
-                
-                operacion = OperacionModel.query.get(operacion_data['id'])
-                if not operacion:
-                    operaciones_no_encontradas.append(operacion_data['id'])
+                try:
+                    id = self._convertir_id(operacion_data['id'])
+                except ValueError as ve:
+                    operaciones_invalidas.append({'id': operacion_data['id'], 'error': str(ve)})
                     continue
-                
-                usuario_actual = UsuarioModel.query.get(usuario_actual_id)
+                if id in ids_vistos:
+                    operaciones_invalidas.append({'id': id, 'error': 'La operación aparece más de una vez en el lote'})
+                    continue
+                ids_vistos.add(id)
+                lote.append((id, operacion_data))
 
-                es_creador = int(operacion.id_usuario) == int(usuario_actual_id)
-                es_supervisor = "supervisor" == str(usuario_actual.rol)
+            actuales = self._precargar([id for id, _ in lote])
+            catalogos = {}
+            precargar_catalogos(db.session, actuales.values(), catalogos)
+            
+            for id, operacion_data in lote:
+                actual = actuales.get(id)
+                if not actual:
+                    operaciones_no_encontradas.append(id)
+                    continue
+                
+                es_creador = int(actual['id_usuario']) == usuario.id
                 
                 if not (es_creador or es_supervisor):
-                    operaciones_sin_permiso.append(operacion_data['id'])
+                    operaciones_sin_permiso.append(id)
                     continue
-                
+
+                campos_actualizados = [campo for campo in self.CAMPOS_PERMITIDOS if campo in operacion_data]
+                if not campos_actualizados:
+                    continue
+
+                try:
+                    fila = self._aplicar_cambios(actual, operacion_data, campos_actualizados, catalogos)
+                except (ValueError, TypeError) as e:
+                    # TypeError: valores de otro tipo, p. ej. "fecha": 20240101 o "monto_total": [1]
+                    operaciones_invalidas.append({'id': id, 'error': str(e)})
+                    continue
+
                 if es_supervisor and not es_creador:
-                    operacion.modificado_por_otro = True
+                    fila['modificado_por_otro'] = True
 
                 if es_creador and not es_supervisor:
-                    operacion.modificado_por_otro = False
+                    fila['modificado_por_otro'] = False
 
-                campos_actualizados = []
-                
-                if 'tipo' in operacion_data:
-                    tipo_anterior = operacion.tipo
-                    nuevo_tipo = operacion_data['tipo']
-                    if tipo_anterior != nuevo_tipo:
-                        operacion.actualizar_tipo_operacion(nuevo_tipo)
-                        campos_actualizados.append('tipo')
-
-                campos_permitidos = [
-                    'fecha', 'tipo', 'caracter', 'naturaleza', 'id_persona', 
-                    'option', 'codigo', 'observaciones', 'metodo_de_pago', 
-                    'monto_total', 'id_subcategoria'
-                ]
-                
-                for campo in campos_permitidos:
-                    if campo in operacion_data:
-                        setattr(operacion, campo, operacion_data[campo])
-                        if campo not in campos_actualizados:
-                            campos_actualizados.append(campo)
-                
-                if campos_actualizados:
-                    operaciones_actualizadas.append({
-                        'id': operacion.id,
-                        'campos_actualizados': campos_actualizados
-                    })
-            
-            if operaciones_actualizadas:
+                filas.append(fila)
+                operaciones_actualizadas.append({
+                    'id': fila['id'],
+                    'campos_actualizados': campos_actualizados
+                })
+
+            # Validación completa antes de escribir: o se aplica todo el lote o nada
+            if operaciones_invalidas:
+                return {
+                    'message': f'{len(operaciones_invalidas)} operaciones tienen datos inválidos; no se actualizó ninguna',
+                    'operaciones_invalidas': operaciones_invalidas
+                }, 400
+            
+            if filas:
+                # El UPDATE por lotes no dispara los eventos del mapper: el resumen mensual se ajusta a mano
+                for fila in filas:
+                    actual = actuales[fila['id']]
+                    registrar_cambio(db.session, actual, {**actual, **fila})
+                for inicio in range(0, len(filas), TAMANO_LOTE_BULK):
+                    db.session.execute(update(OperacionModel), filas[inicio:inicio + TAMANO_LOTE_BULK])
                 db.session.commit()
             
             resultado = {
@@ -417,73 +555,321 @@ class OperacionesBulk(Resource):
             db.session.rollback()
             return {'message': 'Error al actualizar operaciones', 'error': str(e)}, 500
 
+    def _precargar(self, ids):
+        """Trae las filas actuales de todas las operaciones del lote con consultas IN, sin construir objetos ORM"""
+        tabla = OperacionModel.__table__
+        ids = list(set(ids))
+        actuales = {}
+
+        for inicio in range(0, len(ids), TAMANO_LOTE_BULK):
+            consulta = select(tabla).where(tabla.c.id.in_(ids[inicio:inicio + TAMANO_LOTE_BULK]))
+            for fila in db.session.execute(consulta).mappings():
+                actuales[fila['id']] = fila
+
+        return actuales
+
+    @staticmethod
+    def _convertir_id(valor):
+        """Id de operación como entero: acepta enteros y cadenas numéricas, como query.get"""
+        if not isinstance(valor, bool) and isinstance(valor, (int, str)):
+            try:
+                return int(valor)
+            except ValueError:
+                pass
+        raise ValueError(f'Id de operación inválido: {valor!r}')
+
+    @staticmethod
+    @functools.cache
+    def _atributos_por_columna():
+        """Pares (nombre de columna, atributo del modelo), p. ej. ('monto_total', '_monto_total')"""
+        return tuple(
+            (columna.key, OperacionModel.__mapper__.get_property_by_column(columna).key)
+            for columna in OperacionModel.__table__.columns
+        )
+
+    def _aplicar_cambios(self, actual, operacion_data, campos, catalogos):
+        """Aplica los cambios sobre una copia transitoria de la operación (fuera de la sesión) para
+        reutilizar los validadores del modelo, y devuelve la fila resultante para el UPDATE"""
+        # Se cargan los valores actuales como estado ya persistido: sin validadores ni historial
+        operacion = OperacionModel()
+        operacion.__dict__.update(
+            (atributo, actual[columna]) for columna, atributo in self._atributos_por_columna()
+        )
+
+        if 'tipo' in operacion_data and operacion_data['tipo'] != operacion.tipo:
+            operacion.actualizar_tipo_operacion(operacion_data['tipo'])
+
+        for campo in campos:
+            setattr(operacion, campo, operacion_data[campo])
+
+        operacion.texto_busqueda = texto_busqueda(operacion, db.session, catalogos)
+
+        # Solo los atributos enviados (más los derivados): filas con los mismos campos se agrupan en un único executemany
+        atributos = {'_monto_total' if campo == 'monto_total' else campo for campo in campos}
+        if 'tipo' in campos:
+            atributos.add('_monto_total')
+        atributos.update(('id', 'modificado_por_otro', 'texto_busqueda'))
+
+        fila = {atributo: getattr(operacion, atributo) for atributo in atributos}
+        return fila
+
+class OperacionesImportar(Resource):
+    # Lectores por extensión del archivo subido
+    LECTORES = {
+        'csv': leer_csv,
+        'xlsx': leer_xlsx,
+    }
+
+    @role_required(roles=["admin"])
+    def post(self):
+        """Importa operaciones en lote desde un arreglo JSON o un archivo CSV/XLSX (columnas de la exportación)"""
+        try:
+            id_usuario = usuario_actual().id
+
+            if 'archivo' in request.files:
+                archivo = request.files['archivo']
+                extension = archivo.filename.rsplit('.', 1)[-1].lower() if '.' in archivo.filename else ''
+                if extension not in self.LECTORES:
+                    return {'message': f'Formato no soportado. Extensiones permitidas: {", ".join(self.LECTORES)}'}, 400
+
+                # La fila 1 es el encabezado
+                resultado = importar_operaciones(self.LECTORES[extension](archivo), id_usuario, primera_fila=2)
+
+            elif request.is_json and isinstance(request.json, list):
+                resultado = importar_operaciones(leer_json(request.json), id_usuario)
+
+            else:
+                return {'message': 'Se esperaba una lista de operaciones o un archivo CSV/XLSX en el campo "archivo"'}, 400
+
+            resultado['message'] = f'Se importaron {resultado["importadas"]} operaciones'
+            return resultado, 201 if resultado['importadas'] else 400
+
+        except Exception as e:
+            db.session.rollback()
+            return {'message': 'Error al importar operaciones', 'error': str(e)}, 500
+
+def validar_exportacion(parametros):
+    """Valida formato y filtros de una exportación antes de encolarla (ValueError si son inválidos)"""
+    formato = parametros.get('formato', 'xlsx')
+    if formato not in OperacionesExcel.FORMATOS:
+        raise ValueError(f'Formato inválido. Debe ser uno de: {", ".join(OperacionesExcel.FORMATOS)}')
+    Operaciones()._generar_filtros({campo: valor for campo, valor in parametros.items() if campo != 'formato'})
+
 class OperacionesExcel(Resource):
+    # Formatos de exportación: (mimetype, extensión)
+    FORMATOS = {
+        'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+        'csv': ('text/csv', 'csv'),
+        'ndjson': ('application/x-ndjson', 'ndjson'),
+    }
+
     @role_required(roles=["admin", "supervisor"])
     def get(self):
-        """Genera y descarga un archivo Excel con las operaciones filtradas"""
+        """Genera y descarga un archivo Excel (o CSV/NDJSON en streaming) con las operaciones filtradas"""
         try:
+            formato = request.args.get('formato', 'xlsx')
+            if formato not in self.FORMATOS:
+                return {'message': f'Formato inválido. Debe ser uno de: {", ".join(self.FORMATOS)}'}, 400
+
             filtros = Operaciones()._generar_filtros(request.args)
-            query = db.session.query(OperacionModel)
-            query = query.filter(*filtros) if filtros else query
-            
-            # Ordenar por Fecha descendente (más reciente primero)
-            query = query.order_by(OperacionModel.fecha.desc(), OperacionModel.id.desc())
-            
-            operaciones = query.all()
-            
-            data = [op.to_excel() for op in operaciones]
-            df = pd.DataFrame(data)
 
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, sheet_name='Operaciones', index=False)
-            
-            output.seek(0)
+            # Exportaciones grandes: se generan en el worker y se descargan desde /api/trabajo/<id>/resultado
+            if request.args.get('asincrono', 'false').lower() == 'true':
+                parametros = {campo: valor for campo, valor in request.args.items() if campo != 'asincrono'}
+                trabajo = encolar('exportar_operaciones', parametros, id_usuario=usuario_actual().id)
+                return trabajo.to_json(), 202, {'Location': f'/api/trabajo/{trabajo.id}'}
+
+            # Ordenada por Fecha descendente (más reciente primero)
+            query = query_operaciones('excel', filtros)
+            filas = iterar_filas(query)
+
+            mimetype, extension = self.FORMATOS[formato]
+            download_name = f'operaciones_{datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}.{extension}'
+
+            if formato == 'xlsx':
+                # El xlsx es un zip que recién se completa al cerrarlo: se arma en un
+                # archivo temporal en disco (se borra solo al cerrarse) y no en memoria
+                output = tempfile.TemporaryFile()
+                escribir_xlsx(filas, output, OperacionModel.COLUMNAS_EXCEL)
+                output.seek(0)
+
+                return send_file(
+                    output,
+                    mimetype=mimetype,
+                    as_attachment=True,
+                    download_name=download_name
+                )
+
+            generador = generar_csv(filas, OperacionModel.COLUMNAS_EXCEL) if formato == 'csv' else generar_ndjson(filas)
 
-            return send_file(
-                output, 
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=f'operaciones_{datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}.xlsx'
+            return Response(
+                stream_with_context(generador),
+                mimetype=mimetype,
+                headers={'Content-Disposition': f'attachment; filename={download_name}'}
             )
+
+        except ValueError as ve:
+            return {'message': str(ve)}, 400
             
         except Exception as e:
             return {'message': f'Error al generar Excel: {str(e)}'}, 500
 
 class OperacionesTotales(Resource):
+    # Columnas de agrupación y joins necesarios para cada valor de 'group_by'
+    AGRUPACIONES = {
+        'mes': lambda: (
+            [extract('year', OperacionModel.fecha).label('anio'),
+             extract('month', OperacionModel.fecha).label('mes')],
+            []
+        ),
+        'concepto': lambda: (
+            [ConceptoModel.id, ConceptoModel.nombre],
+            [SubcategoriaModel, CategoriaModel, ConceptoModel]
+        ),
+        'categoria': lambda: (
+            [CategoriaModel.id, CategoriaModel.nombre],
+            [SubcategoriaModel, CategoriaModel]
+        ),
+        'subcategoria': lambda: (
+            [SubcategoriaModel.id, SubcategoriaModel.nombre],
+            [SubcategoriaModel]
+        ),
+        'persona': lambda: (
+            [PersonaModel.id, PersonaModel.razon_social.label('nombre')],
+            [PersonaModel]
+        ),
+        'usuario': lambda: (
+            [UsuarioModel.id, UsuarioModel.nombre],
+            [UsuarioModel]
+        ),
+    }
+
+    # Las mismas agrupaciones sobre el resumen mensual (sin 'usuario', que no es una de sus dimensiones)
+    AGRUPACIONES_RESUMEN = {
+        'mes': lambda: (
+            [ResumenMensualModel.anio, ResumenMensualModel.mes],
+            []
+        ),
+        'concepto': lambda: (
+            [ConceptoModel.id, ConceptoModel.nombre],
+            [(SubcategoriaModel, SubcategoriaModel.id == ResumenMensualModel.id_subcategoria), (CategoriaModel, None), (ConceptoModel, None)]
+        ),
+        'categoria': lambda: (
+            [CategoriaModel.id, CategoriaModel.nombre],
+            [(SubcategoriaModel, SubcategoriaModel.id == ResumenMensualModel.id_subcategoria), (CategoriaModel, None)]
+        ),
+        'subcategoria': lambda: (
+            [SubcategoriaModel.id, SubcategoriaModel.nombre],
+            [(SubcategoriaModel, SubcategoriaModel.id == ResumenMensualModel.id_subcategoria)]
+        ),
+        'persona': lambda: (
+            [PersonaModel.id, PersonaModel.razon_social.label('nombre')],
+            [(PersonaModel, PersonaModel.id == ResumenMensualModel.id_persona)]
+        ),
+    }
+
     @role_required(roles=["admin", "supervisor"])
     def get(self):
         """Calcula totales de operaciones aplicando los mismos filtros que el endpoint principal"""
         try:
-            query = db.session.query(OperacionModel)
+            group_by = request.args.get('group_by')
+            if group_by and group_by not in self.AGRUPACIONES:
+                return {'message': f'group_by inválido. Debe ser uno de: {", ".join(self.AGRUPACIONES)}'}, 400
 
             # Aplicar los mismos filtros que el endpoint principal
             filtros = Operaciones()._generar_filtros(request.args)
-            query = query.filter(*filtros) if filtros else query
 
-            # Obtener todas las operaciones que coinciden con los filtros
-            operaciones = query.all()
+            # Si todos los filtros y la agrupación se pueden expresar por mes, se responde desde el
+            # resumen mensual (cientos de filas) en lugar de recorrer las operaciones
+            filtros_mes = filtros_resumen(request.args)
+            usar_resumen = (
+                request.args.get('fuente') != 'operaciones'
+                and (not group_by or group_by in self.AGRUPACIONES_RESUMEN)
+                and filtros_mes is not None
+                and len(filtros_mes) == len(filtros)
+            )
 
-            # Calcular totales
-            total_ingresos = 0
-            total_egresos = 0
-            
-            for operacion in operaciones:
-                monto = float(operacion.monto_total) if operacion.monto_total else 0
-                
-                if operacion.tipo == 'ingreso':
-                    total_ingresos += monto
-                elif operacion.tipo == 'egreso':
-                    total_egresos += abs(monto)  # Asegurar que egresos son positivos
-            
-            total_general = total_ingresos - total_egresos
-            
-            return {
-                'total_general': total_general,
-                'total_ingresos': total_ingresos,
-                'total_egresos': total_egresos,
-                'cantidad_operaciones': len(operaciones)
-            }, 200
+            if not group_by:
+                query = self._query_resumen(filtros_mes) if usar_resumen else self._query_totales(filtros)
+                fila = query.one()
+                return self._totales(fila.total_ingresos, fila.total_egresos, fila.cantidad_operaciones), 200
+
+            if usar_resumen:
+                columnas, joins = self.AGRUPACIONES_RESUMEN[group_by]()
+                query = self._query_resumen(filtros_mes, columnas)
+                for modelo, condicion in joins:
+                    query = query.join(modelo, condicion) if condicion is not None else query.join(modelo)
+            else:
+                columnas, joins = self.AGRUPACIONES[group_by]()
+                query = self._query_totales(filtros, columnas)
+                for modelo in joins:
+                    query = query.join(modelo)
+            filas = query.group_by(*columnas).order_by(*columnas).all()
+
+            # Cada operación pertenece a un único grupo: el total general sale de sumar los grupos
+            resultado = self._totales(
+                sum((Decimal(str(fila.total_ingresos)) for fila in filas), Decimal(0)),
+                sum((Decimal(str(fila.total_egresos)) for fila in filas), Decimal(0)),
+                sum(fila.cantidad_operaciones for fila in filas)
+            )
+            resultado['group_by'] = group_by
+            resultado['grupos'] = [self._grupo(group_by, fila) for fila in filas]
+
+            return resultado, 200
+
+        except ValueError as ve:
+            return {'message': str(ve)}, 400
             
         except Exception as e:
-            return {'message': f'Error al calcular totales: {str(e)}'}, 500
\ No newline at end of file
+            return {'message': f'Error al calcular totales: {str(e)}'}, 500
+
+    def _query_totales(self, filtros, columnas=()):
+        """Consulta de agregación: suma ingresos y egresos y cuenta operaciones en la base de datos"""
+        monto = OperacionModel._monto_total
+        ingresos = func.coalesce(func.sum(case((OperacionModel.tipo == 'ingreso', monto), else_=0)), 0)
+        egresos = func.coalesce(func.sum(case((OperacionModel.tipo == 'egreso', func.abs(monto)), else_=0)), 0)
+
+        query = db.session.query(
+            *columnas,
+            ingresos.label('total_ingresos'),
+            egresos.label('total_egresos'),
+            func.count(OperacionModel.id).label('cantidad_operaciones')
+        ).select_from(OperacionModel)
+
+        return query.filter(*filtros) if filtros else query
+
+    def _query_resumen(self, filtros, columnas=()):
+        """Misma agregación que _query_totales sobre el resumen mensual"""
+        ingresos = func.coalesce(func.sum(case((ResumenMensualModel.tipo == 'ingreso', ResumenMensualModel.total), else_=0)), 0)
+        egresos = func.coalesce(func.sum(case((ResumenMensualModel.tipo == 'egreso', ResumenMensualModel.total_absoluto), else_=0)), 0)
+
+        query = db.session.query(
+            *columnas,
+            ingresos.label('total_ingresos'),
+            egresos.label('total_egresos'),
+            func.coalesce(func.sum(ResumenMensualModel.cantidad), 0).label('cantidad_operaciones')
+        ).select_from(ResumenMensualModel)
+
+        return query.filter(*filtros) if filtros else query
+
+    def _totales(self, total_ingresos, total_egresos, cantidad_operaciones):
+        """Arma el resultado manteniendo la precisión Decimal hasta la serialización"""
+        total_ingresos = Decimal(str(total_ingresos))
+        total_egresos = Decimal(str(total_egresos))
+        total_general = total_ingresos - total_egresos
+
+        return {
+            'total_general': float(total_general),
+            'total_ingresos': float(total_ingresos),
+            'total_egresos': float(total_egresos),
+            'cantidad_operaciones': int(cantidad_operaciones)
+        }
+
+    def _grupo(self, group_by, fila):
+        """Serializa una fila agrupada con su clave y sus totales"""
+        if group_by == 'mes':
+            grupo = {'mes': f"{int(fila.anio):04d}-{int(fila.mes):02d}"}
+        else:
+            grupo = {'id': fila.id, 'nombre': fila.nombre}
+        grupo.update(self._totales(fila.total_ingresos, fila.total_egresos, fila.cantidad_operaciones))
+        return grupo
@@ -5,6 +5,7 @@ from sqlalchemy import or_
 from sqlalchemy.exc import IntegrityError
 from main.models import PersonaModel
 from main.auth.decorators import role_required
+from main.catalogos.functions import cache_catalogo
 import re
 
 class Persona(Resource):
@@ -61,6 +62,7 @@ class Persona(Resource):
 
 class Personas(Resource):
     @role_required(roles=["admin", "supervisor"])
+    @cache_catalogo('persona')
     def get(self):
         """Obtiene lista paginada de personas con opción de búsqueda"""
         try:
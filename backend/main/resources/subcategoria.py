@@ -4,6 +4,7 @@ from .. import db
 from sqlalchemy import or_
 from main.models import SubcategoriaModel
 from main.auth.decorators import role_required
+from main.catalogos.functions import cache_catalogo
 
 class Subcategoria(Resource):
     @role_required(roles=["admin", "supervisor"])
@@ -46,6 +47,7 @@ class Subcategoria(Resource):
     
 class Subcategorias(Resource):
     @role_required(roles=["admin", "supervisor"])
+    @cache_catalogo('subcategoria')
     def get(self):
         """Obtiene lista paginada de subcategorias con opción de búsqueda y filtros combinados"""
         try:
@@ -0,0 +1,130 @@
+from flask_restful import Resource
+from flask import request, send_file
+from werkzeug.utils import secure_filename
+import os
+from .. import db
+from main.models import TrabajoModel
+from main.auth.decorators import role_required, usuario_actual
+from main.trabajos.functions import encolar, directorio_trabajo
+from main.resources.operacion import validar_exportacion
+
+# Tipos que se pueden encolar desde la API y roles habilitados para cada uno
+TIPOS_PERMITIDOS = {
+    'exportar_operaciones': ['admin', 'supervisor'],
+    'importar_operaciones': ['admin'],
+}
+
+# Roles que ven los trabajos de todos los usuarios (el resto, solo los propios)
+ROLES_TODOS_LOS_TRABAJOS = ['admin']
+
+def _obtener_trabajo(id):
+    """Trabajo visible para el usuario actual: los propios, o todos para admin"""
+    trabajo = db.session.get(TrabajoModel, id)
+    usuario = usuario_actual()
+    if not trabajo or (trabajo.id_usuario != usuario.id and usuario.rol not in ROLES_TODOS_LOS_TRABAJOS):
+        return None
+    return trabajo
+
+class Trabajos(Resource):
+    @role_required(roles=["admin", "supervisor"])
+    def get(self):
+        """Últimos trabajos del usuario actual (de todos los usuarios para admin)"""
+        try:
+            por_pagina = min(int(request.args.get('per_page', 20)), 100)
+            usuario = usuario_actual()
+            query = TrabajoModel.query
+            if usuario.rol not in ROLES_TODOS_LOS_TRABAJOS:
+                query = query.filter(TrabajoModel.id_usuario == usuario.id)
+            trabajos = (
+                query
+                .order_by(TrabajoModel.id.desc())
+                .limit(por_pagina)
+                .all()
+            )
+            return {'trabajos': [trabajo.to_json() for trabajo in trabajos]}, 200
+
+        except Exception as e:
+            return {'message': 'Error al obtener los trabajos', 'error': str(e)}, 500
+
+    @role_required(roles=["admin", "supervisor"])
+    def post(self):
+        """
+        Encola un trabajo. JSON: {"tipo": "exportar_operaciones", "parametros": {"formato": "xlsx", ...filtros}}
+        Para importar: multipart con 'tipo'=importar_operaciones y el CSV/XLSX en 'archivo'
+        """
+        try:
+            datos = request.get_json(silent=True) or request.form
+            tipo = datos.get('tipo')
+            usuario = usuario_actual()
+
+            if tipo not in TIPOS_PERMITIDOS:
+                return {'message': f'Tipo de trabajo inválido. Debe ser uno de: {", ".join(TIPOS_PERMITIDOS)}'}, 400
+            if usuario.rol not in TIPOS_PERMITIDOS[tipo]:
+                return {'message': 'No tienes permiso para este tipo de trabajo'}, 403
+
+            if tipo == 'importar_operaciones':
+                archivo = request.files.get('archivo')
+                if not archivo or not archivo.filename:
+                    return {'message': 'Se esperaba un archivo CSV/XLSX en el campo "archivo"'}, 400
+
+                # El archivo se guarda en el directorio del trabajo, que necesita el id
+                trabajo = encolar(tipo, id_usuario=usuario.id, max_intentos=1, commit=False)
+                path = os.path.join(directorio_trabajo(trabajo), secure_filename(archivo.filename))
+                archivo.save(path)
+                trabajo.parametros = {'archivo': path}
+                db.session.commit()
+            else:
+                parametros = datos.get('parametros') or {}
+                if not isinstance(parametros, dict):
+                    return {'message': '"parametros" debe ser un objeto'}, 400
+                validar_exportacion(parametros)
+                trabajo = encolar(tipo, parametros, id_usuario=usuario.id)
+
+            return trabajo.to_json(), 202, {'Location': f'/api/trabajo/{trabajo.id}'}
+
+        except ValueError as ve:
+            db.session.rollback()
+            return {'message': str(ve)}, 400
+        except Exception as e:
+            db.session.rollback()
+            return {'message': 'Error al encolar el trabajo', 'error': str(e)}, 500
+
+class Trabajo(Resource):
+    @role_required(roles=["admin", "supervisor"])
+    def get(self, id):
+        """Estado del trabajo (para consultar periódicamente hasta que termine)"""
+        try:
+            trabajo = _obtener_trabajo(id)
+            if not trabajo:
+                return {'message': 'Trabajo no encontrado'}, 404
+
+            return trabajo.to_json(), 200
+
+        except Exception as e:
+            return {'message': 'Error al obtener el trabajo', 'error': str(e)}, 500
+
+class TrabajoResultado(Resource):
+    @role_required(roles=["admin", "supervisor"])
+    def get(self, id):
+        """Descarga el archivo generado por un trabajo completado"""
+        try:
+            trabajo = _obtener_trabajo(id)
+            if not trabajo:
+                return {'message': 'Trabajo no encontrado'}, 404
+
+            if trabajo.estado != 'completado':
+                return {'message': f'El trabajo está {trabajo.estado}'}, 409
+
+            if not trabajo.archivo_resultado or not os.path.exists(trabajo.archivo_resultado):
+                return {'message': 'El trabajo no generó un archivo o ya fue eliminado'}, 404
+
+            resultado = trabajo.resultado or {}
+            return send_file(
+                trabajo.archivo_resultado,
+                mimetype=resultado.get('mimetype'),
+                as_attachment=True,
+                download_name=resultado.get('nombre') or os.path.basename(trabajo.archivo_resultado)
+            )
+
+        except Exception as e:
+            return {'message': 'Error al descargar el resultado', 'error': str(e)}, 500
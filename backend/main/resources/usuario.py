@@ -3,7 +3,7 @@ from flask import request
 from .. import db
 from sqlalchemy import or_
 from main.models import UsuarioModel
-from main.auth.decorators import role_required
+from main.auth.decorators import role_required, invalidar_usuario
 
 class Usuario(Resource):
     @role_required(roles=["admin","supervisor"])
@@ -22,6 +22,7 @@ class Usuario(Resource):
             usuario = db.session.query(UsuarioModel).get_or_404(id)
             db.session.delete(usuario)
             db.session.commit()
+            invalidar_usuario(id)
             return {'message': 'Usuario eliminado correctamente'}, 204
         except Exception as e:
             db.session.rollback()
@@ -43,6 +44,7 @@ class Usuario(Resource):
                     setattr(usuario, key, value)
                     
             db.session.commit()
+            invalidar_usuario(id)
             return usuario.to_json(), 200
         except Exception as e:
             db.session.rollback()
@@ -0,0 +1,240 @@
+from .. import db
+from main.models import OperacionModel, ResumenMensualModel
+from main.search.functions import filtro_enum, rango_fecha
+from sqlalchemy import event, select, insert, update, delete, func, extract, inspect, tuple_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Dimensiones del resumen (además del año y mes de la fecha)
+DIMENSIONES = ('tipo', 'caracter', 'naturaleza', 'id_subcategoria', 'id_persona')
+
+# Atributos de Operacion que cambian la fila del resumen en la que cuenta
+ATRIBUTOS = ('fecha', '_monto_total') + DIMENSIONES
+
+CLAVE = ('anio', 'mes') + DIMENSIONES
+
+# Escala de total y total_absoluto: las comparaciones redondean a ella (SQLite devuelve float en los SUM)
+ESCALA = Decimal('0.00001')
+
+# Claves por DELETE al limpiar las filas que quedaron sin operaciones (límite de parámetros de SQLite)
+TAMANO_LOTE_LIMPIEZA = 500
+
+# Filtros de GET /api/operaciones que el resumen puede responder
+FILTROS_RESUMEN = {
+    'tipo': lambda t: filtro_enum(ResumenMensualModel.tipo, OperacionModel.TIPOS_PERMITIDOS, t),
+    'caracter': lambda t: filtro_enum(ResumenMensualModel.caracter, OperacionModel.CARACTERES_PERMITIDOS, t),
+    'naturaleza': lambda t: filtro_enum(ResumenMensualModel.naturaleza, OperacionModel.NATURALEZAS_PERMITIDAS, t),
+    'fecha': lambda t: filtro_meses(t),
+}
+
+def _clave(valores):
+    fecha = valores['fecha']
+    if isinstance(fecha, str):
+        fecha = datetime.strptime(fecha, "%Y-%m-%d").date()
+    elif isinstance(fecha, datetime):
+        fecha = fecha.date()
+    return (fecha.year, fecha.month) + tuple(valores[dimension] for dimension in DIMENSIONES)
+
+def registrar_delta(session, valores, signo):
+    """Acumula en la sesión el aporte (+1) o la quita (-1) de una operación al resumen.
+    'valores' usa nombres de atributo (_monto_total) o de columna (monto_total); si están los dos,
+    como al combinar una fila leída con los cambios de un UPDATE por lotes, vale el atributo"""
+    monto = valores['_monto_total'] if '_monto_total' in valores else valores['monto_total']
+    monto = Decimal(str(monto))
+
+    deltas = session.info.setdefault('resumen_deltas', {})
+    delta = deltas.setdefault(_clave(valores), [Decimal(0), Decimal(0), 0])
+    delta[0] += signo * monto
+    delta[1] += signo * abs(monto)
+    delta[2] += signo
+
+def registrar_cambio(session, anterior, nuevo):
+    """Mueve una operación de la fila del resumen de 'anterior' a la de 'nuevo' (pueden coincidir)"""
+    registrar_delta(session, anterior, -1)
+    registrar_delta(session, nuevo, 1)
+
+def _valores_actuales(operacion):
+    return {atributo: getattr(operacion, atributo) for atributo in ATRIBUTOS}
+
+def _valores_anteriores(operacion):
+    """Valores antes de los cambios pendientes del flush (historial de atributos)"""
+    estado = inspect(operacion)
+    valores = {}
+    for atributo in ATRIBUTOS:
+        historial = estado.attrs[atributo].history
+        valores[atributo] = historial.deleted[0] if historial.deleted else getattr(operacion, atributo)
+    return valores
+
+@event.listens_for(OperacionModel, 'after_insert')
+def _operacion_insertada(mapper, connection, operacion):
+    registrar_delta(Session.object_session(operacion), _valores_actuales(operacion), 1)
+
+@event.listens_for(OperacionModel, 'after_update')
+def _operacion_actualizada(mapper, connection, operacion):
+    # actualizar_tipo_operacion cambia tipo y el signo del monto: ambos quedan en el historial
+    estado = inspect(operacion)
+    if any(estado.attrs[atributo].history.has_changes() for atributo in ATRIBUTOS):
+        registrar_cambio(Session.object_session(operacion), _valores_anteriores(operacion), _valores_actuales(operacion))
+
+@event.listens_for(OperacionModel, 'after_delete')
+def _operacion_eliminada(mapper, connection, operacion):
+    registrar_delta(Session.object_session(operacion), _valores_anteriores(operacion), -1)
+
+def _upsert(connection, filas):
+    """Suma los deltas a las filas del resumen, creándolas si no existen (un executemany)"""
+    tabla = ResumenMensualModel.__table__
+    dialecto = connection.dialect.name
+
+    if dialecto in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert as insert_mysql
+        sentencia = insert_mysql(tabla)
+        sentencia = sentencia.on_duplicate_key_update(
+            total=tabla.c.total + sentencia.inserted.total,
+            total_absoluto=tabla.c.total_absoluto + sentencia.inserted.total_absoluto,
+            cantidad=tabla.c.cantidad + sentencia.inserted.cantidad,
+        )
+        connection.execute(sentencia, filas)
+
+    elif dialecto in ('sqlite', 'postgresql'):
+        insert_dialecto = __import__(f'sqlalchemy.dialects.{dialecto}', fromlist=['insert']).insert
+        sentencia = insert_dialecto(tabla)
+        sentencia = sentencia.on_conflict_do_update(
+            index_elements=list(CLAVE),
+            set_={
+                'total': tabla.c.total + sentencia.excluded.total,
+                'total_absoluto': tabla.c.total_absoluto + sentencia.excluded.total_absoluto,
+                'cantidad': tabla.c.cantidad + sentencia.excluded.cantidad,
+            }
+        )
+        connection.execute(sentencia, filas)
+
+    else:
+        for fila in filas:
+            condicion = [tabla.c[columna] == fila[columna] for columna in CLAVE]
+            resultado = connection.execute(
+                update(tabla).where(*condicion).values(
+                    total=tabla.c.total + fila['total'],
+                    total_absoluto=tabla.c.total_absoluto + fila['total_absoluto'],
+                    cantidad=tabla.c.cantidad + fila['cantidad'],
+                )
+            )
+            if not resultado.rowcount:
+                connection.execute(insert(tabla), fila)
+
+def aplicar_deltas(session):
+    """Escribe los deltas acumulados en la transacción de la sesión"""
+    deltas = session.info.pop('resumen_deltas', None)
+    if not deltas:
+        return
+
+    filas = [
+        dict(zip(CLAVE, clave), total=total, total_absoluto=total_absoluto, cantidad=cantidad)
+        for clave, (total, total_absoluto, cantidad) in deltas.items()
+        if cantidad or total or total_absoluto
+    ]
+    if not filas:
+        return
+
+    connection = session.connection()
+    _upsert(connection, filas)
+
+    # Las combinaciones que se quedaron sin operaciones no ocupan lugar. Solo pueden ser las que
+    # recibieron un delta negativo: se borran por clave primaria en lugar de recorrer la tabla
+    # (en InnoDB eso además bloquearía todo el resumen para las demás escrituras)
+    tabla = ResumenMensualModel.__table__
+    claves = [tuple(fila[columna] for columna in CLAVE) for fila in filas if fila['cantidad'] < 0]
+    for inicio in range(0, len(claves), TAMANO_LOTE_LIMPIEZA):
+        connection.execute(delete(tabla).where(
+            tuple_(*[tabla.c[columna] for columna in CLAVE]).in_(claves[inicio:inicio + TAMANO_LOTE_LIMPIEZA]),
+            tabla.c.cantidad == 0,
+        ))
+
+@event.listens_for(Session, 'after_flush')
+def _aplicar_despues_del_flush(session, flush_context):
+    aplicar_deltas(session)
+
+@event.listens_for(Session, 'before_commit')
+def _aplicar_antes_del_commit(session):
+    # Deltas registrados a mano por los caminos masivos (INSERT/UPDATE por lotes sin eventos de mapper)
+    aplicar_deltas(session)
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_deltas(session):
+    session.info.pop('resumen_deltas', None)
+
+def _consulta_operaciones():
+    """Agregación del libro de operaciones con las mismas columnas que el resumen"""
+    monto = OperacionModel._monto_total
+    return select(
+        extract('year', OperacionModel.fecha).label('anio'),
+        extract('month', OperacionModel.fecha).label('mes'),
+        *[getattr(OperacionModel, dimension) for dimension in DIMENSIONES],
+        func.sum(monto).label('total'),
+        func.sum(func.abs(monto)).label('total_absoluto'),
+        func.count(OperacionModel.id).label('cantidad'),
+    ).group_by(*CLAVE)
+
+def reconstruir_resumen():
+    """Recalcula el resumen completo desde las operaciones (INSERT ... SELECT, en una transacción)"""
+    tabla = ResumenMensualModel.__table__
+    db.session.execute(delete(tabla))
+    db.session.execute(
+        insert(tabla).from_select(list(CLAVE) + ['total', 'total_absoluto', 'cantidad'], _consulta_operaciones())
+    )
+    db.session.commit()
+    return db.session.query(func.count()).select_from(tabla).scalar()
+
+def verificar_resumen():
+    """Compara el resumen con la agregación de las operaciones. Devuelve las filas que difieren"""
+    def monto(valor):
+        return Decimal(str(valor)).quantize(ESCALA)
+
+    esperado = {
+        tuple(int(fila[columna]) if columna in ('anio', 'mes') else fila[columna] for columna in CLAVE):
+            (monto(fila['total']), monto(fila['total_absoluto']), fila['cantidad'])
+        for fila in db.session.execute(_consulta_operaciones()).mappings()
+    }
+    actual = {
+        tuple(getattr(fila, columna) for columna in CLAVE):
+            (monto(fila.total), monto(fila.total_absoluto), fila.cantidad)
+        for fila in db.session.query(ResumenMensualModel)
+    }
+
+    diferencias = []
+    for clave in esperado.keys() | actual.keys():
+        if esperado.get(clave) != actual.get(clave):
+            diferencias.append({
+                'clave': dict(zip(CLAVE, clave)),
+                'esperado': [str(valor) for valor in esperado[clave]] if clave in esperado else None,
+                'actual': [str(valor) for valor in actual[clave]] if clave in actual else None,
+            })
+    return diferencias
+
+def filtro_meses(texto):
+    """Filtro de fecha sobre el resumen. Devuelve None si el período no abarca meses completos
+    (p. ej. un día o un rango entre días): en ese caso hay que consultar las operaciones"""
+    desde, hasta = rango_fecha(texto)
+    if desde is not None and desde.day != 1:
+        return None
+    if hasta is not None and (hasta + timedelta(days=1)).day != 1:
+        return None
+
+    indice = ResumenMensualModel.anio * 12 + ResumenMensualModel.mes
+    if desde is not None and hasta is not None:
+        return indice.between(desde.year * 12 + desde.month, hasta.year * 12 + hasta.month)
+    if desde is not None:
+        return indice >= desde.year * 12 + desde.month
+    return indice <= hasta.year * 12 + hasta.month
+
+def filtros_resumen(params):
+    """Filtros equivalentes sobre el resumen para los parámetros que soporta.
+    Devuelve None si alguno no se puede expresar por mes"""
+    filtros = []
+    for campo, valor in params.items():
+        if campo in FILTROS_RESUMEN and valor:
+            filtro = FILTROS_RESUMEN[campo](valor)
+            if filtro is None:
+                return None
+            filtros.append(filtro)
+    return filtros
@@ -0,0 +1,325 @@
+from .. import db
+from sqlalchemy import event, inspect, or_, and_, select
+from sqlalchemy.orm import Session, joinedload
+from main.models import OperacionModel, PersonaModel, UsuarioModel, SubcategoriaModel, CategoriaModel, ConceptoModel
+from dateutil.parser import parse
+from datetime import date
+from decimal import Decimal, InvalidOperation
+import calendar, re, sys
+
+# Largo mínimo de palabra que indexa FULLTEXT en InnoDB (innodb_ft_min_token_size)
+LARGO_MINIMO_TOKEN = 3
+
+# Operadores del modo booleano de MATCH ... AGAINST que se quitan del texto del usuario
+OPERADORES_FULLTEXT = re.compile(r'[+\-<>()~*"@]+')
+
+# Período de fecha: 'YYYY', 'YYYY-MM', 'YYYYMM', 'YYYY-MM-DD' o 'YYYYMMDD'
+PERIODO_FECHA = re.compile(r'(\d{4})(?:-?(\d{2})(?:-?(\d{2}))?)?')
+
+# Dígitos enteros que admite monto_total (Numeric(65, 5))
+MAX_DIGITOS_MONTO = 60
+
+# Mayor entero que aceptan las columnas enteras (BIGINT con signo)
+MAX_ENTERO = 2 ** 63 - 1
+
+# Atributos de la operación que forman parte del documento de búsqueda
+CAMPOS_OPERACION = (
+    'fecha', 'tipo', 'caracter', 'naturaleza', 'option', 'codigo', 'observaciones',
+    'metodo_de_pago', '_monto_total', 'id_persona', 'id_subcategoria', 'id_usuario',
+)
+
+# Campos de los catálogos que forman parte del documento de búsqueda de cada operación
+CAMPOS_CATALOGO = {
+    PersonaModel: ('cuit', 'razon_social'),
+    SubcategoriaModel: ('nombre', 'id_categoria'),
+    CategoriaModel: ('nombre', 'id_concepto'),
+    ConceptoModel: ('nombre',),
+    UsuarioModel: ('nombre',),
+}
+
+def _catalogo(session, modelo, id, cache):
+    """Obtiene un registro de catálogo por id; 'cache' mantiene referencias fuertes entre llamadas
+    (el identity map de la sesión es débil y los descartaría apenas dejan de usarse)"""
+    if id is None:
+        return None
+    if cache is None:
+        return session.get(modelo, id)
+    if (modelo, id) not in cache:
+        cache[(modelo, id)] = session.get(modelo, id)
+    return cache[(modelo, id)]
+
+def precargar_catalogos(session, filas, cache):
+    """Carga en 'cache', con una consulta IN por tabla, los catálogos referenciados por las filas
+    (mapeos con id_persona, id_subcategoria e id_usuario)"""
+    ids_persona = {fila['id_persona'] for fila in filas}
+    ids_subcategoria = {fila['id_subcategoria'] for fila in filas}
+    ids_usuario = {fila['id_usuario'] for fila in filas}
+
+    for persona in session.query(PersonaModel).filter(PersonaModel.id.in_(ids_persona)):
+        cache[(PersonaModel, persona.id)] = persona
+    for usuario in session.query(UsuarioModel).filter(UsuarioModel.id.in_(ids_usuario)):
+        cache[(UsuarioModel, usuario.id)] = usuario
+
+    subcategorias = session.query(SubcategoriaModel).options(
+        joinedload(SubcategoriaModel.categoria).joinedload(CategoriaModel.concepto)
+    ).filter(SubcategoriaModel.id.in_(ids_subcategoria))
+    for subcategoria in subcategorias:
+        cache[(SubcategoriaModel, subcategoria.id)] = subcategoria
+        if subcategoria.categoria:
+            cache[(CategoriaModel, subcategoria.categoria.id)] = subcategoria.categoria
+            if subcategoria.categoria.concepto:
+                cache[(ConceptoModel, subcategoria.categoria.concepto.id)] = subcategoria.categoria.concepto
+
+def texto_busqueda(operacion, session, cache=None):
+    """Arma el documento de búsqueda de una operación a partir de sus campos y los nombres de sus catálogos"""
+    persona = _catalogo(session, PersonaModel, operacion.id_persona, cache)
+    subcategoria = _catalogo(session, SubcategoriaModel, operacion.id_subcategoria, cache)
+    categoria = _catalogo(session, CategoriaModel, subcategoria.id_categoria, cache) if subcategoria else None
+    concepto = _catalogo(session, ConceptoModel, categoria.id_concepto, cache) if categoria else None
+    usuario = _catalogo(session, UsuarioModel, operacion.id_usuario, cache)
+
+    partes = [
+        operacion.fecha.strftime("%Y-%m-%d") if operacion.fecha else None,
+        operacion.tipo,
+        operacion.caracter,
+        operacion.naturaleza,
+        operacion.option,
+        operacion.codigo,
+        operacion.observaciones,
+        operacion.metodo_de_pago,
+        str(operacion._monto_total) if operacion._monto_total is not None else None,
+        str(persona.cuit) if persona else None,
+        persona.razon_social if persona else None,
+        subcategoria.nombre if subcategoria else None,
+        categoria.nombre if categoria else None,
+        concepto.nombre if concepto else None,
+        usuario.nombre if usuario else None,
+    ]
+    return ' '.join(str(parte) for parte in partes if parte).lower()
+
+# Catálogos por nombre de tabla (parámetro del trabajo reindexar_busqueda)
+CATALOGOS = {modelo.__tablename__: modelo for modelo in CAMPOS_CATALOGO}
+
+def condicion_relacionadas(catalogo, id):
+    """Condición sobre operacion que selecciona las operaciones cuyo documento de búsqueda
+    incluye datos del registro 'id' del catálogo (nombre de tabla)"""
+    modelo = CATALOGOS.get(catalogo)
+    if modelo is PersonaModel:
+        return OperacionModel.id_persona == id
+    if modelo is UsuarioModel:
+        return OperacionModel.id_usuario == id
+    if modelo is SubcategoriaModel:
+        return OperacionModel.id_subcategoria == id
+    if modelo is CategoriaModel:
+        return OperacionModel.id_subcategoria.in_(
+            select(SubcategoriaModel.id).where(SubcategoriaModel.id_categoria == id)
+        )
+    if modelo is ConceptoModel:
+        return OperacionModel.id_subcategoria.in_(
+            select(SubcategoriaModel.id).join(CategoriaModel).where(CategoriaModel.id_concepto == id)
+        )
+    raise ValueError(f"Catálogo desconocido: '{catalogo}'")
+
+@event.listens_for(Session, 'before_flush')
+def actualizar_texto_busqueda(session, flush_context, instances):
+    """Recalcula el documento de búsqueda de las operaciones nuevas o modificadas y encola el de las
+    afectadas por un catálogo"""
+    operaciones = {
+        objeto for objeto in session.new
+        if isinstance(objeto, OperacionModel)
+    }
+    operaciones.update(
+        objeto for objeto in session.dirty
+        if isinstance(objeto, OperacionModel) and any(
+            inspect(objeto).attrs[campo].history.has_changes() for campo in CAMPOS_OPERACION
+        )
+    )
+
+    # Un catálogo modificado puede aparecer en miles de operaciones: en vez de cargarlas acá se
+    # encola un trabajo que las reindexa por lotes. Queda en la misma transacción que el cambio
+    for objeto in list(session.dirty):
+        campos = CAMPOS_CATALOGO.get(type(objeto))
+        if campos and objeto.id is not None:
+            estado = inspect(objeto)
+            if any(estado.attrs[campo].history.has_changes() for campo in campos):
+                from main.trabajos.functions import nuevo_trabajo
+                session.add(nuevo_trabajo('reindexar_busqueda', {'catalogo': objeto.__tablename__, 'id': objeto.id}))
+
+    cache = {}
+    for operacion in operaciones:
+        # Se omiten las eliminadas y las que ya recibieron su documento (p. ej. al reindexar)
+        if operacion in session.deleted or inspect(operacion).attrs.texto_busqueda.history.has_changes():
+            continue
+        operacion.texto_busqueda = texto_busqueda(operacion, session, cache)
+
+def filtro_busqueda_global(termino):
+    """Filtro de la búsqueda global sobre el documento desnormalizado.
+
+    En MariaDB usa el índice FULLTEXT con MATCH ... AGAINST en modo booleano (todas
+    las palabras, por prefijo). Si alguna palabra es más corta que el token mínimo
+    indexado, o el motor no soporta FULLTEXT, recurre a un LIKE sobre una sola columna.
+    """
+    termino = termino.strip().lower()
+    palabras = OPERADORES_FULLTEXT.sub(' ', termino).split()
+
+    usar_fulltext = (
+        db.engine.dialect.name in ('mysql', 'mariadb')
+        and palabras
+        and all(len(palabra) >= LARGO_MINIMO_TOKEN for palabra in palabras)
+    )
+
+    if usar_fulltext:
+        condicion = OperacionModel.texto_busqueda.match(' '.join(f'+{palabra}*' for palabra in palabras))
+    else:
+        condicion = OperacionModel.texto_busqueda.like(f"%{termino}%")
+
+    # El id no forma parte del documento (no se conoce antes del INSERT): se busca por clave primaria
+    if termino.isdigit():
+        return or_(OperacionModel.id == int(termino), condicion)
+
+    return condicion
+
+def reindexar_operaciones(tamano_lote=1000, condicion=None):
+    """Regenera el documento de búsqueda de todas las operaciones (o las que cumplen 'condicion'), por lotes"""
+    from main.resources.operacion import query_operaciones
+
+    total = 0
+    ultimo_id = 0
+    while True:
+        query = query_operaciones('json', ordenar=False)
+        if condicion is not None:
+            query = query.filter(condicion)
+        lote = (
+            query
+            .filter(OperacionModel.id > ultimo_id)
+            .order_by(OperacionModel.id)
+            .limit(tamano_lote)
+            .all()
+        )
+        if not lote:
+            break
+
+        for operacion in lote:
+            operacion.texto_busqueda = texto_busqueda(operacion, db.session)
+        db.session.commit()
+
+        total += len(lote)
+        ultimo_id = lote[-1].id
+        # Solo las operaciones del lote: desde el worker, la sesión también tiene el Trabajo en curso
+        for operacion in lote:
+            db.session.expunge(operacion)
+
+    return total
+
+def filtro_enum(columna, permitidos, texto):
+    """Igualdad sobre una columna de valores fijos: el texto se expande a los valores permitidos que lo contienen"""
+    texto = texto.strip().lower()
+    return columna.in_([valor for valor in permitidos if texto in valor])
+
+def _siguiente_prefijo(prefijo):
+    """Menor cadena mayor que todas las que empiezan con 'prefijo' ('B0000' -> 'B0001'), o None si no hay"""
+    while prefijo and ord(prefijo[-1]) == sys.maxunicode:
+        prefijo = prefijo[:-1]
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1) if prefijo else None
+
+def filtro_prefijo(columna, texto):
+    """Búsqueda por prefijo como rango (columna >= 'B0000' AND columna < 'B0001'): a diferencia del
+    LIKE 'texto%', que SQLite no resuelve con el índice, el rango lo usa en cualquier motor"""
+    prefijo = texto.strip()
+    siguiente = _siguiente_prefijo(prefijo)
+    if siguiente is None:
+        return columna >= prefijo
+    return and_(columna >= prefijo, columna < siguiente)
+
+def _en_rango(valor):
+    """Si el valor cabe en la columna: los Decimal deben ser finitos (ni NaN ni Infinity) y con
+    los dígitos de monto_total, los enteros deben caber en un BIGINT"""
+    if isinstance(valor, Decimal):
+        return valor.is_finite() and valor.adjusted() < MAX_DIGITOS_MONTO
+    return -MAX_ENTERO <= valor <= MAX_ENTERO
+
+def _convertir(texto, tipo, campo):
+    try:
+        valor = tipo(texto.strip())
+    except (ValueError, InvalidOperation):
+        valor = None
+    if valor is None or not _en_rango(valor):
+        raise ValueError(f"Valor inválido para {campo}: '{texto}'. Debe ser un número o un rango 'desde:hasta'.")
+    return valor
+
+def _rango(texto, tipo, campo):
+    """Interpreta 'valor', 'desde:hasta', 'desde:' o ':hasta' y devuelve (desde, hasta)"""
+    if ':' not in texto:
+        valor = _convertir(texto, tipo, campo)
+        return valor, valor
+
+    desde, hasta = texto.split(':', 1)
+    desde = _convertir(desde, tipo, campo) if desde.strip() else None
+    hasta = _convertir(hasta, tipo, campo) if hasta.strip() else None
+    if desde is None and hasta is None:
+        raise ValueError(f"Rango vacío para {campo}.")
+    return desde, hasta
+
+def _condicion_rango(columna, desde, hasta):
+    if desde is not None and hasta is not None:
+        return columna == desde if desde == hasta else columna.between(desde, hasta)
+    if desde is not None:
+        return columna >= desde
+    return columna <= hasta
+
+def filtro_rango(columna, texto, tipo=int, campo='id'):
+    """Valor exacto o rango numérico ('100:500', '100:', ':500')"""
+    return _condicion_rango(columna, *_rango(texto, tipo, campo))
+
+def filtro_monto(texto):
+    """Rango sobre el monto. Los egresos se guardan en negativo, así que un rango positivo
+    se busca también reflejado: 100:500 equivale a monto BETWEEN 100 AND 500 OR BETWEEN -500 AND -100"""
+    desde, hasta = _rango(texto, Decimal, 'monto')
+    columna = OperacionModel._monto_total
+
+    if (desde is not None and desde < 0) or (hasta is not None and hasta < 0):
+        return _condicion_rango(columna, desde, hasta)
+
+    if desde is not None and desde == hasta:
+        return columna.in_([desde, -desde])
+
+    return or_(
+        _condicion_rango(columna, desde, hasta),
+        _condicion_rango(columna, -hasta if hasta is not None else None, -desde if desde is not None else None)
+    )
+
+def periodo_fecha(texto):
+    """Devuelve el primer y último día del período indicado"""
+    texto = texto.strip()
+    coincidencia = PERIODO_FECHA.fullmatch(texto)
+
+    try:
+        if not coincidencia:
+            dia = parse(texto).date()
+            return dia, dia
+
+        anio, mes, dia = (int(parte) if parte else None for parte in coincidencia.groups())
+        if dia:
+            return date(anio, mes, dia), date(anio, mes, dia)
+        if mes:
+            return date(anio, mes, 1), date(anio, mes, calendar.monthrange(anio, mes)[1])
+        return date(anio, 1, 1), date(anio, 12, 31)
+
+    except (ValueError, OverflowError):
+        raise ValueError("Fecha inválida. Debe ser en formato 'YYYY-MM-DD', 'YYYY-MM', 'YYYYMM', 'YYYY' o un rango 'desde:hasta'.")
+
+def rango_fecha(texto):
+    """Primer y último día de un período o rango de períodos (None en el extremo abierto)"""
+    if ':' in texto:
+        desde, hasta = texto.split(':', 1)
+        desde = periodo_fecha(desde)[0] if desde.strip() else None
+        hasta = periodo_fecha(hasta)[1] if hasta.strip() else None
+        if desde is None and hasta is None:
+            raise ValueError("Rango de fechas vacío.")
+    else:
+        desde, hasta = periodo_fecha(texto)
+    return desde, hasta
+
+def filtro_fecha(texto):
+    """Filtro de fecha por período o rango de períodos, compilado a un BETWEEN sobre la columna"""
+    return _condicion_rango(OperacionModel.fecha, *rango_fecha(texto))
@@ -0,0 +1,45 @@
+from .. import api
+from main.metrics.functions import registrar_serializacion
+from flask import current_app
+from datetime import date, datetime
+from decimal import Decimal
+import importlib.util, json, time
+
+def _default(valor):
+    """Tipos que devuelven los modelos y no son JSON nativo (como el encoder de to_json: Decimal a float)"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f'Objeto de tipo {type(valor).__name__} no serializable a JSON')
+
+def _dumps_json(datos):
+    return json.dumps(datos, default=_default, separators=(',', ':')).encode('utf-8')
+
+def _dumps_orjson(datos):
+    import orjson
+    return orjson.dumps(datos, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+# Serializadores disponibles: nombre -> función(datos) -> bytes UTF-8
+SERIALIZADORES = {
+    'json': _dumps_json,
+    'orjson': _dumps_orjson,
+}
+
+def serializador_por_defecto():
+    """orjson si está instalado (de 3 a 10 veces más rápido); si no, el módulo json de la stdlib"""
+    return 'orjson' if importlib.util.find_spec('orjson') is not None else 'json'
+
+def dumps(datos):
+    """Serializa con el serializador configurado en JSON_SERIALIZADOR"""
+    return SERIALIZADORES[current_app.config['JSON_SERIALIZADOR']](datos)
+
+@api.representation('application/json')
+def output_json(data, code, headers=None):
+    """Representación JSON de Flask-RESTful para todas las respuestas de los Resource"""
+    inicio = time.perf_counter()
+    cuerpo = dumps(data)
+    registrar_serializacion(time.perf_counter() - inicio)
+    respuesta = current_app.response_class(cuerpo, status=code, mimetype='application/json')
+    respuesta.headers.extend(headers or {})
+    return respuesta
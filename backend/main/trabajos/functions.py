@@ -0,0 +1,204 @@
+from .. import db
+from main.models import TrabajoModel
+from main.mail.functions import enviar_pendientes, recuperar_correos_colgados, purgar_enviados
+from flask import current_app
+from sqlalchemy import select, update, delete
+from datetime import datetime, timedelta
+import logging, os, shutil, socket, threading, time
+
+logger = logging.getLogger(__name__)
+
+# Tareas registradas: tipo -> (función, sensible)
+TAREAS = {}
+
+# Reintentos: espera = RETRASO_BASE * 2^(intento - 1), como mucho RETRASO_MAXIMO (segundos)
+RETRASO_BASE = 30
+RETRASO_MAXIMO = 3600
+
+# Cada cuántos segundos el worker recupera trabajos colgados y purga los viejos
+INTERVALO_MANTENIMIENTO = 300
+
+# Hilos de TRABAJOS_EN_PROCESO por pid
+_hilos_en_proceso = {}
+_lock_hilos = threading.Lock()
+
+def tarea(tipo, sensible=False):
+    """Registra una función como tarea. Recibe el Trabajo y devuelve un dict con el resultado
+    (opcionalmente 'archivo': ruta del archivo generado). Si es sensible, los parámetros se
+    borran al terminar (p. ej. contraseñas o tokens de un correo)"""
+    def decorator(fn):
+        TAREAS[tipo] = (fn, sensible)
+        return fn
+    return decorator
+
+def directorio_trabajo(trabajo):
+    """Directorio de archivos de entrada y resultado de un trabajo"""
+    directorio = os.path.join(current_app.config['TRABAJOS_FOLDER'], str(trabajo.id))
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+def nuevo_trabajo(tipo, parametros=None, id_usuario=None, max_intentos=3):
+    """Trabajo pendiente sin agregar a ninguna sesión (para encolar desde un evento de la sesión,
+    donde no se puede hacer flush)"""
+    if tipo not in TAREAS:
+        raise ValueError(f"Tipo de trabajo desconocido: '{tipo}'")
+
+    return TrabajoModel(
+        tipo=tipo,
+        parametros=parametros or {},
+        id_usuario=id_usuario,
+        max_intentos=max_intentos,
+        disponible_desde=datetime.utcnow()
+    )
+
+def encolar(tipo, parametros=None, id_usuario=None, max_intentos=3, commit=True):
+    """Crea un trabajo pendiente. Con commit=False queda en la transacción del llamador"""
+    trabajo = nuevo_trabajo(tipo, parametros, id_usuario, max_intentos)
+    db.session.add(trabajo)
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
+    return trabajo
+
+def tomar_trabajo(worker):
+    """Reserva el próximo trabajo pendiente. El UPDATE condicionado al estado hace que,
+    entre varios workers, solo uno lo obtenga (sin depender de SKIP LOCKED)"""
+    ahora = datetime.utcnow()
+    candidatos = db.session.execute(
+        select(TrabajoModel.id)
+        .where(TrabajoModel.estado == 'pendiente', TrabajoModel.disponible_desde <= ahora)
+        .order_by(TrabajoModel.disponible_desde, TrabajoModel.id)
+        .limit(10)
+    ).scalars().all()
+    db.session.commit()
+
+    for id in candidatos:
+        resultado = db.session.execute(
+            update(TrabajoModel)
+            .where(TrabajoModel.id == id, TrabajoModel.estado == 'pendiente')
+            .values(estado='en_curso', worker=worker, iniciado=ahora, intentos=TrabajoModel.intentos + 1)
+        )
+        db.session.commit()
+        if resultado.rowcount:
+            return db.session.get(TrabajoModel, id)
+    return None
+
+def retraso_reintento(intentos):
+    return min(RETRASO_BASE * 2 ** (intentos - 1), RETRASO_MAXIMO)
+
+def ejecutar_trabajo(trabajo):
+    """Ejecuta la tarea y registra el resultado; si falla la reprograma con backoff o la marca fallida"""
+    fn, sensible = TAREAS.get(trabajo.tipo, (None, False))
+    try:
+        if fn is None:
+            raise ValueError(f"Tipo de trabajo desconocido: '{trabajo.tipo}'")
+
+        resultado = fn(trabajo) or {}
+        trabajo.archivo_resultado = resultado.pop('archivo', None)
+        trabajo.resultado = resultado
+        trabajo.estado = 'completado'
+        trabajo.error = None
+        trabajo.finalizado = datetime.utcnow()
+        if sensible:
+            trabajo.parametros = None
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('Falló el trabajo %s (%s), intento %s', trabajo.id, trabajo.tipo, trabajo.intentos)
+
+        trabajo.error = str(e)
+        if trabajo.intentos < trabajo.max_intentos and not isinstance(e, ValueError):
+            # Los ValueError son errores de los datos: reintentar no cambia el resultado
+            trabajo.estado = 'pendiente'
+            trabajo.disponible_desde = datetime.utcnow() + timedelta(seconds=retraso_reintento(trabajo.intentos))
+        else:
+            trabajo.estado = 'fallido'
+            trabajo.finalizado = datetime.utcnow()
+            if sensible:
+                trabajo.parametros = None
+        db.session.commit()
+
+def recuperar_colgados():
+    """Devuelve a pendiente los trabajos en curso de un worker que murió (más de TRABAJOS_TIMEOUT)"""
+    limite = datetime.utcnow() - timedelta(seconds=current_app.config['TRABAJOS_TIMEOUT'])
+    resultado = db.session.execute(
+        update(TrabajoModel)
+        .where(TrabajoModel.estado == 'en_curso', TrabajoModel.iniciado < limite)
+        .values(estado='pendiente', disponible_desde=datetime.utcnow(), worker=None)
+    )
+    db.session.commit()
+    return resultado.rowcount
+
+def purgar_trabajos():
+    """Borra los trabajos terminados (y sus archivos) con más de TRABAJOS_RETENCION_DIAS"""
+    limite = datetime.utcnow() - timedelta(days=current_app.config['TRABAJOS_RETENCION_DIAS'])
+    ids = db.session.execute(
+        select(TrabajoModel.id)
+        .where(TrabajoModel.estado.in_(['completado', 'fallido']), TrabajoModel.finalizado < limite)
+    ).scalars().all()
+
+    for id in ids:
+        shutil.rmtree(os.path.join(current_app.config['TRABAJOS_FOLDER'], str(id)), ignore_errors=True)
+    if ids:
+        db.session.execute(delete(TrabajoModel).where(TrabajoModel.id.in_(ids)))
+    db.session.commit()
+    return len(ids)
+
+def ejecutar_worker(intervalo=2.0, una_vez=False, detener=None):
+    """Bucle del worker: envía la bandeja de salida de correos y toma y ejecuta trabajos hasta
+    que se active 'detener' (threading.Event).
+    Debe correr dentro de un contexto de la app"""
+    worker = f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+    detener = detener or threading.Event()
+    ultimo_mantenimiento = 0
+
+    logger.info('Worker de trabajos %s iniciado', worker)
+    while not detener.is_set():
+        try:
+            if time.monotonic() - ultimo_mantenimiento > INTERVALO_MANTENIMIENTO:
+                recuperar_colgados()
+                purgar_trabajos()
+                recuperar_correos_colgados()
+                purgar_enviados(current_app.config['TRABAJOS_RETENCION_DIAS'])
+                ultimo_mantenimiento = time.monotonic()
+
+            # La bandeja de salida va primero: los correos no esperan detrás de una exportación larga
+            if enviar_pendientes():
+                continue
+
+            trabajo = tomar_trabajo(worker)
+            if trabajo:
+                ejecutar_trabajo(trabajo)
+                continue
+        except Exception:
+            db.session.rollback()
+            logger.exception('Error en el worker de trabajos')
+        finally:
+            # No retener una conexión del pool entre trabajos
+            db.session.remove()
+
+        if una_vez:
+            break
+        detener.wait(intervalo)
+
+def iniciar_worker_en_proceso(app):
+    """Worker en un hilo del propio proceso web (TRABAJOS_EN_PROCESO), útil sin el servicio aparte.
+    Se llama en cada request y arranca un hilo por proceso (después del fork de gunicorn)"""
+    pid = os.getpid()
+    if pid in _hilos_en_proceso:
+        return
+
+    def correr():
+        with app.app_context():
+            ejecutar_worker()
+
+    with _lock_hilos:
+        if pid not in _hilos_en_proceso:
+            hilo = threading.Thread(target=correr, name='trabajos-worker', daemon=True)
+            hilo.start()
+            _hilos_en_proceso[pid] = hilo
+
+# Registra las tareas (al final: tareas importa tarea() de este módulo)
+import main.trabajos.tareas  # noqa: E402, F401
@@ -0,0 +1,61 @@
+"""Tareas que ejecuta el worker de trabajos (ver main.trabajos.functions)"""
+from main.trabajos.functions import tarea, directorio_trabajo
+from datetime import datetime
+import os
+
+@tarea('exportar_operaciones')
+def exportar_operaciones(trabajo):
+    """Exporta las operaciones filtradas (mismos filtros que GET /api/operaciones) a xlsx, csv o ndjson"""
+    from main.resources.operacion import Operaciones, OperacionesExcel, query_operaciones
+    from main.export.functions import iterar_filas, escribir_xlsx, generar_csv, generar_ndjson
+    from main.models import OperacionModel
+
+    parametros = dict(trabajo.parametros or {})
+    formato = parametros.pop('formato', 'xlsx')
+    if formato not in OperacionesExcel.FORMATOS:
+        raise ValueError(f'Formato inválido. Debe ser uno de: {", ".join(OperacionesExcel.FORMATOS)}')
+
+    filtros = Operaciones()._generar_filtros(parametros)
+    filas = iterar_filas(query_operaciones('excel', filtros))
+
+    mimetype, extension = OperacionesExcel.FORMATOS[formato]
+    nombre = f'operaciones_{datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}.{extension}'
+    destino = os.path.join(directorio_trabajo(trabajo), nombre)
+
+    if formato == 'xlsx':
+        escribir_xlsx(filas, destino, OperacionModel.COLUMNAS_EXCEL)
+    else:
+        generador = generar_csv(filas, OperacionModel.COLUMNAS_EXCEL) if formato == 'csv' else generar_ndjson(filas)
+        with open(destino, 'w', encoding='utf-8', newline='') as archivo:
+            archivo.writelines(generador)
+
+    return {'archivo': destino, 'nombre': nombre, 'mimetype': mimetype}
+
+@tarea('importar_operaciones')
+def importar_operaciones(trabajo):
+    """Importa el CSV/XLSX que se guardó al encolar el trabajo"""
+    from main.resources.operacion import OperacionesImportar
+    from main.importacion.functions import importar_operaciones as importar
+    from werkzeug.datastructures import FileStorage
+
+    path = trabajo.parametros['archivo']
+    extension = path.rsplit('.', 1)[-1].lower()
+    if extension not in OperacionesImportar.LECTORES:
+        raise ValueError(f'Formato no soportado. Extensiones permitidas: {", ".join(OperacionesImportar.LECTORES)}')
+
+    with open(path, 'rb') as archivo:
+        filas = OperacionesImportar.LECTORES[extension](FileStorage(archivo, filename=os.path.basename(path)))
+        # La fila 1 es el encabezado
+        resultado = importar(filas, trabajo.id_usuario, primera_fila=2)
+
+    resultado['message'] = f'Se importaron {resultado["importadas"]} operaciones'
+    return resultado
+
+@tarea('reindexar_busqueda')
+def reindexar_busqueda(trabajo):
+    """Regenera el documento de búsqueda de las operaciones de un catálogo modificado
+    (lo encola actualizar_texto_busqueda al renombrar una persona, categoría, etc.)"""
+    from main.search.functions import condicion_relacionadas, reindexar_operaciones
+
+    condicion = condicion_relacionadas(trabajo.parametros['catalogo'], trabajo.parametros['id'])
+    return {'reindexadas': reindexar_operaciones(condicion=condicion)}
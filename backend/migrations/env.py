@@ -0,0 +1,31 @@
+"""Entorno de Alembic: usa la conexión y los modelos de la app (se corre con 'flask --app app ...',
+ver los comandos actualizar-esquema y nueva-migracion de main.cli)"""
+from alembic import context
+from main import db
+import main.models  # noqa: F401  (registra todas las tablas en db.metadata)
+
+def run_migrations_offline():
+    """Genera el SQL sin conectarse (actualizar-esquema --sql)"""
+    context.configure(
+        url=db.engine.url.render_as_string(hide_password=False),
+        target_metadata=db.metadata,
+        literal_binds=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with db.engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=db.metadata,
+            # SQLite no admite la mayoría de los ALTER TABLE: Alembic recrea la tabla
+            render_as_batch=connection.dialect.name == 'sqlite',
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
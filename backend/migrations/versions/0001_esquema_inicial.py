@@ -0,0 +1,99 @@
+"""Esquema inicial: las tablas tal como las creaba db.create_all() antes de las migraciones
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from main.migraciones.functions import crear_tabla_si_falta, crear_indice_si_falta
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    crear_tabla_si_falta(
+        'usuario',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('nombre', sa.String(length=100), nullable=False),
+        sa.Column('apellido', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=150), nullable=False),
+        sa.Column('password', sa.String(length=255), nullable=True),
+        sa.Column('rol', sa.String(length=20), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    crear_indice_si_falta('ix_usuario_email', 'usuario', ['email'], unique=True)
+
+    crear_tabla_si_falta(
+        'persona',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('cuit', sa.BigInteger(), nullable=False),
+        sa.Column('razon_social', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('cuit'),
+    )
+
+    crear_tabla_si_falta(
+        'concepto',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('nombre', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('nombre'),
+    )
+
+    crear_tabla_si_falta(
+        'categoria',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('nombre', sa.String(length=255), nullable=False),
+        sa.Column('id_concepto', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['id_concepto'], ['concepto.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+    crear_tabla_si_falta(
+        'subcategoria',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('nombre', sa.String(length=255), nullable=False),
+        sa.Column('id_categoria', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['id_categoria'], ['categoria.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+    crear_tabla_si_falta(
+        'operacion',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=False),
+        sa.Column('tipo', sa.String(length=10), nullable=False),
+        sa.Column('caracter', sa.String(length=10), nullable=False),
+        sa.Column('naturaleza', sa.String(length=10), nullable=False),
+        sa.Column('id_persona', sa.Integer(), nullable=False),
+        sa.Column('comprobante_path', sa.String(length=255), nullable=True),
+        sa.Column('option', sa.String(length=10), nullable=False),
+        sa.Column('codigo', sa.String(length=10), nullable=False),
+        sa.Column('observaciones', sa.String(length=255), nullable=True),
+        sa.Column('metodo_de_pago', sa.String(length=20), nullable=False),
+        sa.Column('monto_total', sa.Numeric(precision=65, scale=5), nullable=False),
+        sa.Column('id_subcategoria', sa.Integer(), nullable=False),
+        sa.Column('id_usuario', sa.Integer(), nullable=False),
+        sa.Column('archivo1_path', sa.String(length=255), nullable=True),
+        sa.Column('archivo2_path', sa.String(length=255), nullable=True),
+        sa.Column('archivo3_path', sa.String(length=255), nullable=True),
+        sa.Column('modificado_por_otro', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['id_persona'], ['persona.id']),
+        sa.ForeignKeyConstraint(['id_subcategoria'], ['subcategoria.id']),
+        sa.ForeignKeyConstraint(['id_usuario'], ['usuario.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('operacion')
+    op.drop_table('subcategoria')
+    op.drop_table('categoria')
+    op.drop_table('concepto')
+    op.drop_table('persona')
+    op.drop_index('ix_usuario_email', table_name='usuario')
+    op.drop_table('usuario')
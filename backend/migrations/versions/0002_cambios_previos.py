@@ -0,0 +1,133 @@
+"""Cambios hechos sobre create_all() antes de las migraciones: búsqueda global, índices de los
+filtros, adjuntos deduplicados, trabajos, correos y resumen mensual
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from main.migraciones.functions import crear_tabla_si_falta, crear_indice_si_falta, agregar_columna_si_falta
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# Índices de una columna de operacion (filtros por igualdad, prefijo y rango)
+INDICES_OPERACION = ['tipo', 'caracter', 'naturaleza', 'option', 'codigo', 'metodo_de_pago', 'monto_total']
+
+
+def upgrade():
+    # Si la columna es nueva, los documentos se generan con 'flask --app app reindexar-busqueda'
+    agregar_columna_si_falta('operacion', sa.Column('texto_busqueda', sa.Text(), nullable=True))
+    crear_indice_si_falta('ix_operacion_fecha_id', 'operacion', ['fecha', 'id'])
+    crear_indice_si_falta('ix_operacion_texto_busqueda', 'operacion', ['texto_busqueda'], mysql_prefix='FULLTEXT', mariadb_prefix='FULLTEXT')
+    for columna in INDICES_OPERACION:
+        crear_indice_si_falta(f'ix_operacion_{columna}', 'operacion', [columna])
+
+    crear_tabla_si_falta(
+        'blob',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('tamano', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=100), nullable=True),
+        sa.Column('referencias', sa.Integer(), nullable=False),
+        sa.Column('creado', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('sha256'),
+    )
+    crear_indice_si_falta('ix_blob_referencias', 'blob', ['referencias'])
+
+    crear_tabla_si_falta(
+        'trabajo',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('tipo', sa.String(length=50), nullable=False),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('parametros', sa.JSON(), nullable=True),
+        sa.Column('resultado', sa.JSON(), nullable=True),
+        sa.Column('archivo_resultado', sa.String(length=500), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('intentos', sa.Integer(), nullable=False),
+        sa.Column('max_intentos', sa.Integer(), nullable=False),
+        sa.Column('disponible_desde', sa.DateTime(), nullable=False),
+        sa.Column('creado', sa.DateTime(), nullable=False),
+        sa.Column('iniciado', sa.DateTime(), nullable=True),
+        sa.Column('finalizado', sa.DateTime(), nullable=True),
+        sa.Column('worker', sa.String(length=100), nullable=True),
+        sa.Column('id_usuario', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['id_usuario'], ['usuario.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    crear_indice_si_falta('ix_trabajo_estado_disponible', 'trabajo', ['estado', 'disponible_desde'])
+    crear_indice_si_falta('ix_trabajo_id_usuario', 'trabajo', ['id_usuario'])
+
+    crear_tabla_si_falta(
+        'correo',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('destinatarios', sa.JSON(), nullable=False),
+        sa.Column('asunto', sa.String(length=255), nullable=False),
+        sa.Column('cuerpo_texto', sa.Text(), nullable=True),
+        sa.Column('cuerpo_html', sa.Text(), nullable=True),
+        sa.Column('estado', sa.String(length=20), nullable=False),
+        sa.Column('intentos', sa.Integer(), nullable=False),
+        sa.Column('max_intentos', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('disponible_desde', sa.DateTime(), nullable=False),
+        sa.Column('creado', sa.DateTime(), nullable=False),
+        sa.Column('enviado', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    crear_indice_si_falta('ix_correo_estado_disponible', 'correo', ['estado', 'disponible_desde'])
+
+    creado = crear_tabla_si_falta(
+        'resumen_mensual',
+        sa.Column('anio', sa.SmallInteger(), nullable=False),
+        sa.Column('mes', sa.SmallInteger(), nullable=False),
+        sa.Column('tipo', sa.String(length=10), nullable=False),
+        sa.Column('caracter', sa.String(length=10), nullable=False),
+        sa.Column('naturaleza', sa.String(length=10), nullable=False),
+        sa.Column('id_subcategoria', sa.Integer(), nullable=False),
+        sa.Column('id_persona', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Numeric(precision=65, scale=5), nullable=False),
+        sa.Column('total_absoluto', sa.Numeric(precision=65, scale=5), nullable=False),
+        sa.Column('cantidad', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('anio', 'mes', 'tipo', 'caracter', 'naturaleza', 'id_subcategoria', 'id_persona'),
+    )
+    crear_indice_si_falta('ix_resumen_mensual_id_persona', 'resumen_mensual', ['id_persona'])
+    if creado:
+        _llenar_resumen()
+
+
+def _llenar_resumen():
+    """Con operaciones ya cargadas, el resumen nace con su agregación (como reconstruir_resumen)"""
+    operacion = sa.table(
+        'operacion', sa.column('id'), sa.column('fecha'), sa.column('tipo'), sa.column('caracter'),
+        sa.column('naturaleza'), sa.column('id_subcategoria'), sa.column('id_persona'), sa.column('monto_total'),
+    )
+    dimensiones = [operacion.c.tipo, operacion.c.caracter, operacion.c.naturaleza, operacion.c.id_subcategoria, operacion.c.id_persona]
+    anio = sa.extract('year', operacion.c.fecha)
+    mes = sa.extract('month', operacion.c.fecha)
+    consulta = sa.select(
+        anio, mes, *dimensiones,
+        sa.func.sum(operacion.c.monto_total), sa.func.sum(sa.func.abs(operacion.c.monto_total)), sa.func.count(operacion.c.id),
+    ).group_by(anio, mes, *dimensiones)
+    resumen = sa.table('resumen_mensual', *[sa.column(nombre) for nombre in (
+        'anio', 'mes', 'tipo', 'caracter', 'naturaleza', 'id_subcategoria', 'id_persona', 'total', 'total_absoluto', 'cantidad',
+    )])
+    op.execute(resumen.insert().from_select([c.name for c in resumen.columns], consulta))
+
+
+def downgrade():
+    op.drop_index('ix_resumen_mensual_id_persona', table_name='resumen_mensual')
+    op.drop_table('resumen_mensual')
+    op.drop_index('ix_correo_estado_disponible', table_name='correo')
+    op.drop_table('correo')
+    op.drop_index('ix_trabajo_id_usuario', table_name='trabajo')
+    op.drop_index('ix_trabajo_estado_disponible', table_name='trabajo')
+    op.drop_table('trabajo')
+    op.drop_index('ix_blob_referencias', table_name='blob')
+    op.drop_table('blob')
+    for columna in reversed(INDICES_OPERACION):
+        op.drop_index(f'ix_operacion_{columna}', table_name='operacion')
+    op.drop_index('ix_operacion_texto_busqueda', table_name='operacion')
+    op.drop_index('ix_operacion_fecha_id', table_name='operacion')
+    op.drop_column('operacion', 'texto_busqueda')
@@ -0,0 +1,70 @@
+"""Índices de operacion según los filtros del listado y los totales, y de las claves de los catálogos
+
+Plan (Operaciones._generar_filtros, OperacionesTotales y búsquedas de catálogos):
+  id                  clave primaria
+  fecha + orden       ix_operacion_fecha_id (fecha, id), ya existente
+  tipo (+ fecha)      ix_operacion_tipo_fecha reemplaza a ix_operacion_tipo: rango de fechas por tipo
+  persona, cuit       ix_operacion_persona_fecha (id_persona, fecha)
+  concepto, categoria,
+  subcategoria        ix_operacion_subcategoria_fecha (id_subcategoria, fecha), más
+                      ix_subcategoria_id_categoria e ix_categoria_id_concepto para subir por el árbol
+  usuario             ix_operacion_usuario_fecha (id_usuario, fecha)
+  persona (búsqueda)  ix_persona_razon_social
+  codigo, monto, pago,
+  caracter, naturaleza,
+  option              índices de una columna existentes
+  global              FULLTEXT existente (en SQLite, LIKE sin índice)
+  observaciones       LIKE '%texto%': ningún índice B-tree lo resuelve
+
+Los índices de claves foráneas con la fecha resuelven además el listado filtrado ordenado por fecha.
+En MariaDB, ADD INDEX es en línea (no bloquea escrituras) y el índice que InnoDB había creado solo
+para cada clave foránea se elimina al existir otro que empieza por la misma columna.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+from main.migraciones.functions import crear_indice_si_falta, eliminar_indice_si_existe
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Nombre -> (tabla, columnas)
+INDICES = {
+    'ix_operacion_tipo_fecha': ('operacion', ['tipo', 'fecha']),
+    'ix_operacion_persona_fecha': ('operacion', ['id_persona', 'fecha']),
+    'ix_operacion_subcategoria_fecha': ('operacion', ['id_subcategoria', 'fecha']),
+    'ix_operacion_usuario_fecha': ('operacion', ['id_usuario', 'fecha']),
+    'ix_persona_razon_social': ('persona', ['razon_social']),
+    'ix_categoria_id_concepto': ('categoria', ['id_concepto']),
+    'ix_subcategoria_id_categoria': ('subcategoria', ['id_categoria']),
+}
+
+# Índices de una columna que reemplazan los de claves foráneas compuestos, al volver atrás: MariaDB
+# no permite borrar el único índice que respalda una clave foránea
+INDICES_CLAVES_FORANEAS = {
+    'ix_operacion_persona_fecha': 'id_persona',
+    'ix_operacion_subcategoria_fecha': 'id_subcategoria',
+    'ix_operacion_usuario_fecha': 'id_usuario',
+    'ix_categoria_id_concepto': 'id_concepto',
+    'ix_subcategoria_id_categoria': 'id_categoria',
+}
+
+
+def upgrade():
+    for nombre, (tabla, columnas) in INDICES.items():
+        crear_indice_si_falta(nombre, tabla, columnas)
+    # Redundante: es el prefijo de ix_operacion_tipo_fecha
+    eliminar_indice_si_existe('ix_operacion_tipo', 'operacion')
+
+
+def downgrade():
+    crear_indice_si_falta('ix_operacion_tipo', 'operacion', ['tipo'])
+    for nombre, (tabla, columnas) in reversed(list(INDICES.items())):
+        columna = INDICES_CLAVES_FORANEAS.get(nombre)
+        if columna and op.get_bind().dialect.name in ('mysql', 'mariadb'):
+            crear_indice_si_falta(f'fk_{tabla}_{columna}', tabla, [columna])
+        eliminar_indice_si_existe(nombre, tabla)
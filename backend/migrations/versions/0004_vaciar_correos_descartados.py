@@ -0,0 +1,29 @@
+"""Vacía el cuerpo de los correos ya enviados o descartados (pueden tener contraseñas o tokens)
+
+Desde esta versión main.mail.functions los vacía al enviarlos o descartarlos; esto limpia los
+que quedaron de antes. No tiene vuelta atrás: el contenido no se puede recuperar.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    correo = sa.table('correo', sa.column('estado', sa.String), sa.column('cuerpo_texto', sa.Text), sa.column('cuerpo_html', sa.Text))
+    op.execute(
+        correo.update()
+        .where(correo.c.estado.in_(['enviado', 'fallido']))
+        .values(cuerpo_texto=None, cuerpo_html=None)
+    )
+
+
+def downgrade():
+    pass
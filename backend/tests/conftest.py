@@ -0,0 +1,103 @@
+"""Fixtures de las pruebas: la app real (create_app) contra una base SQLite temporal"""
+import os
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    directorio = tmp_path_factory.mktemp('gestops')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{directorio / 'pruebas.db'}",
+        'JWT_SECRET_KEY': 'clave-de-pruebas-de-al-menos-32-bytes',
+        'JWT_ACCESS_TOKEN_EXPIRES': '3600',
+        'UPLOAD_FOLDER': str(directorio / 'uploads'),
+        'METRICAS_FOLDER': '',
+    })
+    from main import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        yield app
+
+@pytest.fixture
+def poblar(app):
+    """Recrea el esquema con 'cantidad' operaciones sintéticas (ver benchmarks.datos)"""
+    from benchmarks.datos import poblar as poblar_base
+
+    def poblar(cantidad, **kwargs):
+        kwargs = {'cantidad_personas': 20, 'cantidad_subcategorias': 8, 'cantidad_usuarios': 3, 'semilla': 1, **kwargs}
+        poblar_base(cantidad, **kwargs)
+    return poblar
+
+@pytest.fixture
+def cliente(app):
+    """Cliente de pruebas con el encabezado Authorization del rol pedido: cliente.get(ruta, rol='admin'),
+    salvo que se pase uno en headers"""
+    from benchmarks.datos import encabezados
+
+    class Cliente:
+        def __init__(self):
+            self.client = app.test_client()
+
+        def open(self, ruta, method='GET', rol='supervisor', headers=None, **kwargs):
+            headers = dict(headers or {})
+            if 'Authorization' not in headers:
+                headers.update(encabezados(rol))
+            return self.client.open(ruta, method=method, headers=headers, **kwargs)
+
+        def get(self, ruta, **kwargs):
+            return self.open(ruta, method='GET', **kwargs)
+
+        def patch(self, ruta, **kwargs):
+            return self.open(ruta, method='PATCH', **kwargs)
+
+    return Cliente()
+
+@pytest.fixture
+def sentencias(app):
+    """Lista de las sentencias SQL (texto, parámetros) que se ejecutan durante la prueba"""
+    from main import db
+
+    registradas = []
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        registradas.append((statement, parameters))
+    event.listen(db.engine, 'before_cursor_execute', registrar)
+    yield registradas
+    event.remove(db.engine, 'before_cursor_execute', registrar)
+
+@pytest.fixture(autouse=True)
+def planes(request):
+    """Explica (EXPLAIN) cada sentencia que se ejecuta durante la prueba y falla si alguna recorre entera
+    una tabla grande (ver main.planes.functions), salvo en las pruebas marcadas con escaneo_aceptado.
+    Las verificaciones de la propia prueba van en 'with planes.omitir():'"""
+    if 'app' not in request.fixturenames:
+        yield
+        return
+
+    from main import db
+    from main.planes.functions import CapturaSentencias, escaneos_completos
+
+    class Planes:
+        @contextmanager
+        def omitir(self):
+            inicio = len(captura.sentencias)
+            try:
+                yield
+            finally:
+                del captura.sentencias[inicio:]
+
+    request.getfixturevalue('app')
+    with CapturaSentencias(db.engine) as captura:
+        yield Planes()
+    if request.node.get_closest_marker('escaneo_aceptado'):
+        return
+
+    escaneos = {}
+    with db.engine.connect() as conexion:
+        # Las sentencias repetidas (p. ej. una por lote) tienen el mismo plan
+        for sentencia, parametros in dict(reversed(captura.sentencias)).items():
+            pasos = escaneos_completos(conexion, sentencia, parametros)
+            if pasos:
+                escaneos[' '.join(sentencia.split())] = pasos
+    assert not escaneos, f'Recorridos completos de tablas grandes: {escaneos}'
@@ -0,0 +1,35 @@
+"""Descarga de adjuntos: ETag, 304 y X-Accel-Redirect"""
+import pytest
+from benchmarks.carga import cuerpo_subida
+
+@pytest.fixture
+def adjunto(poblar, cliente):
+    """Ruta de descarga de un adjunto subido a la operación 1"""
+    poblar(1)
+    cuerpo, headers = cuerpo_subida()
+    respuesta = cliente.open('/api/operaciones/1/archivos', method='POST', rol='admin', data=cuerpo, headers=headers)
+    assert respuesta.status_code in (200, 201), respuesta.get_data(as_text=True)
+    return '/api/operacion/1/archivo/archivo1'
+
+def test_descarga_condicional(cliente, adjunto):
+    respuesta = cliente.get(adjunto)
+    assert respuesta.status_code == 200
+    assert respuesta.get_data()
+    etag = respuesta.headers['ETag']
+
+    revalidacion = cliente.get(adjunto, headers={'If-None-Match': etag})
+    assert revalidacion.status_code == 304
+    assert not revalidacion.get_data()
+
+def test_x_accel_redirect_solo_si_se_envia_el_archivo(app, monkeypatch, cliente, adjunto):
+    monkeypatch.setitem(app.config, 'ADJUNTOS_X_ACCEL', '/adjuntos-internos/')
+
+    respuesta = cliente.get(adjunto)
+    assert respuesta.status_code == 200
+    assert respuesta.headers['X-Accel-Redirect'].startswith('/adjuntos-internos/')
+    assert not respuesta.get_data()
+
+    # Con el ETag vigente nginx no debe recibir la redirección: la respuesta es un 304 vacío
+    revalidacion = cliente.get(adjunto, headers={'If-None-Match': respuesta.headers['ETag']})
+    assert revalidacion.status_code == 304
+    assert 'X-Accel-Redirect' not in revalidacion.headers
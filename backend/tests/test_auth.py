@@ -0,0 +1,45 @@
+"""Verificación del usuario contra la base, con cache invalidada en todos los procesos"""
+import pytest
+from sqlalchemy import update, delete
+from main import db
+from main.models import UsuarioModel
+from main.catalogos.functions import invalidar
+from main.auth.decorators import VERSION_USUARIOS, _cache_usuarios
+from benchmarks.datos import encabezados
+from benchmarks.suite import ESCANEOS_ACEPTADOS
+
+LISTADO = '/api/operaciones?page=1&per_page=1'
+
+pytestmark = pytest.mark.escaneo_aceptado(ESCANEOS_ACEPTADOS['listado/sin-filtros'])
+
+@pytest.fixture
+def supervisor(app, monkeypatch, poblar):
+    """Id y encabezados de un supervisor, con AUTH_VERIFICAR_USUARIO y una cache que no vence sola"""
+    poblar(1)
+    # La base se recrea en cada prueba con los mismos ids
+    _cache_usuarios.clear()
+    monkeypatch.setitem(app.config, 'AUTH_VERIFICAR_USUARIO', True)
+    monkeypatch.setitem(app.config, 'AUTH_CACHE_TTL', 3600)
+    return db.session.query(UsuarioModel.id).filter_by(rol='supervisor').scalar(), encabezados('supervisor')
+
+def _cambio_en_otro_proceso(sentencia):
+    """Lo que hace otro worker al modificar un usuario: escribe la base y cambia la versión compartida,
+    sin tocar la cache de este proceso"""
+    db.session.execute(sentencia)
+    db.session.commit()
+    invalidar(VERSION_USUARIOS)
+
+def test_cambio_de_rol(cliente, supervisor):
+    id, headers = supervisor
+    assert cliente.get(LISTADO, headers=headers).status_code == 200
+
+    _cambio_en_otro_proceso(update(UsuarioModel).where(UsuarioModel.id == id).values(rol='inactivo'))
+    # El token sigue diciendo supervisor, pero vale el rol vigente
+    assert cliente.get(LISTADO, headers=headers).status_code == 403
+
+def test_usuario_eliminado(cliente, supervisor):
+    id, headers = supervisor
+    assert cliente.get(LISTADO, headers=headers).status_code == 200
+
+    _cambio_en_otro_proceso(delete(UsuarioModel).where(UsuarioModel.id == id))
+    assert cliente.get(LISTADO, headers=headers).status_code == 401
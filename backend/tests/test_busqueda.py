@@ -0,0 +1,35 @@
+"""Búsqueda global: el documento de búsqueda cuando cambia un catálogo"""
+import pytest
+from main import db
+from main.models import OperacionModel, PersonaModel, CategoriaModel, TrabajoModel
+from main.trabajos.functions import ejecutar_worker
+
+@pytest.mark.parametrize('modelo, campo, relacion', [
+    (PersonaModel, 'razon_social', lambda id: OperacionModel.id_persona == id),
+    (CategoriaModel, 'nombre', lambda id: OperacionModel.subcategoria.has(id_categoria=id)),
+])
+def test_renombrar_catalogo_encola_reindexado(poblar, sentencias, planes, modelo, campo, relacion):
+    def documentos(condicion):
+        with planes.omitir():
+            return [texto for texto, in db.session.query(OperacionModel.texto_busqueda).filter(condicion)]
+
+    poblar(50)
+    objeto = db.session.get(modelo, 1)
+    assert documentos(relacion(1))
+
+    sentencias.clear()
+    setattr(objeto, campo, 'nombre renovado')
+    db.session.commit()
+    # El cambio no carga las operaciones relacionadas: se encola un trabajo
+    assert not [sentencia for sentencia, _ in sentencias if 'FROM operacion' in sentencia]
+    trabajo = TrabajoModel.query.filter_by(tipo='reindexar_busqueda').one()
+    assert trabajo.parametros == {'catalogo': modelo.__tablename__, 'id': 1}
+    id_trabajo = trabajo.id
+    assert not any('nombre renovado' in texto for texto in documentos(relacion(1)))
+
+    ejecutar_worker(una_vez=True)
+    trabajo = db.session.get(TrabajoModel, id_trabajo)
+    assert trabajo.estado == 'completado'
+    assert trabajo.resultado['reindexadas'] == len(documentos(relacion(1)))
+    assert all('nombre renovado' in texto for texto in documentos(relacion(1)))
+    assert not any('nombre renovado' in texto for texto in documentos(~relacion(1)))
@@ -0,0 +1,71 @@
+"""Bandeja de salida: el cuerpo no se conserva después de enviar o descartar el correo, y el de
+registro se encola junto con el usuario"""
+from smtplib import SMTPRecipientsRefused
+from main import db, mailsender
+from main.models import CorreoModel, UsuarioModel
+from main.mail.functions import enviar_pendientes
+
+class ConexionSMTP:
+    """Conexión de Flask-Mail simulada: rechaza los destinatarios de 'rechazados'"""
+
+    def __init__(self, rechazados=()):
+        self.rechazados = set(rechazados)
+        self.enviados = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, msg):
+        if self.rechazados & set(msg.recipients):
+            raise SMTPRecipientsRefused({destinatario: (550, b'rechazado') for destinatario in msg.recipients})
+        self.enviados.append(msg)
+
+def _encolar(destinatario, max_intentos=5):
+    correo = CorreoModel(
+        destinatarios=[destinatario], asunto='Restablecer Contraseña',
+        cuerpo_texto='token secreto', cuerpo_html='<p>token secreto</p>', max_intentos=max_intentos,
+    )
+    db.session.add(correo)
+    db.session.commit()
+    return correo.id
+
+def test_cuerpo_vaciado_al_enviar_y_al_descartar(app, monkeypatch, poblar):
+    poblar(0)
+    monkeypatch.setitem(app.config, 'FLASKY_MAIL_SENDER', 'gestops@example.com')
+    conexion = ConexionSMTP(rechazados=['rechazado@example.com'])
+    monkeypatch.setattr(mailsender, 'connect', lambda: conexion)
+
+    enviado = _encolar('ok@example.com')
+    descartado = _encolar('rechazado@example.com', max_intentos=1)
+    assert enviar_pendientes() == 1
+    assert conexion.enviados[0].body == 'token secreto'
+
+    db.session.expire_all()
+    for id, estado in ((enviado, 'enviado'), (descartado, 'fallido')):
+        correo = db.session.get(CorreoModel, id)
+        assert correo.estado == estado
+        assert correo.cuerpo_texto is None and correo.cuerpo_html is None
+
+def _registrar(cliente, email):
+    datos = {'nombre': 'Nueva', 'apellido': 'Usuaria', 'email': email, 'password': 'x', 'rol': 'supervisor'}
+    return cliente.open('/auth/register', method='POST', rol='admin', json=datos)
+
+def test_registro_encola_el_correo_en_la_misma_transaccion(monkeypatch, poblar, cliente):
+    from main.auth import routes
+    poblar(0)
+
+    respuesta = _registrar(cliente, 'nueva@example.com')
+    assert respuesta.status_code == 201, respuesta.get_data()
+    correo = CorreoModel.query.one()
+    assert correo.destinatarios == ['nueva@example.com'] and correo.estado == 'pendiente'
+
+    def falla(*args, **kwargs):
+        raise RuntimeError('plantilla rota')
+    monkeypatch.setattr(routes, 'encolar_correo', falla)
+    assert _registrar(cliente, 'otra@example.com').status_code == 500
+    # Sin el correo de bienvenida el usuario no queda creado (y se puede volver a registrar)
+    assert UsuarioModel.query.filter_by(email='otra@example.com').first() is None
+    assert CorreoModel.query.count() == 1
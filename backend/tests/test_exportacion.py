@@ -0,0 +1,26 @@
+"""Exportación: el encabezado sale de la lista de columnas, también sin filas"""
+import csv, io
+import pytest
+from openpyxl import load_workbook
+from main import db
+from main.models import OperacionModel
+
+def test_columnas_de_to_excel(poblar):
+    poblar(1)
+    assert list(db.session.get(OperacionModel, 1).to_excel()) == OperacionModel.COLUMNAS_EXCEL
+
+@pytest.mark.parametrize('fecha', ['1990', ''])
+def test_csv_con_encabezado(poblar, cliente, fecha):
+    poblar(3)
+    respuesta = cliente.get(f'/api/operaciones/excel?formato=csv&fecha={fecha}')
+    assert respuesta.status_code == 200
+    filas = list(csv.reader(io.StringIO(respuesta.get_data(as_text=True))))
+    assert filas[0] == OperacionModel.COLUMNAS_EXCEL
+    assert len(filas) == (1 if fecha else 4)
+
+def test_xlsx_sin_filas_con_encabezado(poblar, cliente):
+    poblar(3)
+    respuesta = cliente.get('/api/operaciones/excel?formato=xlsx&fecha=1990')
+    assert respuesta.status_code == 200
+    hoja = load_workbook(io.BytesIO(respuesta.get_data()), read_only=True).worksheets[0]
+    assert [list(fila) for fila in hoja.iter_rows(values_only=True)] == [OperacionModel.COLUMNAS_EXCEL]
@@ -0,0 +1,43 @@
+"""Importación: validación de montos y CUIT por fila"""
+import pytest
+from main import db
+from main.models import PersonaModel, SubcategoriaModel
+from main.resumen.functions import verificar_resumen
+
+def _fila(**cambios):
+    persona = db.session.get(PersonaModel, 1)
+    subcategoria = db.session.get(SubcategoriaModel, 1)
+    fila = {
+        'fecha': '2024-03-01', 'tipo': 'ingreso', 'caracter': 'casa', 'naturaleza': 'personal',
+        'codigo': '00001-00000001', 'metodo_de_pago': 'efectivo', 'monto_total': '100.50',
+        'cuit': str(persona.cuit), 'id_subcategoria': subcategoria.id,
+    }
+    fila.update(cambios)
+    return fila
+
+def _importar(cliente, filas):
+    return cliente.open('/api/operaciones/importar', method='POST', rol='admin', json=filas)
+
+@pytest.mark.parametrize('monto', ['nan', 'NaN', 'inf', '-Infinity', '1e999999999'])
+def test_monto_no_finito(poblar, cliente, monto):
+    poblar(3)
+    respuesta = _importar(cliente, [_fila(monto_total=monto)])
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['errores'][0]['error'] == f"Monto inválido: '{monto}'"
+
+@pytest.mark.parametrize('cuit', ['inf', 'nan', '1e999999999', '123', '20-1234567-89', True])
+def test_cuit_invalido(poblar, cliente, cuit):
+    poblar(3)
+    respuesta = _importar(cliente, [_fila(cuit=cuit)])
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['errores'][0]['error'] == f"CUIT inválido: '{cuit}'"
+
+def test_formatos_de_cuit(poblar, cliente, planes):
+    poblar(3)
+    cuit = str(db.session.get(PersonaModel, 1).cuit)
+    formatos = [cuit, int(cuit), f'{cuit[:2]}-{cuit[2:10]}-{cuit[10]}', f'{cuit}.0', f'{cuit[0]}.{cuit[1:]}E+10']
+    respuesta = _importar(cliente, [_fila(cuit=formato, codigo=f'{numero:05}-00000001') for numero, formato in enumerate(formatos)])
+    assert respuesta.status_code == 201, respuesta.get_json()
+    assert respuesta.get_json()['importadas'] == len(formatos)
+    with planes.omitir():
+        assert verificar_resumen() == []
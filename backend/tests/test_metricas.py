@@ -0,0 +1,50 @@
+"""Métricas por solicitud: las exportaciones en streaming cuentan las sentencias del generador"""
+import pytest
+from main.metrics import functions as metricas
+from benchmarks.suite import ESCANEOS_ACEPTADOS
+
+def _histograma(nombre, endpoint):
+    return metricas._metricas.get((nombre, (('endpoint', endpoint), ('metodo', 'GET'))))
+
+@pytest.mark.parametrize('formato', ['csv', 'ndjson'])
+def test_exportacion_en_streaming(monkeypatch, poblar, cliente, formato):
+    poblar(50)
+    monkeypatch.setattr(metricas, '_metricas', {})
+
+    respuesta = cliente.get(f'/api/operaciones/excel?formato={formato}')
+    assert respuesta.status_code == 200
+    assert respuesta.is_streamed
+    assert len(respuesta.get_data().splitlines()) >= 50
+    # Hasta que se cierra la respuesta no terminó de enviarse
+    assert _histograma('gestops_solicitud_sentencias_sql', '/api/operaciones/excel') is None
+    respuesta.close()
+
+    buckets, sentencias, cantidad = _histograma('gestops_solicitud_sentencias_sql', '/api/operaciones/excel')
+    assert cantidad == 1
+    assert sentencias >= 1
+    assert _histograma('gestops_solicitud_db_seconds', '/api/operaciones/excel')[1] > 0
+
+@pytest.mark.escaneo_aceptado(ESCANEOS_ACEPTADOS['listado/sin-filtros'])
+def test_solicitud_comun(monkeypatch, poblar, cliente):
+    poblar(5)
+    monkeypatch.setattr(metricas, '_metricas', {})
+
+    respuesta = cliente.get('/api/operaciones?page=1&per_page=5')
+    assert respuesta.status_code == 200
+    assert 'db;dur=' in respuesta.headers['Server-Timing']
+    _, sentencias, cantidad = _histograma('gestops_solicitud_sentencias_sql', '/api/operaciones')
+    assert (sentencias, cantidad) == (2, 1)
+    assert _histograma('gestops_respuesta_bytes', '/api/operaciones')[1] == len(respuesta.get_data())
+
+def test_sentencia_fallida_no_deja_el_inicio_en_la_conexion(app, monkeypatch):
+    from main import db
+    monkeypatch.setattr(metricas, '_metricas', {})
+    monkeypatch.setitem(app.config, 'SQL_LENTA_MS', 0.000001)
+
+    with db.engine.connect() as conexion:
+        for _ in range(3):
+            with pytest.raises(Exception):
+                conexion.exec_driver_sql('SELECT * FROM tabla_inexistente')
+        conexion.exec_driver_sql('SELECT 1')
+        assert 'inicio_sentencia' not in conexion.info
+    assert metricas._metricas[('gestops_sql_lentas_total', ())] == 1
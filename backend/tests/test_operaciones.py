@@ -0,0 +1,82 @@
+"""Operaciones: sentencias SQL del listado y validación de la actualización masiva"""
+import pytest
+from benchmarks.suite import ESCANEOS_ACEPTADOS
+
+def _sentencias_listado(cliente, sentencias, ruta):
+    # La primera solicitud calienta los catálogos y caches del proceso
+    assert cliente.get(ruta).status_code == 200
+    sentencias.clear()
+    respuesta = cliente.get(ruta)
+    assert respuesta.status_code == 200
+    return len(sentencias), respuesta.get_json()
+
+@pytest.mark.parametrize('ruta', [
+    '/api/operaciones',
+    pytest.param('/api/operaciones?page=1&per_page=500', marks=pytest.mark.escaneo_aceptado(ESCANEOS_ACEPTADOS['listado/sin-filtros'])),
+    '/api/operaciones?cursor=&per_page=500',
+    '/api/operaciones?page=1&per_page=500&persona=proveedor',
+])
+def test_listado_sin_n_mas_1(poblar, cliente, sentencias, ruta):
+    cantidades = {}
+    for filas in (5, 200):
+        poblar(filas)
+        cantidades[filas], datos = _sentencias_listado(cliente, sentencias, ruta)
+        assert len(datos['operaciones']) == filas
+        # Cada operación trae sus relaciones en la misma consulta
+        assert all(operacion['subcategoria']['categoria']['concepto'] for operacion in datos['operaciones'])
+
+    assert cantidades[5] == cantidades[200]
+    assert cantidades[200] <= 3
+
+@pytest.mark.parametrize('cambios', [{'fecha': 20240101}, {'monto_total': [1]}, {'fecha': None}])
+def test_bulk_valores_de_otro_tipo(poblar, cliente, cambios):
+    poblar(3)
+    respuesta = cliente.patch('/api/operaciones/bulk', json=[{'id': 1, 'observaciones': 'ok'}, {'id': 2, **cambios}])
+    assert respuesta.status_code == 400
+    assert [invalida['id'] for invalida in respuesta.get_json()['operaciones_invalidas']] == [2]
+
+def test_bulk_ids_como_cadena(poblar, cliente):
+    poblar(3)
+    respuesta = cliente.patch('/api/operaciones/bulk', json=[{'id': '1', 'observaciones': 'desde cadena'}, {'id': 3, 'observaciones': 'entero'}])
+    assert respuesta.status_code == 200
+    assert [actualizada['id'] for actualizada in respuesta.get_json()['operaciones_actualizadas']] == [1, 3]
+    assert cliente.get('/api/operacion/1').get_json()['observaciones'] == 'desde cadena'
+
+@pytest.mark.parametrize('id', ['abc', 1.5, None, True, [1]])
+def test_bulk_id_invalido(poblar, cliente, id):
+    poblar(3)
+    respuesta = cliente.patch('/api/operaciones/bulk', json=[{'id': id, 'observaciones': 'x'}, {'id': 1, 'observaciones': 'y'}])
+    assert respuesta.status_code == 400
+    assert len(respuesta.get_json()['operaciones_invalidas']) == 1
+
+def test_total_por_cursor_cacheado_lru(monkeypatch, poblar, cliente, sentencias):
+    from main.catalogos.functions import CacheLRU
+    from main.resources import operacion
+    poblar(20)
+    monkeypatch.setattr(operacion, '_cache_total', CacheLRU(maximo=2))
+
+    def total(**filtros):
+        ruta = '/api/operaciones?cursor=&per_page=5&total=1&' + '&'.join(f'{k}={v}' for k, v in filtros.items())
+        sentencias.clear()
+        datos = cliente.get(ruta).get_json()
+        return datos['total'], len(sentencias)
+
+    sentencias.clear()
+    cliente.get('/api/operaciones?cursor=&per_page=5')
+    pagina = len(sentencias)
+
+    assert total() == (20, pagina + 1)
+    assert total() == (20, pagina)  # el total sale de la cache
+    total(tipo='ingreso')
+    total()  # el total general pasa a ser el más reciente
+    total(tipo='egreso')  # se descarta el menos usado (tipo=ingreso), no todos
+    assert total()[1] == pagina
+    assert total(tipo='ingreso')[1] == pagina + 1
+
+@pytest.mark.parametrize('ruta', ['/api/operaciones', '/api/operaciones/totales'])
+@pytest.mark.parametrize('filtro', ['monto=nan', 'monto=inf', 'monto=-Infinity:', 'monto=1e999999999', 'monto=10:sNaN', 'id=99999999999999999999'])
+def test_filtro_numerico_fuera_de_rango(poblar, cliente, ruta, filtro):
+    poblar(3)
+    respuesta = cliente.get(f'{ruta}?{filtro}')
+    assert respuesta.status_code == 400
+    assert 'Valor inválido' in respuesta.get_json()['message']
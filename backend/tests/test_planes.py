@@ -0,0 +1,75 @@
+"""Planes de ejecución: ninguna solicitud recorre entera la tabla operacion.
+
+La fixture planes (conftest.py) explica las sentencias de cada prueba; acá se recorren todos los
+filtros del listado y los escenarios de benchmarks.suite (totales, exportación, bulk, subida),
+más la importación"""
+import argparse, random
+import pytest
+from urllib.parse import urlencode
+from sqlalchemy import text
+from main import db
+from main.models import PersonaModel, SubcategoriaModel
+from benchmarks.suite import FILTROS, ESCANEOS_ACEPTADOS, ESCANEOS_ACEPTADOS_SQLITE, escenarios
+
+TOTAL = 500
+
+def _aceptar(request, nombre):
+    """Marca la prueba con escaneo_aceptado si el escenario está en ESCANEOS_ACEPTADOS"""
+    aceptados = {**ESCANEOS_ACEPTADOS, **(ESCANEOS_ACEPTADOS_SQLITE if db.engine.dialect.name == 'sqlite' else {})}
+    if nombre in aceptados:
+        request.applymarker(pytest.mark.escaneo_aceptado(aceptados[nombre]))
+
+@pytest.fixture(scope='module')
+def datos(app):
+    from benchmarks.datos import poblar
+    poblar(TOTAL, cantidad_personas=50, cantidad_subcategorias=20, cantidad_usuarios=3, semilla=1)
+
+@pytest.mark.parametrize('filtro', [filtro for filtro in FILTROS])
+@pytest.mark.parametrize('paginacion', [{'page': 1, 'per_page': 50}, {'cursor': '', 'per_page': 50}])
+def test_listado_filtrado(request, datos, cliente, sentencias, filtro, paginacion):
+    _aceptar(request, f'listado/{filtro}')
+    respuesta = cliente.get('/api/operaciones?' + urlencode({**paginacion, filtro: FILTROS[filtro]}))
+    assert respuesta.status_code == 200
+    assert sentencias
+
+ESCENARIOS = escenarios(TOTAL, argparse.Namespace(lote=50, anio_excel='2021', solo=None), random.Random(1))
+
+@pytest.mark.parametrize('nombre', [nombre for nombre in ESCENARIOS if not nombre.startswith('listado/')])
+def test_escenario_de_la_suite(request, datos, cliente, nombre):
+    _aceptar(request, nombre)
+    rol, metodo, preparar = ESCENARIOS[nombre]
+    ruta, cuerpo, headers = preparar()
+    respuesta = cliente.open(ruta, method=metodo, rol=rol, data=cuerpo, headers=headers)
+    assert 200 <= respuesta.status_code < 300, respuesta.get_data()[:200]
+    respuesta.get_data()
+
+def test_importacion(datos, cliente, planes):
+    with planes.omitir():
+        cuits = [cuit for cuit, in db.session.query(PersonaModel.cuit).limit(5)]
+        subcategorias = db.session.query(SubcategoriaModel).limit(5).all()
+    filas = [{
+        'fecha': f'2024-0{numero + 1}-10', 'tipo': 'egreso', 'caracter': 'oficina', 'naturaleza': 'societario',
+        'codigo': f'00002-{numero:08}', 'metodo_de_pago': 'debito', 'monto_total': '250',
+        'cuit': cuit, 'subcategoria': subcategoria.nombre, 'categoria': subcategoria.categoria.nombre,
+    } for numero, (cuit, subcategoria) in enumerate(zip(cuits, subcategorias))]
+
+    respuesta = cliente.open('/api/operaciones/importar', method='POST', rol='admin', json=filas)
+    assert respuesta.status_code == 201, respuesta.get_json()
+
+def test_migraciones_generan_el_esquema_de_los_modelos(app):
+    """Las pruebas corren sobre db.create_all(): las migraciones deben dejar el mismo esquema e índices"""
+    from alembic import command
+    from alembic.autogenerate import compare_metadata
+    from alembic.migration import MigrationContext
+    from main.migraciones.functions import configuracion_alembic
+
+    db.drop_all()
+    with db.engine.begin() as conexion:
+        conexion.execute(text('DROP TABLE IF EXISTS alembic_version'))
+    try:
+        command.upgrade(configuracion_alembic(), 'head')
+        with db.engine.connect() as conexion:
+            assert compare_metadata(MigrationContext.configure(conexion), db.metadata) == []
+    finally:
+        with db.engine.begin() as conexion:
+            conexion.execute(text('DROP TABLE IF EXISTS alembic_version'))
@@ -0,0 +1,51 @@
+"""Vistas previas: qué errores marcan el adjunto como fallido y qué queda en disco"""
+import errno, os
+import pytest
+from PIL import Image
+from benchmarks.carga import PNG
+from main.adjuntos.functions import ruta_blob
+from main.previews import functions as previews
+
+SHA256 = 'ab' * 32
+
+@pytest.fixture
+def blob(tmp_path):
+    def blob(contenido):
+        ruta = ruta_blob(SHA256, str(tmp_path))
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'wb') as archivo:
+            archivo.write(contenido)
+        return str(tmp_path)
+    return blob
+
+def _archivos(upload_folder):
+    return sorted(os.listdir(os.path.dirname(ruta_blob(SHA256, upload_folder))))
+
+def test_genera_la_preview(blob):
+    upload_folder = blob(PNG)
+    assert previews.generar_preview(SHA256, 'imagen', upload_folder) == previews.ruta_preview(SHA256, upload_folder, 'webp')
+    assert _archivos(upload_folder) == [SHA256, f'{SHA256}.preview.webp']
+
+def test_contenido_invalido_queda_marcado(blob):
+    upload_folder = blob(b'no es una imagen')
+    assert previews.generar_preview(SHA256, 'imagen', upload_folder) is None
+    assert os.path.exists(previews.ruta_fallida(SHA256, upload_folder))
+
+@pytest.mark.parametrize('error', [MemoryError(), OSError(errno.EIO, 'Input/output error')])
+def test_error_transitorio_al_renderizar_no_marca(monkeypatch, blob, error):
+    upload_folder = blob(PNG)
+    def falla(*args):
+        raise error
+    monkeypatch.setattr(previews, '_reducir', falla)
+    assert previews.generar_preview(SHA256, 'imagen', upload_folder) is None
+    assert _archivos(upload_folder) == [SHA256]
+
+def test_disco_lleno_al_guardar_no_deja_temporales(monkeypatch, blob):
+    upload_folder = blob(PNG)
+    def guardar_a_medias(self, ruta, *args, **kwargs):
+        with open(ruta, 'wb') as archivo:
+            archivo.write(b'RIFF')
+        raise OSError(errno.ENOSPC, 'No space left on device')
+    monkeypatch.setattr(Image.Image, 'save', guardar_a_medias)
+    assert previews.generar_preview(SHA256, 'imagen', upload_folder) is None
+    assert _archivos(upload_folder) == [SHA256]
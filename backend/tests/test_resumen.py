@@ -0,0 +1,48 @@
+"""Resumen mensual: mantenimiento incremental y verificación contra las operaciones"""
+from main import db
+from main.models import OperacionModel, ResumenMensualModel
+from main.resumen.functions import reconstruir_resumen, verificar_resumen, _clave, ATRIBUTOS
+
+def test_verificar_sin_diferencias_despues_de_reconstruir(poblar, planes):
+    # Muchas operaciones por fila: en SQLite los SUM acumulan error de float
+    poblar(5000, cantidad_personas=5, cantidad_subcategorias=2)
+    reconstruir_resumen()
+    with planes.omitir():
+        assert verificar_resumen() == []
+
+def test_eliminar_la_ultima_operacion_de_una_fila(poblar, cliente, sentencias, planes):
+    poblar(50)
+    # Una operación que es la única de su fila del resumen
+    with planes.omitir():
+        operaciones = db.session.query(OperacionModel).all()
+    claves = [_clave({atributo: getattr(operacion, atributo) for atributo in ATRIBUTOS}) for operacion in operaciones]
+    operacion = next(operacion for operacion, clave in zip(operaciones, claves) if claves.count(clave) == 1)
+    clave = claves[operaciones.index(operacion)]
+    db.session.remove()
+
+    sentencias.clear()
+    assert cliente.open(f'/api/operacion/{operacion.id}', method='DELETE', rol='supervisor').status_code == 200
+
+    assert db.session.get(ResumenMensualModel, clave) is None
+    with planes.omitir():
+        assert verificar_resumen() == []
+    # La limpieza se limita a las claves tocadas, sin recorrer todo el resumen
+    borrados = [sentencia for sentencia, _ in sentencias if sentencia.startswith('DELETE FROM resumen_mensual')]
+    assert borrados and all(' IN ' in sentencia for sentencia in borrados)
+
+def test_bulk_con_ids_repetidos(poblar, cliente, planes):
+    poblar(5)
+    cuerpo = [{'id': 1, 'monto_total': 10}, {'id': '1', 'monto_total': 20}]
+    respuesta = cliente.patch('/api/operaciones/bulk', json=cuerpo)
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['operaciones_invalidas'] == [{'id': 1, 'error': 'La operación aparece más de una vez en el lote'}]
+    with planes.omitir():
+        assert verificar_resumen() == []
+
+def test_bulk_actualiza_el_resumen(poblar, cliente, planes):
+    poblar(5)
+    cuerpo = [{'id': 1, 'monto_total': 10}, {'id': 2, 'tipo': 'egreso' if db.session.get(OperacionModel, 2).tipo == 'ingreso' else 'ingreso'}]
+    db.session.remove()
+    assert cliente.patch('/api/operaciones/bulk', json=cuerpo).status_code == 200
+    with planes.omitir():
+        assert verificar_resumen() == []
@@ -0,0 +1,22 @@
+"""Trabajos: cada usuario ve los propios; admin ve los de todos"""
+
+def _encolar(cliente, rol):
+    cuerpo = {'tipo': 'exportar_operaciones', 'parametros': {'formato': 'csv'}}
+    respuesta = cliente.open('/api/trabajos', method='POST', rol=rol, json=cuerpo)
+    assert respuesta.status_code == 202
+    return respuesta.get_json()['id']
+
+def test_visibilidad_de_trabajos(poblar, cliente):
+    poblar(5)
+    del_supervisor = _encolar(cliente, 'supervisor')
+    del_admin = _encolar(cliente, 'admin')
+
+    assert cliente.get(f'/api/trabajo/{del_supervisor}', rol='supervisor').status_code == 200
+    assert cliente.get(f'/api/trabajo/{del_admin}', rol='supervisor').status_code == 404
+    assert cliente.get(f'/api/trabajo/{del_admin}/resultado', rol='supervisor').status_code == 404
+    assert cliente.get(f'/api/trabajo/{del_supervisor}', rol='admin').status_code == 200
+
+    def listado(rol):
+        return [trabajo['id'] for trabajo in cliente.get('/api/trabajos', rol=rol).get_json()['trabajos']]
+    assert listado('supervisor') == [del_supervisor]
+    assert listado('admin') == [del_admin, del_supervisor]